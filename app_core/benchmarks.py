@@ -0,0 +1,412 @@
+# app_core/benchmarks.py
+"""
+Benchmark kernel analitik pada log status sintetis yang bisa direproduksi.
+
+Kernel yang diukur:
+    runtime_idletime   shift_calculator.calculate_runtime_idletime untuk seluruh jendela
+    program_cycles     program_processor.process_program_cycles_from_logs
+    program_sessions   program_sessions.build_program_segments + detect_program_sessions (halaman Program Analysis)
+    status_log_query   db_manager.get_status_logs_for_machine (hanya dengan --db-machine, membaca data asli)
+
+Log sintetis dibuat dari rantai Markov status Running/Idle/Other dengan laju transisi yang bisa diatur,
+plus baris berkala setiap --log-interval detik seperti penulisan log status main_app. Dengan seed yang sama
+datanya identik. Setiap kernel dijalankan pada jendela 1 hari, 1 minggu dan 1 bulan; hasilnya waktu terbaik
+dan median, puncak memori (tracemalloc, run terpisah) dan baris per detik.
+
+--save-baseline menyimpan hasil ke file baseline. Tanpa itu, hasil dibandingkan dengan baseline dan perintah
+keluar dengan kode 1 jika waktu atau memori naik lebih dari toleransi, sehingga bisa dipakai sebelum deploy.
+
+Contoh:
+    python -m app_core.benchmarks --save-baseline
+    python -m app_core.benchmarks --kernels program_cycles,program_sessions --sizes 1d,1w
+    python -m app_core.benchmarks --db-machine "Yasda 1 - 1013" --kernels status_log_query
+"""
+
+import argparse
+import bisect
+import datetime
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from datetime import timezone
+
+from app_core.config import (
+    RUNNING_STATUSES,
+    OTHER_STATUSES,
+    STATUS_LOG_DB_INTERVAL_SECONDS,
+    BENCHMARK_BASELINE_FILE,
+    BENCHMARK_REGRESSION_TOLERANCE,
+    BENCHMARK_REPEATS,
+)
+from app_core.program_processor import process_program_cycles_from_logs
+from app_core.program_sessions import build_program_segments, detect_program_sessions
+from app_core.shift_calculator import calculate_runtime_idletime
+
+logger = logging.getLogger(__name__)
+
+KERNEL_RUNTIME_IDLETIME = "runtime_idletime"
+KERNEL_PROGRAM_CYCLES = "program_cycles"
+KERNEL_PROGRAM_SESSIONS = "program_sessions"
+KERNEL_STATUS_LOG_QUERY = "status_log_query"
+KERNELS = (KERNEL_RUNTIME_IDLETIME, KERNEL_PROGRAM_CYCLES, KERNEL_PROGRAM_SESSIONS, KERNEL_STATUS_LOG_QUERY)
+
+# Ukuran jendela: nama -> jumlah hari
+SIZES = {"1d": 1, "1w": 7, "1m": 30}
+
+BENCHMARK_MACHINE_NAME = "Benchmark Machine"
+DEFAULT_START = datetime.datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+# Status non-Running yang umum muncul di log asli
+_IDLE_STATUS_CHOICES = ("Idle", "Ready", "Program Stop", "Program End", "Tool Change", "M-Code Stop", "Alarm")
+
+
+def generate_status_logs(days: float, start: datetime.datetime = DEFAULT_START, transitions_per_hour: float = 6.0,
+                         log_interval_seconds: float = STATUS_LOG_DB_INTERVAL_SECONDS, running_share: float = 0.6,
+                         other_share: float = 0.1, program_count: int = 8, seed: int = 0) -> list:
+    """
+    Membuat log status sintetis dalam format get_status_logs_for_machine (timestamp epoch, status_text,
+    spindle_speed, feed_rate, current_program), urut berdasarkan waktu.
+
+    Args:
+        days (float): Panjang data (hari).
+        start (datetime.datetime): Waktu log pertama (UTC aware).
+        transitions_per_hour (float): Rata-rata perubahan status per jam (lama status berdistribusi eksponensial).
+        log_interval_seconds (float): Jarak baris berkala selama status tidak berubah (0 = hanya saat berubah).
+        running_share (float), other_share (float): Peluang status berikutnya Running / Other; sisanya Idle.
+        program_count (int): Jumlah program induk (N-standard) yang dipakai bergantian.
+        seed (int): Seed generator acak; seed yang sama menghasilkan log yang sama.
+    """
+    rng = random.Random(seed)
+    mean_dwell = 3600.0 / transitions_per_hour
+    main_programs = [f"N{1000 + index}" for index in range(program_count)]
+    current_main = rng.choice(main_programs)
+    current_program = f"{current_main}-01"
+
+    logs = []
+    timestamp = start.timestamp()
+    end_timestamp = timestamp + days * 86400
+    while timestamp < end_timestamp:
+        draw = rng.random()
+        if draw < running_share:
+            # Program induk berganti sesekali (job baru); program makro non-standar sesekali menyela
+            if rng.random() < 0.15:
+                current_main = rng.choice(main_programs)
+            if rng.random() < 0.1:
+                current_program = f"O{9000 + rng.randrange(10)}"
+            else:
+                current_program = f"{current_main}-{rng.randrange(1, 13):02d}"
+            status_text = RUNNING_STATUSES[0]
+            spindle_speed = float(rng.choice((8000, 12000, 16000, 20000)))
+            feed_rate = float(rng.choice((500, 1000, 1500, 2500)))
+        elif draw < running_share + other_share:
+            status_text = rng.choice(OTHER_STATUSES)
+            spindle_speed = feed_rate = 0.0
+        else:
+            status_text = rng.choice(_IDLE_STATUS_CHOICES)
+            spindle_speed = feed_rate = 0.0
+
+        state_end = min(timestamp + max(1.0, rng.expovariate(1.0 / mean_dwell)), end_timestamp)
+        while timestamp < state_end:
+            logs.append({
+                "timestamp": timestamp,
+                "status_text": status_text,
+                "spindle_speed": spindle_speed,
+                "feed_rate": feed_rate,
+                "current_program": current_program,
+            })
+            if log_interval_seconds <= 0:
+                break
+            timestamp += log_interval_seconds
+        timestamp = state_end
+    return logs
+
+
+def _slice_logs(logs: list, timestamps: list, start: float, end: float) -> list:
+    return logs[bisect.bisect_left(timestamps, start):bisect.bisect_left(timestamps, end)]
+
+
+def _prepare_inputs(kernel: str, logs: list, timestamps: list, window_start: datetime.datetime, window_end: datetime.datetime):
+    """
+    Menyiapkan input satu kernel di luar pengukuran. Mengembalikan (fungsi_tanpa_argumen, jumlah_baris_input).
+    """
+    start_ts, end_ts = window_start.timestamp(), window_end.timestamp()
+
+    if kernel == KERNEL_RUNTIME_IDLETIME:
+        # Seperti pemanggil asli: log jendela plus log sebelum awal untuk status awal
+        window_logs = _slice_logs(logs, timestamps, start_ts - 3600, end_ts)
+        return (lambda: calculate_runtime_idletime(window_logs, window_start, window_end)), len(window_logs)
+
+    if kernel == KERNEL_PROGRAM_CYCLES:
+        window_logs = _slice_logs(logs, timestamps, start_ts, end_ts)
+        return (lambda: process_program_cycles_from_logs(BENCHMARK_MACHINE_NAME, window_logs)), len(window_logs)
+
+    if kernel == KERNEL_PROGRAM_SESSIONS:
+        # Format get_program_report_from_db2: timestamp berupa datetime
+        window_logs = [
+            dict(log, timestamp=datetime.datetime.fromtimestamp(log["timestamp"], tz=timezone.utc))
+            for log in _slice_logs(logs, timestamps, start_ts, end_ts)
+        ]
+        main_names = Counter(str(log["current_program"]).split("-")[0] for log in window_logs if "-" in str(log["current_program"]))
+        program_main_name = main_names.most_common(1)[0][0] if main_names else ""
+
+        def run_sessions():
+            segments = build_program_segments(window_logs, window_end)
+            return detect_program_sessions(program_main_name, segments, window_start, window_end)
+
+        return run_sessions, len(window_logs)
+
+    raise ValueError(f"Unknown kernel '{kernel}'")
+
+
+def measure(func, repeats: int) -> dict:
+    """
+    Menjalankan func sebanyak repeats kali untuk waktu, lalu sekali lagi di bawah tracemalloc untuk puncak memori
+    (tracemalloc memperlambat eksekusi, jadi tidak dipakai saat mengukur waktu).
+    """
+    timings = []
+    for _ in range(max(1, repeats)):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "best_seconds": min(timings),
+        "median_seconds": statistics.median(timings),
+        "peak_memory_bytes": peak_bytes,
+    }
+
+
+def _result(kernel: str, size: str, rows: int, measurement: dict) -> dict:
+    best = measurement["best_seconds"]
+    return dict(
+        measurement,
+        kernel=kernel,
+        size=size,
+        rows=rows,
+        rows_per_second=rows / best if best > 0 else 0.0,
+    )
+
+
+def run_synthetic_benchmarks(kernels, sizes, generator_params: dict, repeats: int) -> list:
+    """Menjalankan kernel sintetis untuk setiap ukuran jendela. Semua jendela dimulai satu hari setelah awal data."""
+    total_days = max(generator_params["days"], max(SIZES[size] for size in sizes) + 1)
+    params = dict(generator_params, days=total_days)
+    logger.info(f"Generating synthetic status logs: {params}")
+    started = time.perf_counter()
+    logs = generate_status_logs(**params)
+    timestamps = [log["timestamp"] for log in logs]
+    logger.info(f"Generated {len(logs)} log rows over {total_days} days in {time.perf_counter() - started:.1f}s.")
+
+    results = []
+    window_start = params["start"] + datetime.timedelta(days=1)
+    for size in sizes:
+        window_end = window_start + datetime.timedelta(days=SIZES[size])
+        for kernel in kernels:
+            func, rows = _prepare_inputs(kernel, logs, timestamps, window_start, window_end)
+            result = _result(kernel, size, rows, measure(func, repeats))
+            logger.info(_format_result(result))
+            results.append(result)
+    return results
+
+
+def run_status_log_query_benchmarks(machine_name: str, end_time: datetime.datetime, sizes, repeats: int) -> list:
+    """Mengukur get_status_logs_for_machine pada data asli di DB, untuk jendela yang berakhir di end_time."""
+    from app_core.db_manager import init_db_pool, set_default_db_role, DB_ROLE_ANALYTICS, get_status_logs_for_machine
+
+    set_default_db_role(DB_ROLE_ANALYTICS)
+    init_db_pool(DB_ROLE_ANALYTICS)
+    results = []
+    for size in sizes:
+        start_time = end_time - datetime.timedelta(days=SIZES[size])
+        row_counts = []
+
+        def run_query():
+            row_counts.append(len(get_status_logs_for_machine(machine_name, start_time, end_time)))
+
+        measurement = measure(run_query, repeats)
+        result = _result(KERNEL_STATUS_LOG_QUERY, size, row_counts[-1], measurement)
+        logger.info(_format_result(result))
+        results.append(result)
+    return results
+
+
+def _format_result(result: dict) -> str:
+    return (
+        f"{result['kernel']:<18} {result['size']:>3}  rows={result['rows']:>8}  best={result['best_seconds']:.4f}s  "
+        f"median={result['median_seconds']:.4f}s  peak_mem={result['peak_memory_bytes'] / 1048576:.1f}MiB  "
+        f"rows/s={result['rows_per_second']:,.0f}"
+    )
+
+
+def _result_key(result: dict) -> str:
+    return f"{result['kernel']}|{result['size']}"
+
+
+def _environment() -> dict:
+    return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine()}
+
+
+def _serializable_params(generator_params: dict) -> dict:
+    return dict(generator_params, start=generator_params["start"].isoformat())
+
+
+def load_baseline(path: str):
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Could not read benchmark baseline '{path}': {e}")
+        return None
+
+
+def save_baseline(path: str, results: list, generator_params: dict, repeats: int):
+    """Menyimpan hasil sebagai baseline. Hasil kernel/ukuran lain yang sudah ada di file dipertahankan."""
+    existing = load_baseline(path) or {}
+    baseline_results = existing.get("results", {})
+    baseline_results.update({_result_key(result): result for result in results})
+    baseline = {
+        "created_at": datetime.datetime.now(timezone.utc).isoformat(),
+        "environment": _environment(),
+        "generator": _serializable_params(generator_params),
+        "repeats": repeats,
+        "results": baseline_results,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    logger.info(f"Saved {len(results)} benchmark results to baseline '{path}'.")
+
+
+def compare_to_baseline(results: list, baseline: dict, tolerance: float, generator_params: dict) -> list:
+    """
+    Membandingkan hasil dengan baseline. Mengembalikan daftar pesan regresi (waktu terbaik atau puncak memori
+    naik lebih dari 'tolerance', misal 0.25 = 25%).
+    """
+    if baseline.get("generator") != _serializable_params(generator_params):
+        logger.warning("Synthetic data parameters differ from the baseline; comparison of synthetic kernels may be meaningless.")
+    if baseline.get("environment") != _environment():
+        logger.warning(f"Baseline was recorded on a different environment ({baseline.get('environment')}).")
+
+    regressions = []
+    baseline_results = baseline.get("results", {})
+    for result in results:
+        previous = baseline_results.get(_result_key(result))
+        if previous is None:
+            logger.info(f"No baseline for {_result_key(result)}.")
+            continue
+        for metric in ("best_seconds", "peak_memory_bytes"):
+            old_value, new_value = previous.get(metric), result[metric]
+            if not old_value:
+                continue
+            change = new_value / old_value - 1.0
+            if change > tolerance:
+                regressions.append(f"{_result_key(result)} {metric}: {old_value:g} -> {new_value:g} (+{change:.0%})")
+            else:
+                logger.info(f"{_result_key(result)} {metric}: {old_value:g} -> {new_value:g} ({change:+.0%})")
+    return regressions
+
+
+def _parse_list(value: str, allowed, label: str):
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = set(items) - set(allowed)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown {label}: {', '.join(sorted(unknown))}")
+    return items
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark analytics kernels on synthetic status logs and detect regressions against a baseline.")
+    parser.add_argument("--kernels", default=",".join(KERNELS), help=f"Comma separated subset of: {', '.join(KERNELS)}.")
+    parser.add_argument("--sizes", default=",".join(SIZES), help=f"Comma separated subset of: {', '.join(SIZES)}.")
+    parser.add_argument("--repeats", type=int, default=BENCHMARK_REPEATS, help="Timed runs per kernel and size (best is compared).")
+    parser.add_argument("--days", type=float, default=62, help="Length of the synthetic log (days).")
+    parser.add_argument("--transitions-per-hour", type=float, default=6.0, help="Average status changes per hour.")
+    parser.add_argument("--log-interval", type=float, default=STATUS_LOG_DB_INTERVAL_SECONDS, help="Seconds between periodic rows while the status is unchanged (0 = changes only).")
+    parser.add_argument("--running-share", type=float, default=0.6, help="Probability that the next status is Running.")
+    parser.add_argument("--other-share", type=float, default=0.1, help="Probability that the next status is an 'other' status.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db-machine", help="Machine name for the status_log_query kernel (reads real data from the database).")
+    parser.add_argument("--db-end", type=datetime.datetime.fromisoformat, help="End of the status_log_query windows (ISO, default: now).")
+    parser.add_argument("--baseline", default=BENCHMARK_BASELINE_FILE, help="Baseline file to compare with or save to.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline instead of comparing.")
+    parser.add_argument("--tolerance", type=float, default=BENCHMARK_REGRESSION_TOLERANCE, help="Allowed relative increase before a result counts as a regression.")
+    parser.add_argument("--output", help="Also write the results of this run to this JSON file.")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.WARNING,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    logger.setLevel(logging.DEBUG if args.verbose else logging.INFO)
+    try:
+        kernels = _parse_list(args.kernels, KERNELS, "kernels")
+        sizes = _parse_list(args.sizes, SIZES, "sizes")
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    generator_params = {
+        "days": args.days,
+        "start": DEFAULT_START,
+        "transitions_per_hour": args.transitions_per_hour,
+        "log_interval_seconds": args.log_interval,
+        "running_share": args.running_share,
+        "other_share": args.other_share,
+        "seed": args.seed,
+    }
+
+    results = []
+    synthetic_kernels = [kernel for kernel in kernels if kernel != KERNEL_STATUS_LOG_QUERY]
+    if synthetic_kernels:
+        results.extend(run_synthetic_benchmarks(synthetic_kernels, sizes, generator_params, args.repeats))
+    if KERNEL_STATUS_LOG_QUERY in kernels:
+        if args.db_machine:
+            end_time = args.db_end or datetime.datetime.now(timezone.utc)
+            if end_time.tzinfo is None:
+                end_time = end_time.replace(tzinfo=timezone.utc)
+            results.extend(run_status_log_query_benchmarks(args.db_machine, end_time, sizes, args.repeats))
+        else:
+            logger.info(f"Skipping {KERNEL_STATUS_LOG_QUERY}: pass --db-machine to benchmark against the database.")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": _environment(), "generator": _serializable_params(generator_params), "results": results}, f, indent=2)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results, generator_params, args.repeats)
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        logger.info(f"No baseline at '{args.baseline}'. Run with --save-baseline to record one.")
+        return 0
+    regressions = compare_to_baseline(results, baseline, args.tolerance, generator_params)
+    for message in regressions:
+        logger.error(f"Regression: {message}")
+    if regressions:
+        return 1
+    logger.info(f"No regressions against baseline '{args.baseline}' (tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+# app_core/change_notifier.py
+
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from app_core.config import DB_CONFIG, CHANGE_NOTIFY_CHANNEL, DASHBOARD_CHANGE_CHECK_SECONDS
+from app_core.db_manager import connect_db, close_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Topik perubahan yang dikirim oleh main_app setelah menulis ke database
+TOPIC_STATUS_LOGS = "status_logs"
+TOPIC_SHIFT_METRICS = "shift_metrics"
+TOPIC_PROGRAM_REPORT = "program_report"
+# Dikirim oleh halaman Program Analysis setelah menyimpan arsip analisis program/loss breakdown
+TOPIC_PROGRAM_ANALYSIS = "program_analysis"
+# Dikirim setelah target program (durasi/RPM/feed) diimpor atau diubah
+TOPIC_PROGRAM_TARGETS = "program_targets"
+
+
+def _encode_payload(topic, time_range) -> str:
+    if time_range is None:
+        return topic
+    start, end = (value.timestamp() if hasattr(value, "timestamp") else float(value) for value in time_range)
+    return f"{topic}@{int(start)}-{int(end) + 1}"
+
+
+def parse_change_payload(payload: str):
+    """Memecah payload NOTIFY menjadi (topik, rentang epoch (awal, akhir) atau None)."""
+    topic, _, range_text = payload.partition("@")
+    if not range_text:
+        return topic, None
+    try:
+        start, end = range_text.split("-")
+        return topic, (float(start), float(end))
+    except ValueError:
+        logger.warning(f"Ignoring malformed time range in change notification '{payload}'.")
+        return topic, None
+
+
+def notify_change(*topics, time_range=None) -> bool:
+    """
+    Mengirim NOTIFY untuk setiap topik. Notifikasi baru terkirim ke listener setelah commit,
+    jadi panggil fungsi ini setelah data yang bersangkutan sudah tersimpan.
+    time_range: (awal, akhir) datetime atau epoch dari data yang berubah; dashboard hanya membuang cache
+    query yang rentangnya tumpang tindih. None berarti semua rentang.
+    """
+    if not topics:
+        return True
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.warning(f"Cannot notify change for topics {topics}: no database connection.")
+            return False
+        cur = conn.cursor()
+        for topic in topics:
+            cur.execute("SELECT pg_notify(%s, %s);", (CHANGE_NOTIFY_CHANNEL, _encode_payload(topic, time_range)))
+        conn.commit()
+        return True
+    except psycopg2.Error as e:
+        logger.warning(f"Error sending change notification for topics {topics}: {e}")
+        if conn: conn.rollback()
+        return False
+    finally:
+        if cur: cur.close()
+        if conn: close_db_connection(conn)
+
+
+class ChangeListener(threading.Thread):
+    """
+    Thread yang melakukan LISTEN pada kanal notifikasi dan menaikkan counter versi per topik.
+    Satu listener dipakai bersama oleh semua sesi dashboard di dalam satu proses.
+    """
+
+    def __init__(self, channel=CHANGE_NOTIFY_CHANNEL, db_config=None, reconnect_delay=5.0):
+        super().__init__(name="Change-Listener-Thread", daemon=True)
+        self.channel = channel
+        self.db_config = db_config or DB_CONFIG
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+        self._epoch = 0
+        self._versions = defaultdict(int)
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def version(self, topic):
+        with self._lock:
+            return (self._epoch, self._versions[topic])
+
+    def stop(self):
+        self._stop_event.set()
+
+    def add_callback(self, callback):
+        """
+        Mendaftarkan callback(topic, time_range) yang dipanggil dari thread listener; topic None berarti semua
+        topik, time_range None berarti semua rentang waktu.
+        """
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def _notify_callbacks(self, topic, time_range=None):
+        with self._lock:
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback(topic, time_range)
+            except Exception as e:
+                logger.error(f"Error in change listener callback for topic '{topic}': {e}", exc_info=True)
+
+    def _bump(self, payload):
+        topic, time_range = parse_change_payload(payload)
+        with self._lock:
+            self._versions[topic] += 1
+        self._notify_callbacks(topic, time_range)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**self.db_config)
+                conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(sql.SQL("LISTEN {};").format(sql.Identifier(self.channel)))
+                with self._lock:
+                    # Notifikasi bisa terlewat selama terputus, anggap semua topik berubah.
+                    self._epoch += 1
+                self._notify_callbacks(None)
+                self.connected = True
+                logger.info(f"Listening for data changes on channel '{self.channel}'.")
+
+                while not self._stop_event.is_set():
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notification = conn.notifies.pop(0)
+                        self._bump(notification.payload)
+            except (psycopg2.Error, OSError) as e:
+                logger.warning(f"Change listener lost its connection: {e}. Retrying in {self.reconnect_delay} seconds.")
+            finally:
+                self.connected = False
+                if conn:
+                    try:
+                        conn.close()
+                    except psycopg2.Error:
+                        pass
+            self._stop_event.wait(self.reconnect_delay)
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def get_change_listener() -> ChangeListener:
+    global _listener
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = ChangeListener()
+            _listener.start()
+        return _listener
+
+
+def get_data_version(topics, fallback_seconds: float):
+    """
+    Mengembalikan versi data gabungan untuk topik-topik yang diberikan.
+    Jika listener belum/tidak terhubung, versi diturunkan dari jam (setiap fallback_seconds),
+    sehingga halaman tetap diperbarui seperti polling biasa.
+    """
+    listener = get_change_listener()
+    if listener.connected:
+        return tuple(listener.version(topic) for topic in topics)
+    return ("poll", int(time.time() // max(1.0, fallback_seconds)))
+
+
+def live_fragment(render, topics, min_interval_seconds: float, check_every_seconds: float = DASHBOARD_CHANGE_CHECK_SECONDS,
+                  enabled: bool = True):
+    """
+    Menggambar bagian live halaman Streamlit (render()) dan memperbaruinya hanya saat data berubah.
+
+    render() digambar ke placeholder (st.empty) di halaman. Sebuah st.fragment memeriksa versi data untuk
+    'topics' setiap check_every_seconds (murah, tanpa query); placeholder hanya diisi ulang jika versi berubah
+    sejak gambar terakhir dan min_interval_seconds sudah lewat. Putaran tanpa perubahan tidak menggambar apa pun,
+    sehingga isi sebelumnya tetap tampil. Jalankan ulang seluruh halaman (misal filter berubah) selalu menggambar.
+    enabled=False: render() dipanggil sekali tanpa pembaruan otomatis (misal rentang tanggal di masa lalu).
+    """
+    import streamlit as st
+    from app_core.query_cache import get_query_cache
+
+    if not enabled:
+        render()
+        return
+
+    state_key = f"_live_fragment:{render.__module__}.{render.__qualname__}"
+    # Bagian ini hanya berjalan saat seluruh halaman dijalankan ulang: placeholder baru masih kosong
+    st.session_state.pop(state_key, None)
+    placeholder = st.empty()
+
+    @st.fragment(run_every=check_every_seconds)
+    def _live_fragment():
+        now = time.time()
+        version = get_data_version(topics, min_interval_seconds)
+        state = st.session_state.get(state_key)
+        if state is not None and (version == state["version"] or now - state["rendered_at"] < min_interval_seconds):
+            return
+        query_cache = get_query_cache()
+        query_cache.reset_stale_served()
+        with placeholder.container():
+            render()
+        if query_cache.stale_served():
+            # Sebagian data masih versi lama (sedang dimuat ulang di latar belakang): gambar lagi di putaran berikutnya
+            st.session_state[state_key] = {"version": None, "rendered_at": now - min_interval_seconds}
+        else:
+            st.session_state[state_key] = {"version": version, "rendered_at": now}
+
+    _live_fragment()
@@ -7,7 +7,8 @@ import json
 import logging
 
 APP_CORE_DIR = os.path.dirname(os.path.abspath(__file__))
-MACHINES_CONFIG_FILE = os.path.join(APP_CORE_DIR, "machines_config.json")
+# IOT_MACHINES_CONFIG menggantikan daftar mesin, misal armada simulasi dari app_core/opcua_simulator.py
+MACHINES_CONFIG_FILE = os.environ.get("IOT_MACHINES_CONFIG") or os.path.join(APP_CORE_DIR, "machines_config.json")
 LOG_FILE_PATH = "app_logs/application.log"
 
 try:
@@ -35,8 +36,26 @@ SHIFTS = {
     "shift_3": (0, 8),   # 00:00 - 08:00 (tengah malam hingga 8 pagi hari ini)
 }
 
+# Pengecualian jadwal shift (lihat app_core/shift_calendar.py).
+# Per tanggal, misal hari libur tanpa shift: {"2025-12-25": {}}
+SHIFT_CALENDAR_OVERRIDES = {}
+# Per hari dalam minggu (0 = Senin), misal Sabtu hanya satu shift: {5: {"shift_1": (8, 16)}}
+SHIFT_WEEKDAY_PATTERNS = {}
+# Jumlah hari di sekitar waktu yang diminta yang batas shift-nya dihitung sekaligus
+SHIFT_CALENDAR_WINDOW_DAYS = 7
+
 # Lokasi file data
+# Snapshot live (memory-mapped, versioned) yang dibaca dashboard State Monitor
+LIVE_SNAPSHOT_FILE = "machine_data.snapshot"
+# Ekspor JSON opsional untuk konsumen lain; ditulis secara atomik jika diaktifkan
 DATA_FILE = "machine_data.json"
+EXPORT_MACHINE_DATA_JSON = False
+
+# --- API live lokal (HTTP + Server-Sent Events) yang dilayani langsung oleh main_app ---
+LIVE_API_ENABLED = True
+LIVE_API_HOST = "127.0.0.1"
+LIVE_API_PORT = 8765
+LIVE_API_PUBLISH_INTERVAL_SECONDS = 1
 # SHIFT_METRICS_FILE = "shift_metrics_data.json" # Dihapus, sekarang disimpan ke DB
 # STATUS_LOGS_FILE = "machine_status_logs.json" # Dihapus, sekarang disimpan ke DB
 
@@ -93,6 +112,38 @@ STATUS_LOG_DB_INTERVAL_SECONDS = 10
 SHIFT_CALC_INTERVAL_SECONDS = 10
 PROGRAM_REPORT_INTERVAL_SECONDS = 10
 POLLING_INTERVAL_SECONDS = 1
+# Upsert metrik shift real-time dilewati jika runtime/idle/other berubah kurang dari ini (detik)
+SHIFT_METRICS_MIN_CHANGE_SECONDS = 30
+
+# Ringkasan metrik internal (latensi baca OPC, penulisan DB, lock, ...) ditulis ke log setiap interval ini (detik);
+# metrik yang sama tersedia dalam format Prometheus di /metrics pada API live
+METRICS_SUMMARY_INTERVAL_SECONDS = 60
+
+# --- Logging asinkron main_app (app_core/log_setup.py) ---
+# File log per logger diputar setelah mencapai ukuran ini; sebanyak LOG_FILE_BACKUP_COUNT file lama disimpan
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 5
+# Kapasitas antrean record log; jika penuh, record dibuang (dihitung di metrik) agar ingest tidak tertahan
+LOG_QUEUE_MAX_SIZE = 10000
+# Pesan jalur panas yang berulang per mesin (data mentah tiap poll, gagal konversi nilai) dicatat paling banyak sekali per interval ini (detik)
+LOG_SAMPLE_INTERVAL_SECONDS = 60
+
+# Lebar grafik tren (piksel). Data tren di-downsample ke sekitar 2 titik (min/max) per piksel,
+# karena titik yang lebih rapat dari itu tidak terlihat di grafik.
+TREND_CHART_WIDTH_PX = 1600
+
+# --- Notifikasi perubahan data ke dashboard (PostgreSQL LISTEN/NOTIFY) ---
+CHANGE_NOTIFY_CHANNEL = "iot_data_changed"
+# Seberapa sering dashboard memeriksa versi data (murah, tanpa query ke DB)
+DASHBOARD_CHANGE_CHECK_SECONDS = 2
+# Log status ditulis setiap STATUS_LOG_DB_INTERVAL_SECONDS, tetapi NOTIFY hanya dikirim jika status/program
+# sebuah mesin berubah, paling banyak sekali per interval ini (detik)
+STATUS_LOG_NOTIFY_MIN_SECONDS = 30
+
+# --- Cache query bersama untuk dashboard (app_core/query_cache.py) ---
+QUERY_CACHE_MAX_ENTRIES = 256
+# Setelah TTL habis, hasil lama masih ditampilkan selama ini (detik) sambil dimuat ulang di latar belakang
+QUERY_CACHE_STALE_SECONDS = 300
 
 MACHINE_DISPLAY_ORDER = [
     "Makino V77 - 1000",
@@ -122,9 +173,64 @@ DB_CONFIG = {
     "port": "5432",  
 }
 
+# --- Pool koneksi per peran (min, max koneksi per proses) ---
+# ingestion: penulisan main_app; analytics: kalkulasi shift/program dan halaman laporan; dashboard: halaman live
+DB_POOL_SIZES = {
+    "ingestion": (1, 6),
+    "analytics": (1, 4),
+    "dashboard": (1, 6),
+}
+# Lama menunggu koneksi bebas dari pool sebelum menyerah (detik)
+DB_POOL_CHECKOUT_TIMEOUT_SECONDS = 10
+# Koneksi yang menganggur lebih lama dari ini diperiksa (SELECT 1) sebelum dipakai lagi
+DB_POOL_HEALTH_CHECK_IDLE_SECONDS = 60
+# Opsional: arahkan pool ke proxy lokal seperti PgBouncer (mode transaction pooling),
+# misal {"host": "127.0.0.1", "port": "6432"}. Listener LISTEN/NOTIFY tetap langsung ke DB_CONFIG.
+DB_PROXY_CONFIG = None
+
+# Penulisan DB yang lebih lama dari ini dicatat sebagai lambat (kemungkinan menunggu lock)
+DB_WRITE_SLOW_SECONDS = 1.0
+# Jumlah baris per statement INSERT multi-baris pada penulisan massal (laporan, siklus program, metrik shift)
+DB_BULK_WRITE_PAGE_SIZE = 1000
+
+# --- Reprocess data turunan dari log status (python -m app_core.reprocess) ---
+REPROCESS_MAX_WORKERS = 4
+# Jendela log tambahan di sekitar setiap hari: status awal sebelum tengah malam dan siklus yang melewati akhir hari
+REPROCESS_LOOKAROUND_HOURS = 12
+REPROCESS_CHECKPOINT_FILE = "reprocess_checkpoint.json"
+
+# --- Benchmark kernel analitik pada log status sintetis (python -m app_core.benchmarks) ---
+BENCHMARK_BASELINE_FILE = "benchmark_baseline.json"
+# Hasil dianggap regresi jika waktu atau puncak memori naik lebih dari fraksi ini dibanding baseline
+BENCHMARK_REGRESSION_TOLERANCE = 0.25
+# Jumlah pengulangan per kernel dan ukuran; waktu terbaik yang dibandingkan
+BENCHMARK_REPEATS = 3
+
+# Jeda lebih panjang dari ini (detik) mengakhiri sesi Program Induk (app_core/program_sessions.py)
+PROGRAM_SESSION_GAP_SECONDS = 900
+
+# Katalog tabel bulanan yang ada di database di-cache selama ini (detik) oleh jalur baca
+TABLE_CATALOG_TTL_SECONDS = 300
+
 # Nama tabel untuk menyimpan metrik shift yang telah selesai
 FINAL_SHIFT_METRICS_TABLE = "final_shift_metrics"
 
+# Tabel dimensi program: nama mentah, nama bersih dan nama program induk per mesin, dirujuk lewat program_id
+PROGRAM_DIM_TABLE = "program_dim"
+# Tabel alias rename program; diterapkan saat laporan dibaca
+PROGRAM_ALIAS_TABLE = "program_alias"
+# Interval main_app menerapkan alias secara permanen ke tabel laporan (0 = nonaktif)
+PROGRAM_ALIAS_COMPACT_INTERVAL_SECONDS = 0
+# Pustaka target program (durasi/RPM/feed rate per program) dengan riwayat versi
+PROGRAM_TARGET_TABLE = "program_target"
+
+# Watermark finalisasi shift per mesin (akhir shift terakhir yang metrik finalnya sudah disimpan)
+SHIFT_FINALIZATION_WATERMARK_TABLE = "shift_finalization_watermark"
+# Shift difinalisasi setelah berakhir lebih dari ini (detik), agar log status terakhirnya sudah tertulis ke DB
+SHIFT_FINALIZATION_GRACE_SECONDS = 30
+# Setelah downtime, shift yang terlewat dikejar paling jauh sebanyak ini (hari); lebih lama dari itu pakai app_core.reprocess
+SHIFT_FINALIZATION_MAX_CATCHUP_DAYS = 31
+
 # Prefix untuk nama tabel log status dan metrik shift real-time (untuk tabel dinamis)
 STATUS_LOG_TABLE_PREFIX = "machine_status_log_"
 SHIFT_METRICS_TABLE_PREFIX = "shift_metrics_"
@@ -1,3 +1,4 @@
+import re
 import pandas as pd
 import datetime
 
@@ -33,6 +34,48 @@ def clean_program_name(name):
     return name
 
 
+def get_main_program_name(name):
+    """
+    Mengambil nama program induk: bagian sebelum '-' pertama (misal 'N123-OP1' -> 'N123').
+    """
+    if not name:
+        return name
+    name = str(name)
+    return name.split('-')[0].strip() if '-' in name else name.strip()
+
+
+def normalize_program_name(raw_name):
+    """
+    Mengembalikan (clean_name, main_name) untuk nama program mentah dari mesin.
+    Dipakai sekali saat program didaftarkan ke tabel dimensi program.
+    """
+    clean_name = clean_program_name(raw_name)
+    return clean_name, get_main_program_name(clean_name)
+
+
+# Ekstensi file program yang dibuang dari nama program (lihat clean_program_name)
+PROGRAM_EXTENSION_PATTERN = r'\.(?:nc|h)$'
+# Operasi yang memakai feed rate sumbu Z sebagai target, bukan feed rate bidang
+Z_FEEDRATE_KEYWORDS = re.compile(r'centering|drill|tap', re.IGNORECASE)
+# Jumlah baris per potongan saat membaca file CSV CAM
+CAM_CSV_CHUNK_ROWS = 5000
+
+
+def clean_program_names(names: pd.Series) -> pd.Series:
+    """Versi vektor dari clean_program_name untuk satu kolom nama program."""
+    return names.astype(str).str.replace(PROGRAM_EXTENSION_PATTERN, '', case=False, regex=True)
+
+
+def convert_times_to_seconds(times: pd.Series) -> pd.Series:
+    """
+    Versi vektor dari convert_time_to_seconds: 'HH:MM:SS' atau 'MM:SS' menjadi total detik.
+    Nilai yang tidak valid menjadi NaN.
+    """
+    times = times.astype(str).str.strip()
+    times = times.where(times.str.count(':') != 1, '0:' + times)
+    return pd.to_timedelta(times, errors='coerce').dt.total_seconds()
+
+
 # Fungsi untuk memproses DataFrame mentah dari CSV
 def process_raw_csv_data(df_raw, file_name):
     """
@@ -41,13 +84,11 @@ def process_raw_csv_data(df_raw, file_name):
     # Mengubah nama kolom 'Cycle' menjadi 'Notes'
     df_raw.rename(columns={'Cycle': 'Notes'}, inplace=True)
     
-    # Menambah kolom 'program_name'
-    df_raw['program_name'] = file_name + df_raw['Job #'].astype(str)
-
-    df_raw['program_name'] = df_raw['program_name'].apply(clean_program_name)
+    # Menambah kolom 'program_name' tanpa ekstensi file
+    df_raw['program_name'] = clean_program_names(file_name + df_raw['Job #'].astype(str))
 
     # Konversi kolom 'Machining time' menjadi total detik
-    df_raw['Machining_time_seconds'] = df_raw['Machining time'].apply(convert_time_to_seconds)
+    df_raw['Machining_time_seconds'] = convert_times_to_seconds(df_raw['Machining time'])
 
     # Menambahkan kolom 'Target Durasi (menit)'
     df_raw['target_duration (min)'] = (df_raw['Machining_time_seconds'] / 60).round(2)
@@ -55,13 +96,10 @@ def process_raw_csv_data(df_raw, file_name):
     # Tambahkan Quantity
     df_raw['Quantity'] = 1
     
-    # Menambahkan kolom 'Prog. Feedrate' dengan logika kondisional
+    # Prog. Feedrate: feed rate Z untuk centering/drill/tap, selain itu feed rate bidang
     df_raw['Notes'] = df_raw['Notes'].fillna('')
-    df_raw['target_feedrate'] = df_raw.apply(
-        lambda row: row['Z feedrate'] if any(word in str(row['Notes']).lower() for word in ['centering', 'drill', 'tap'])
-        else row['Plane feedrate'],
-        axis=1
-    )
+    uses_z_feedrate = df_raw['Notes'].astype(str).str.contains(Z_FEEDRATE_KEYWORDS)
+    df_raw['target_feedrate'] = df_raw['Z feedrate'].where(uses_z_feedrate, df_raw['Plane feedrate'])
     
     # Tentukan kolom yang akan dikembalikan, sekarang termasuk 'Remarks'
     columns_to_keep = ['program_name', 'target_duration (min)', 'Spindle RPM', 'target_feedrate', 'Quantity', 'Notes', 'Remarks']
@@ -70,4 +108,14 @@ def process_raw_csv_data(df_raw, file_name):
     if 'Remarks' not in df_raw.columns:
         df_raw['Remarks'] = ""
     
-    return df_raw[columns_to_keep].copy()
\ No newline at end of file
+    return df_raw[columns_to_keep].copy()
+
+
+def iter_cam_csv_chunks(csv_file, file_name, chunk_rows: int = CAM_CSV_CHUNK_ROWS, encoding: str = 'latin-1'):
+    """
+    Membaca satu file CSV CAM (header di baris ke-3) per potongan dan menghasilkan DataFrame
+    yang sudah dikonversi oleh process_raw_csv_data, sehingga file besar tidak dimuat utuh ke memori.
+    """
+    for df_chunk in pd.read_csv(csv_file, header=2, encoding=encoding, chunksize=chunk_rows):
+        if not df_chunk.empty:
+            yield process_raw_csv_data(df_chunk, file_name)
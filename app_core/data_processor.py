@@ -3,8 +3,11 @@
 import logging
 import time
 from opcua import ua # Pastikan ua dari opcua diimpor
+from app_core.log_setup import LogSampler
 
 logger = logging.getLogger(__name__)
+# Peringatan konversi berulang setiap poll; dicatat paling banyak sekali per interval per mesin
+_log_sampler = LogSampler()
 
 # --- machine state definitions ---
 HEIDENHAIN_STATUS_MAP = {
@@ -66,13 +69,13 @@ def process_opcua_data(machine_name, raw_data):
             if moden_raw is not None:
                 moden_int = int(float(moden_raw)) # Convert safely
         except (ValueError, TypeError):
-            logger.warning(f"[{machine_name}] Could not convert Moden '{moden_raw}' to integer. Using None.")
+            _log_sampler.log(logger, logging.WARNING, machine_name, "[%s] Could not convert Moden '%s' to integer. Using None.", machine_name, moden_raw)
         
         try:
             if motion_raw is not None:
                 motion_int = int(float(motion_raw)) # Convert safely
         except (ValueError, TypeError):
-            logger.warning(f"[{machine_name}] Could not convert Motion '{motion_raw}' to integer. Using None.")
+            _log_sampler.log(logger, logging.WARNING, machine_name, "[%s] Could not convert Motion '%s' to integer. Using None.", machine_name, motion_raw)
 
         status_text_derived = MAKINO_MODEN_MOTION_STATUS_MAP.get((moden_int, motion_int), "Undefined Status")
         if status_text_derived == "Undefined Status" and moden_int is not None:
@@ -101,7 +104,7 @@ def process_opcua_data(machine_name, raw_data):
         elif "State_Number" in raw_data:
             status_key_to_use = "State_Number"
         else:
-            logger.warning(f"[{machine_name}] Neither 'Status' nor 'State_Number' variable found in raw data. Using default map.")
+            _log_sampler.log(logger, logging.WARNING, machine_name, "[%s] Neither 'Status' nor 'State_Number' variable found in raw data. Using default map.", machine_name)
             status_key_to_use = "N/A_Fallback"
 
     # Process status if not Makino-specific
@@ -112,7 +115,7 @@ def process_opcua_data(machine_name, raw_data):
             try:
                 current_status_int = int(float(current_status_raw)) # Safely convert to int
             except (ValueError, TypeError):
-                logger.warning(f"[{machine_name}] Could not convert status '{current_status_raw}' to integer. Using raw value.")
+                _log_sampler.log(logger, logging.WARNING, machine_name, "[%s] Could not convert status '%s' to integer. Using raw value.", machine_name, current_status_raw)
         status_text_derived = current_status_map.get(current_status_int, "Undefined Status")
     elif status_key_to_use == "N/A_Fallback":
         status_text_derived = DEFAULT_STATUS_MAP.get(None, "Undefined Status")
@@ -133,7 +136,7 @@ def process_opcua_data(machine_name, raw_data):
         try:
             processed_output["FeedRate_mm_per_min"] = int(float(feed_rate))
         except (ValueError, TypeError):
-            logger.warning(f"[{machine_name}] Could not convert FeedRate '{feed_rate}' to integer.")
+            _log_sampler.log(logger, logging.WARNING, machine_name, "[%s] Could not convert FeedRate '%s' to integer.", machine_name, feed_rate)
             processed_output["FeedRate_mm_per_min"] = None
     else:
         processed_output["FeedRate_mm_per_min"] = None
@@ -144,7 +147,7 @@ def process_opcua_data(machine_name, raw_data):
         try:
             processed_output["Spindle_Speed"] = int(float(spindle_speed))
         except (ValueError, TypeError):
-            logger.warning(f"[{machine_name}] Could not convert Spindle Speed '{spindle_speed}' to integer.")
+            _log_sampler.log(logger, logging.WARNING, machine_name, "[%s] Could not convert Spindle Speed '%s' to integer.", machine_name, spindle_speed)
             processed_output["Spindle_Speed"] = None
     else:
         processed_output["Spindle_Speed"] = None
@@ -167,7 +170,7 @@ def process_opcua_data(machine_name, raw_data):
                 if program_num_int is not None and str(program_num_int).strip() != "" and program_num_int != 0:
                     program_parts_for_makino.append(f"N{str(program_num_int).strip()}-")
             except (ValueError, TypeError):
-                logger.warning(f"[{machine_name}] Could not convert Program_num '{program_num}' to integer. Skipping.")
+                _log_sampler.log(logger, logging.WARNING, machine_name, "[%s] Could not convert Program_num '%s' to integer. Skipping.", machine_name, program_num)
         
         # Periksa dan konversi Setting_num dengan aman
         setting_sub_str = ""
@@ -177,7 +180,7 @@ def process_opcua_data(machine_name, raw_data):
                 if setting_num_int is not None and str(setting_num_int).strip() != "":
                     setting_sub_str += str(setting_num_int).strip()
             except (ValueError, TypeError):
-                logger.warning(f"[{machine_name}] Could not convert Setting_num '{setting_num}' to integer. Skipping.")
+                _log_sampler.log(logger, logging.WARNING, machine_name, "[%s] Could not convert Setting_num '%s' to integer. Skipping.", machine_name, setting_num)
 
         # Periksa dan konversi Sub_process_num dengan aman
         if sub_process_num is not None:
@@ -188,9 +191,9 @@ def process_opcua_data(machine_name, raw_data):
                 elif sub_process_int == 0:
                     pass 
                 else: 
-                    logger.warning(f"[{machine_name}] Sub_process_num '{sub_process_num}' (converted to {sub_process_int}) out of expected range (1-26 for A-Z). Skipping char conversion.")
+                    _log_sampler.log(logger, logging.WARNING, machine_name, "[%s] Sub_process_num '%s' (converted to %s) out of expected range (1-26 for A-Z). Skipping char conversion.", machine_name, sub_process_num, sub_process_int)
             except (ValueError, TypeError):
-                logger.warning(f"[{machine_name}] Could not convert Sub_process_num '{sub_process_num}' to a valid number for char conversion. Skipping.")
+                _log_sampler.log(logger, logging.WARNING, machine_name, "[%s] Could not convert Sub_process_num '%s' to a valid number for char conversion. Skipping.", machine_name, sub_process_num)
         
         if setting_sub_str:
             program_parts_for_makino.append(setting_sub_str)
@@ -202,7 +205,7 @@ def process_opcua_data(machine_name, raw_data):
                 if program_id_int is not None and str(program_id_int).strip() != "":
                     program_parts_for_makino.append(str(program_id_int).strip())
             except (ValueError, TypeError):
-                logger.warning(f"[{machine_name}] Could not convert Program_id '{program_id}' to integer. Skipping.")
+                _log_sampler.log(logger, logging.WARNING, machine_name, "[%s] Could not convert Program_id '%s' to integer. Skipping.", machine_name, program_id)
 
         if program_parts_for_makino:
             # Menggabungkan parts.
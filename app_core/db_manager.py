@@ -3,6 +3,7 @@ print("EXECUTING: app_core/db_manager.py")
 
 import psycopg2
 from psycopg2 import sql 
+from psycopg2 import errorcodes
 import threading
 import logging
 import datetime
@@ -11,15 +12,22 @@ import os
 import sys
 from datetime import timezone
 import time
-from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from psycopg2.extras import execute_values
 import collections 
+import functools
 from collections import defaultdict 
 import pandas as pd
 from dateutil.relativedelta import relativedelta
+from app_core.csv_converter import normalize_program_name
+from app_core import metrics
 
 try:
     sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__))))
-    from app_core.config import DB_CONFIG, SHIFTS, RUNNING_STATUSES, IDLE_STATUSES, OTHER_STATUSES 
+    from app_core.config import DB_CONFIG, SHIFTS, RUNNING_STATUSES, IDLE_STATUSES, OTHER_STATUSES, SHIFT_METRICS_MIN_CHANGE_SECONDS, DB_WRITE_SLOW_SECONDS, TABLE_CATALOG_TTL_SECONDS
+    from app_core.config import DB_BULK_WRITE_PAGE_SIZE
+    from app_core.config import DB_POOL_SIZES, DB_POOL_CHECKOUT_TIMEOUT_SECONDS, DB_POOL_HEALTH_CHECK_IDLE_SECONDS, DB_PROXY_CONFIG
+    from app_core.config import PROGRAM_DIM_TABLE, PROGRAM_ALIAS_TABLE, PROGRAM_TARGET_TABLE, SHIFT_FINALIZATION_WATERMARK_TABLE
 except ImportError:
     logging.error("Could not import config.py. Please ensure it's in app_core directory or path is set.")
     DB_CONFIG = {} 
@@ -27,13 +35,235 @@ except ImportError:
     RUNNING_STATUSES = []
     IDLE_STATUSES = []
     OTHER_STATUSES = [] 
+    SHIFT_METRICS_MIN_CHANGE_SECONDS = 0
+    DB_WRITE_SLOW_SECONDS = 1.0
+    DB_BULK_WRITE_PAGE_SIZE = 1000
+    TABLE_CATALOG_TTL_SECONDS = 300
+    DB_POOL_SIZES = {}
+    DB_POOL_CHECKOUT_TIMEOUT_SECONDS = 10
+    DB_POOL_HEALTH_CHECK_IDLE_SECONDS = 60
+    DB_PROXY_CONFIG = None
+    PROGRAM_DIM_TABLE = "program_dim"
+    PROGRAM_ALIAS_TABLE = "program_alias"
+    PROGRAM_TARGET_TABLE = "program_target"
+    SHIFT_FINALIZATION_WATERMARK_TABLE = "shift_finalization_watermark"
 
 logger = logging.getLogger(__name__)
 
-_verified_program_report_tables_in_session = set()  # Set untuk melacak tabel laporan program yang sudah diverifikasi
-_verified_table_lock = threading.Lock()  # Lock untuk melindungi set ini
+# Registry skema per proses: tabel (beserta indeksnya) yang sudah dipastikan ada oleh fungsi create_*.
+# Setelah sebuah tabel terverifikasi, create_* berikutnya hanya berupa lookup set, tanpa DDL ke database.
+_verified_tables = set()
+_verified_tables_lock = threading.Lock()
+
+def _ensure_schema_once(func):
+    """Dekorator untuk fungsi create_*(table_name): DDL hanya dijalankan jika tabel belum ada di registry."""
+    @functools.wraps(func)
+    def wrapper(table_name: str, *args, **kwargs):
+        with _verified_tables_lock:
+            if table_name in _verified_tables:
+                return True
+        result = func(table_name, *args, **kwargs)
+        if result:
+            with _verified_tables_lock:
+                _verified_tables.add(table_name)
+            _add_to_table_catalog(table_name)
+        return result
+    return wrapper
+
+def is_table_verified(table_name: str) -> bool:
+    with _verified_tables_lock:
+        return table_name in _verified_tables
+
+def forget_verified_table(table_name: str):
+    """Menghapus tabel dari registry (misal setelah UndefinedTable), sehingga create_* berikutnya menjalankan DDL lagi."""
+    with _verified_tables_lock:
+        _verified_tables.discard(table_name)
+    _remove_from_table_catalog(table_name)
+
+# Katalog tabel yang ada di database, untuk jalur baca lintas tabel bulanan. Satu query ke pg_tables
+# per TTL menggantikan satu to_regclass per tabel per panggilan. Tabel yang dibuat proses ini langsung
+# ditambahkan; tabel yang dibuat proses lain terlihat paling lambat setelah TTL.
+_table_catalog = set()
+_table_catalog_loaded_at = None
+_table_catalog_lock = threading.Lock()
+
+def _load_table_catalog(cur) -> set:
+    cur.execute("""
+        SELECT tablename FROM pg_catalog.pg_tables
+        WHERE schemaname = ANY(current_schemas(false));
+    """)
+    return {row[0] for row in cur.fetchall()}
+
+def refresh_table_catalog(cur=None) -> bool:
+    """Memuat ulang katalog tabel. Memakai cursor pemanggil jika ada, jika tidak meminjam koneksi dari pool."""
+    global _table_catalog, _table_catalog_loaded_at
+    conn = None
+    own_cur = None
+    try:
+        if cur is None:
+            conn = connect_db()
+            if conn is None:
+                logger.warning("Cannot refresh table catalog: no database connection.")
+                return False
+            own_cur = conn.cursor()
+        tables = _load_table_catalog(cur or own_cur)
+        with _table_catalog_lock:
+            _table_catalog = tables
+            _table_catalog_loaded_at = time.monotonic()
+        logger.debug(f"Table catalog refreshed: {len(tables)} tables.")
+        return True
+    except psycopg2.Error as e:
+        logger.warning(f"Error refreshing table catalog: {e}")
+        return False
+    finally:
+        if own_cur: own_cur.close()
+        if conn:
+            conn.rollback()
+            close_db_connection(conn)
+
+def invalidate_table_catalog():
+    global _table_catalog_loaded_at
+    with _table_catalog_lock:
+        _table_catalog_loaded_at = None
+
+def _add_to_table_catalog(table_name: str):
+    with _table_catalog_lock:
+        _table_catalog.add(table_name)
+
+def _remove_from_table_catalog(table_name: str):
+    with _table_catalog_lock:
+        _table_catalog.discard(table_name)
+
+def table_exists(table_name: str, cur=None) -> bool:
+    """Memeriksa keberadaan tabel lewat katalog ber-TTL (tanpa round trip selama katalog masih segar)."""
+    with _table_catalog_lock:
+        stale = _table_catalog_loaded_at is None or time.monotonic() - _table_catalog_loaded_at > TABLE_CATALOG_TTL_SECONDS
+    if stale:
+        refresh_table_catalog(cur)
+    with _table_catalog_lock:
+        return table_name in _table_catalog
+
+def _forget_table_if_undefined(error: Exception, table_name: str):
+    if getattr(error, "pgcode", None) == errorcodes.UNDEFINED_TABLE:
+        logger.warning(f"Table '{table_name}' no longer exists. It will be re-created on the next write cycle.")
+        forget_verified_table(table_name)
+
+# Penulisan data tidak lagi diserialisasi oleh lock global: setiap save_* memakai koneksi dan
+# transaksinya sendiri, konflik ditangani PostgreSQL (row lock + ON CONFLICT).
+# Hanya DDL (CREATE TABLE/INDEX IF NOT EXISTS) yang diserialisasi di dalam proses, karena dua
+# CREATE TABLE IF NOT EXISTS yang bersamaan untuk tabel yang sama bisa gagal dengan unique_violation.
+_ddl_lock = threading.Lock()
+
+# Instrumentasi penulisan: durasi per operasi, termasuk waktu menunggu koneksi dan lock di PostgreSQL
+_db_write_stats = defaultdict(lambda: {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "slow": 0})
+_db_write_stats_lock = threading.Lock()
+
+DB_WRITE_SECONDS = metrics.histogram("iot_db_write_seconds", "Duration of database write operations, including connection checkout.", ("operation",))
+DB_BATCH_ROWS = metrics.histogram("iot_db_batch_rows", "Rows per bulk database write call.", ("operation",), buckets=metrics.SIZE_BUCKETS)
+
+def _instrument_write(operation: str):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                DB_WRITE_SECONDS.observe(elapsed, operation=operation)
+                with _db_write_stats_lock:
+                    stats = _db_write_stats[operation]
+                    stats["count"] += 1
+                    stats["total_seconds"] += elapsed
+                    stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+                    if elapsed >= DB_WRITE_SLOW_SECONDS:
+                        stats["slow"] += 1
+                if elapsed >= DB_WRITE_SLOW_SECONDS:
+                    logger.warning(f"Slow database write '{operation}' took {elapsed:.3f}s (connection checkout, lock waits or I/O).")
+        return wrapper
+    return decorator
+
+def get_db_write_stats() -> dict:
+    """Statistik penulisan per operasi sejak proses dimulai: count, total/avg/max detik, jumlah penulisan lambat."""
+    with _db_write_stats_lock:
+        return {
+            operation: dict(stats, avg_seconds=stats["total_seconds"] / stats["count"] if stats["count"] else 0.0)
+            for operation, stats in _db_write_stats.items()
+        }
+
+# Penulisan massal: banyak baris per statement (INSERT ... VALUES (...), (...), ...) alih-alih satu statement per baris
+_bulk_write_stats = defaultdict(lambda: {"calls": 0, "rows": 0, "pages": 0, "duplicates_dropped": 0, "total_seconds": 0.0})
+_bulk_write_stats_lock = threading.Lock()
+
+def _bulk_write(cur, query, rows, operation: str, conflict_key=None, page_size: int = None, template: str = None) -> int:
+    """
+    Menjalankan query 'INSERT ... VALUES %s ...' untuk semua rows dengan execute_values, page_size baris per statement.
+
+    conflict_key: indeks kolom kunci ON CONFLICT. Baris dengan kunci sama dalam satu panggilan dibuang kecuali
+    yang terakhir, karena PostgreSQL menolak satu statement yang meng-update baris yang sama dua kali
+    (dengan satu statement per baris, baris terakhir yang menang).
+    Tidak melakukan commit. Mengembalikan jumlah baris yang dikirim.
+    """
+    rows = list(rows)
+    submitted = len(rows)
+    if conflict_key is not None:
+        rows = list({tuple(row[i] for i in conflict_key): row for row in rows}.values())
+    page_size = page_size or DB_BULK_WRITE_PAGE_SIZE
+    start = time.perf_counter()
+    if rows:
+        execute_values(cur, query, rows, template=template, page_size=page_size)
+    elapsed = time.perf_counter() - start
+    DB_BATCH_ROWS.observe(len(rows), operation=operation)
+    with _bulk_write_stats_lock:
+        stats = _bulk_write_stats[operation]
+        stats["calls"] += 1
+        stats["rows"] += len(rows)
+        stats["pages"] += -(-len(rows) // page_size)
+        stats["duplicates_dropped"] += submitted - len(rows)
+        stats["total_seconds"] += elapsed
+    logger.debug(f"Bulk write '{operation}': {len(rows)} rows in {elapsed:.3f}s ({submitted - len(rows)} duplicate keys dropped).")
+    return len(rows)
+
+def get_bulk_write_stats() -> dict:
+    """Statistik penulisan massal per operasi: calls, rows, pages, duplicates_dropped, total detik dan baris per detik."""
+    with _bulk_write_stats_lock:
+        return {
+            operation: dict(stats, rows_per_second=stats["rows"] / stats["total_seconds"] if stats["total_seconds"] else 0.0)
+            for operation, stats in _bulk_write_stats.items()
+        }
+
+def get_blocked_db_sessions() -> list:
+    """
+    Mengembalikan sesi PostgreSQL di database ini yang sedang menunggu lock, beserta PID yang memblokirnya.
+    Berguna untuk melihat siapa yang menahan lock saat get_db_write_stats() menunjukkan penulisan lambat.
+    """
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            return []
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT pid, pg_blocking_pids(pid), wait_event, now() - query_start, left(query, 200)
+            FROM pg_stat_activity
+            WHERE datname = current_database() AND wait_event_type = 'Lock';
+        """)
+        columns = ["pid", "blocking_pids", "wait_event", "waiting_for", "query"]
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+    except psycopg2.Error as e:
+        logger.warning(f"Error reading blocked sessions from pg_stat_activity: {e}")
+        return []
+    finally:
+        if cur: cur.close()
+        if conn:
+            conn.rollback()
+            close_db_connection(conn)
 
-db_write_lock = threading.RLock()
+# Nilai metrik shift real-time terakhir yang berhasil ditulis, untuk melewati upsert yang tidak berarti
+_last_saved_shift_metrics = {}
+_last_saved_shift_metrics_lock = threading.Lock()
+_shift_metrics_write_stats = {"submitted": 0, "written": 0, "skipped": 0}
 
 def format_seconds_to_hhmm(seconds):
     if seconds is None:
@@ -62,36 +292,200 @@ def parse_hhmm_to_seconds(hhmm_str):
         logger.warning(f"Could not parse HH:MM string '{hhmm_str}' to seconds. Returning 0.0.")
         return 0.0
 
-# Global connection pool     
-db_pool = None
+# --- Pool koneksi per peran ---
+# Setiap peran punya pool sendiri yang dibatasi, sehingga lonjakan query laporan tidak bisa
+# menghabiskan koneksi milik ingestion. Pool dibuat saat pertama kali dipakai, jadi proses
+# dashboard hanya membuka pool dashboard/analytics dan main_app hanya pool yang dipakainya.
+DB_ROLE_INGESTION = "ingestion"
+DB_ROLE_ANALYTICS = "analytics"
+DB_ROLE_DASHBOARD = "dashboard"
 
-def init_db_pool():
-    global db_pool
-    if db_pool is None:
+class PoolCheckoutTimeout(PoolError):
+    """Tidak ada koneksi yang kembali ke pool dalam batas waktu checkout."""
+
+class RoleConnectionPool:
+    """
+    ThreadedConnectionPool dengan batas checkout ber-timeout, health check untuk koneksi
+    yang lama menganggur, dan statistik pemakaian.
+
+    Args:
+        role (str): Nama peran pool (untuk log dan statistik).
+        minconn (int): Koneksi yang dibuka saat pool dibuat.
+        maxconn (int): Batas koneksi terbuka sekaligus.
+        checkout_timeout (float): Lama menunggu koneksi bebas sebelum menyerah (detik).
+        idle_check_seconds (float): Koneksi yang menganggur lebih lama dari ini diperiksa dengan SELECT 1.
+        **db_config: Parameter koneksi psycopg2.
+    """
+
+    def __init__(self, role, minconn, maxconn, checkout_timeout, idle_check_seconds, **db_config):
+        self.role = role
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.checkout_timeout = checkout_timeout
+        self.idle_check_seconds = idle_check_seconds
+        self._pool = ThreadedConnectionPool(minconn, maxconn, **db_config)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._checked_out = set()
+        self._returned_at = {}
+        self._stats = {"checkouts": 0, "timeouts": 0, "total_wait_seconds": 0.0, "max_wait_seconds": 0.0, "max_in_use": 0, "replaced": 0}
+
+    def getconn(self, timeout=None):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.checkout_timeout if timeout is None else timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            DB_POOL_CHECKOUT_TIMEOUTS.inc(role=self.role)
+            raise PoolCheckoutTimeout(f"No '{self.role}' connection available within {self.checkout_timeout}s ({self.maxconn} in use).")
         try:
-            db_pool = ThreadedConnectionPool(1, 300, **DB_CONFIG) 
-            logger.info("Database connection pool initialized.")
+            conn = self._healthy(self._pool.getconn())
+        except Exception:
+            self._slots.release()
+            raise
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._checked_out.add(id(conn))
+            self._stats["checkouts"] += 1
+            self._stats["total_wait_seconds"] += waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+            self._stats["max_in_use"] = max(self._stats["max_in_use"], len(self._checked_out))
+        return conn
+
+    def _healthy(self, conn):
+        with self._lock:
+            returned_at = self._returned_at.pop(id(conn), None)
+        if not conn.closed and (returned_at is None or time.monotonic() - returned_at < self.idle_check_seconds):
+            return conn
+        try:
+            if conn.closed:
+                raise psycopg2.InterfaceError("connection already closed")
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return conn
         except psycopg2.Error as e:
-            logger.critical(f"Error initializing database connection pool: {e}", exc_info=True)
-            raise ConnectionError("Failed to initialize database connection pool.") from e
-    return db_pool
+            logger.warning(f"Discarding broken '{self.role}' pool connection: {e}")
+            self._pool.putconn(conn, close=True)
+            with self._lock:
+                self._stats["replaced"] += 1
+            return self._pool.getconn()
+
+    def owns(self, conn) -> bool:
+        with self._lock:
+            return id(conn) in self._checked_out
+
+    def putconn(self, conn, close=False):
+        with self._lock:
+            if id(conn) not in self._checked_out:
+                logger.warning(f"Connection returned to '{self.role}' pool was not checked out from it. Ignoring.")
+                return
+            self._checked_out.discard(id(conn))
+            if not close and not conn.closed:
+                self._returned_at[id(conn)] = time.monotonic()
+        try:
+            self._pool.putconn(conn, close=close or bool(conn.closed))
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_use"] = len(self._checked_out)
+        stats["minconn"] = self.minconn
+        stats["maxconn"] = self.maxconn
+        stats["avg_wait_seconds"] = stats["total_wait_seconds"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        return stats
+
+    def closeall(self):
+        self._pool.closeall()
+
+# Global connection pools per peran
+db_pools = {}
+_db_pools_lock = threading.Lock()
+_default_db_role = DB_ROLE_DASHBOARD
+_db_role_local = threading.local()
+# Pool peran default proses ini; dipertahankan untuk kode yang memeriksa 'db_pool is None'
+db_pool = None
 
-def connect_db():
+def _pool_connection_config() -> dict:
+    """Parameter koneksi pool. Jika DB_PROXY_CONFIG diisi, pool terhubung lewat proxy (misal PgBouncer)."""
+    if DB_PROXY_CONFIG:
+        return dict(DB_CONFIG, **DB_PROXY_CONFIG)
+    return dict(DB_CONFIG)
+
+def set_default_db_role(role: str):
+    """Menentukan peran pool untuk thread yang tidak memanggil set_db_role (panggil sebelum init_db_pool)."""
+    global _default_db_role
+    _default_db_role = role
+
+def set_db_role(role: str):
+    """Menentukan peran pool yang dipakai connect_db() di thread ini."""
+    _db_role_local.role = role
+
+def get_db_role() -> str:
+    return getattr(_db_role_local, "role", _default_db_role)
+
+def _get_role_pool(role: str) -> RoleConnectionPool:
+    pool = db_pools.get(role)
+    if pool is not None:
+        return pool
+    with _db_pools_lock:
+        pool = db_pools.get(role)
+        if pool is None:
+            minconn, maxconn = DB_POOL_SIZES.get(role, (1, 4))
+            pool = RoleConnectionPool(role, minconn, maxconn, DB_POOL_CHECKOUT_TIMEOUT_SECONDS, DB_POOL_HEALTH_CHECK_IDLE_SECONDS, **_pool_connection_config())
+            db_pools[role] = pool
+            target = "proxy" if DB_PROXY_CONFIG else "database"
+            logger.info(f"Database connection pool '{role}' initialized ({minconn}-{maxconn} connections via {target}).")
+        return pool
+
+def init_db_pool(role: str = None):
     global db_pool
+    try:
+        pool = _get_role_pool(role or _default_db_role)
+    except psycopg2.Error as e:
+        logger.critical(f"Error initializing database connection pool: {e}", exc_info=True)
+        raise ConnectionError("Failed to initialize database connection pool.") from e
     if db_pool is None:
+        db_pool = pool
+    return pool
+
+def connect_db():
+    role = get_db_role()
+    if db_pool is None and role not in db_pools:
         logger.error("DB pool is None. The application tried to get a connection before the pool was initialized.")
         return None
     try:
-        conn = db_pool.getconn()
-        return conn
+        return _get_role_pool(role).getconn()
+    except PoolCheckoutTimeout as e:
+        logger.warning(f"Database connection checkout timed out: {e}")
+        return None
     except psycopg2.Error as e:
         logger.critical(f"Error getting connection from pool: {e}", exc_info=True)
         return None
         
 def close_db_connection(conn):
-    global db_pool
-    if conn and db_pool:
-        db_pool.putconn(conn)
+    if not conn:
+        return
+    for pool in list(db_pools.values()):
+        if pool.owns(conn):
+            pool.putconn(conn)
+            return
+    logger.warning("Connection does not belong to any database pool. Closing it.")
+    conn.close()
+
+def get_db_pool_stats() -> dict:
+    """Statistik pemakaian setiap pool: koneksi dipakai, puncak pemakaian, waktu tunggu checkout, timeout."""
+    return {role: pool.stats() for role, pool in list(db_pools.items())}
+
+DB_POOL_IN_USE = metrics.gauge("iot_db_pool_connections_in_use", "Connections currently checked out of each pool.", ("role",))
+DB_POOL_CHECKOUT_TIMEOUTS = metrics.counter("iot_db_pool_checkout_timeouts_total", "Connection checkouts that timed out.", ("role",))
+
+def _collect_db_pool_metrics():
+    for role, stats in get_db_pool_stats().items():
+        DB_POOL_IN_USE.set(stats["in_use"], role=role)
+
+metrics.get_registry().add_collector(_collect_db_pool_metrics)
         
 def init_db():
     logger.info("Initializing database tables...")
@@ -102,6 +496,22 @@ def init_db():
 
     current_dt_object = datetime.datetime.now(timezone.utc)
 
+    if not create_program_dim_table(PROGRAM_DIM_TABLE):
+        logger.error("Failed to initialize program dimension table.")
+        sys.exit(1)
+
+    if not create_program_alias_table(PROGRAM_ALIAS_TABLE):
+        logger.error("Failed to initialize program alias table.")
+        sys.exit(1)
+
+    if not create_program_target_table(PROGRAM_TARGET_TABLE):
+        logger.error("Failed to initialize program target table.")
+        sys.exit(1)
+
+    if not create_shift_finalization_watermark_table(SHIFT_FINALIZATION_WATERMARK_TABLE):
+        logger.error("Failed to initialize shift finalization watermark table.")
+        sys.exit(1)
+
     if not create_status_log_table(get_status_log_table_name(current_dt_object)):
         logger.error("Failed to initialize status log table.")
         sys.exit(1)
@@ -133,6 +543,11 @@ def init_db():
     if not create_main_program_analysis_table_monthly(get_main_program_analysis_table_name(current_dt_object)):
         logger.error("Failed to initialize main program report archive table.")
         sys.exit(1)
+
+    migrate_program_id_columns()
+
+    if not precreate_next_month_tables(current_dt_object):
+        logger.warning("Could not pre-create all tables for next month. Will retry from the shift calculation thread.")
     
     logger.info("Database initialization complete.")
 
@@ -162,9 +577,40 @@ def get_main_program_analysis_table_name(dt_obj: datetime.datetime) -> str:
     return dt_obj.strftime("main_program_analysis_%Y_%m").lower()
 # --- AKHIR BARU ---
 
+def _monthly_table_families():
+    """Pasangan (fungsi nama tabel, fungsi create) untuk semua tabel bulanan."""
+    return [
+        (get_status_log_table_name, create_status_log_table),
+        (get_shift_metrics_table_name, create_shift_metrics_table),
+        (get_final_shift_metrics_table_name, create_final_shift_metrics_table_if_not_exists),
+        (get_program_report_table_name, create_program_report_table_monthly),
+        (get_sub_program_analysis_table_name, create_sub_program_analysis_table_monthly),
+        (get_main_program_analysis_table_name, create_main_program_analysis_table_monthly),
+        (get_program_loss_breakdown_reports_table_name, create_program_loss_breakdown_reports_table),
+        (get_program_loss_breakdown_per_piece_reports_table_name, create_program_loss_breakdown_per_piece_reports_table),
+    ]
+
+def ensure_monthly_tables(dt_obj: datetime.datetime) -> bool:
+    """Memastikan semua tabel bulanan untuk bulan dt_obj ada. Tabel yang sudah ada di registry dilewati tanpa DDL."""
+    all_ok = True
+    for table_name_func, create_func in _monthly_table_families():
+        if not create_func(table_name_func(dt_obj)):
+            all_ok = False
+    return all_ok
+
+def precreate_next_month_tables(now: datetime.datetime) -> bool:
+    """
+    Membuat tabel bulan ini dan bulan depan lebih awal, agar pergantian bulan tidak memicu DDL
+    di jalur penulisan. Murah untuk dipanggil setiap siklus: setelah terverifikasi hanya lookup registry.
+    """
+    current_ok = ensure_monthly_tables(now)
+    next_ok = ensure_monthly_tables(now + relativedelta(months=1))
+    return current_ok and next_ok
+
 # --- BARU: Fungsi untuk membuat tabel arsip program induk ---
+@_ensure_schema_once
 def create_main_program_analysis_table_monthly(table_name: str) -> bool:
-    with db_write_lock:
+    with _ddl_lock:
         conn = None
         cur = None
         try:
@@ -215,6 +661,7 @@ def create_main_program_analysis_table_monthly(table_name: str) -> bool:
             if conn: close_db_connection(conn)
 # --- AKHIR BARU ---
 
+@_instrument_write("save_main_program_analysis")
 def save_main_program_analysis(machine_name: str, report_date: datetime.date, df_main_program_report: pd.DataFrame) -> bool:
     if df_main_program_report.empty:
         logger.info(f"No main program Analysis report data for {machine_name} on {report_date} to archive.")
@@ -226,66 +673,65 @@ def save_main_program_analysis(machine_name: str, report_date: datetime.date, df
         logger.error(f"Failed to ensure main program archive table '{table_name}' exists before saving.")
         return False
 
-    with db_write_lock:
-        conn = None
-        cur = None
-        try:
-            conn = connect_db()
-            if conn is None:
-                logger.error(f"Failed to connect to database for saving main program report for {machine_name} on {report_date}.")
-                return False
-            cur = conn.cursor()
-
-            insert_query = sql.SQL("""
-                INSERT INTO {} (
-                    machine_name, report_date, program_main_name, session_start_time, 
-                    session_end_time, total_process_time_seconds, total_loss_time_seconds, 
-                    cycle_time_seconds, quantity, notes, notes_qty
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) 
-                ON CONFLICT (machine_name, program_main_name, session_start_time) DO UPDATE SET
-                    session_end_time = EXCLUDED.session_end_time,
-                    total_process_time_seconds = EXCLUDED.total_process_time_seconds,
-                    total_loss_time_seconds = EXCLUDED.total_loss_time_seconds,
-                    cycle_time_seconds = EXCLUDED.cycle_time_seconds,
-                    quantity = EXCLUDED.quantity,
-                    notes = EXCLUDED.notes,
-                    notes_qty = EXCLUDED.notes_qty,               
-                    archived_at = CURRENT_TIMESTAMP;
-            """).format(sql.Identifier(table_name))
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error(f"Failed to connect to database for saving main program report for {machine_name} on {report_date}.")
+            return False
+        cur = conn.cursor()
 
-            data_to_insert = []
-            for _, row in df_main_program_report.iterrows():
-                # Pastikan semua nilai memiliki tipe data yang benar dan tidak None
-                data_to_insert.append((
-                    machine_name,
-                    report_date,
-                    row['program_main_name'],
-                    row['session_start_time'].astimezone(timezone.utc),
-                    row['session_end_time'].astimezone(timezone.utc),
-                    float(row.get('total_process_time_seconds', 0.0)),
-                    float(row.get('total_loss_time_seconds', 0.0)),
-                    float(row.get('cycle_time_seconds', 0.0)),
-                    int(row.get('Quantity', 0)),
-                    str(row.get('notes_induk', '')),
-                    str(row.get('Catatan', ''))
-                ))
+        insert_query = sql.SQL("""
+            INSERT INTO {} (
+                machine_name, report_date, program_main_name, session_start_time, 
+                session_end_time, total_process_time_seconds, total_loss_time_seconds, 
+                cycle_time_seconds, quantity, notes, notes_qty
+            )
+            VALUES %s
+            ON CONFLICT (machine_name, program_main_name, session_start_time) DO UPDATE SET
+                session_end_time = EXCLUDED.session_end_time,
+                total_process_time_seconds = EXCLUDED.total_process_time_seconds,
+                total_loss_time_seconds = EXCLUDED.total_loss_time_seconds,
+                cycle_time_seconds = EXCLUDED.cycle_time_seconds,
+                quantity = EXCLUDED.quantity,
+                notes = EXCLUDED.notes,
+                notes_qty = EXCLUDED.notes_qty,               
+                archived_at = CURRENT_TIMESTAMP;
+        """).format(sql.Identifier(table_name))
+
+        data_to_insert = []
+        for _, row in df_main_program_report.iterrows():
+            # Pastikan semua nilai memiliki tipe data yang benar dan tidak None
+            data_to_insert.append((
+                machine_name,
+                report_date,
+                row['program_main_name'],
+                row['session_start_time'].astimezone(timezone.utc),
+                row['session_end_time'].astimezone(timezone.utc),
+                float(row.get('total_process_time_seconds', 0.0)),
+                float(row.get('total_loss_time_seconds', 0.0)),
+                float(row.get('cycle_time_seconds', 0.0)),
+                int(row.get('Quantity', 0)),
+                str(row.get('notes_induk', '')),
+                str(row.get('Catatan', ''))
+            ))
             
-            cur.executemany(insert_query, data_to_insert)
-            conn.commit()
-            logger.info(f"Successfully archived main program report for {machine_name} on {report_date} ({len(df_main_program_report)} sessions) to table '{table_name}'.")
-            return True
-        except psycopg2.Error as e:
-            logger.error(f"Database error saving main program report for {machine_name} on {report_date}: {e}", exc_info=True)
-            if conn: conn.rollback()
-            return False
-        except Exception as e:
-            logger.critical(f"CRITICAL: An unexpected error occurred while saving main program report for {machine_name} on {report_date}: {e}", exc_info=True)
-            if conn: conn.rollback()
-            return False
-        finally:
-            if cur: cur.close()
-            if conn: close_db_connection(conn)
+        _bulk_write(cur, insert_query, data_to_insert, "save_main_program_analysis", conflict_key=(0, 2, 3))
+        conn.commit()
+        logger.info(f"Successfully archived main program report for {machine_name} on {report_date} ({len(df_main_program_report)} sessions) to table '{table_name}'.")
+        return True
+    except psycopg2.Error as e:
+        logger.error(f"Database error saving main program report for {machine_name} on {report_date}: {e}", exc_info=True)
+        if conn: conn.rollback()
+        return False
+    except Exception as e:
+        logger.critical(f"CRITICAL: An unexpected error occurred while saving main program report for {machine_name} on {report_date}: {e}", exc_info=True)
+        if conn: conn.rollback()
+        return False
+    finally:
+        if cur: cur.close()
+        if conn: close_db_connection(conn)
 # --- AKHIR BARU ---
 
 # --- BARU: Fungsi untuk mengambil laporan program induk dari arsip ---
@@ -343,8 +789,7 @@ def get_main_program_report(machine_name: str = None, start_date: datetime.date
 
         for table_name in sorted(list(table_names_to_query)):
             try:
-                cur.execute(sql.SQL("SELECT to_regclass({})").format(sql.Literal(table_name)))
-                if cur.fetchone()[0] is None:
+                if not table_exists(table_name, cur):
                     logger.debug(f"Main program archive table '{table_name}' does not exist. Skipping.")
                     continue
                 
@@ -385,8 +830,9 @@ def get_main_program_report(machine_name: str = None, start_date: datetime.date
         if conn: close_db_connection(conn)
 # --- AKHIR BARU ---
 
+@_ensure_schema_once
 def create_sub_program_analysis_table_monthly(table_name: str) -> bool:
-    with db_write_lock:
+    with _ddl_lock:
         conn = None
         cur = None
         try:
@@ -437,6 +883,7 @@ def create_sub_program_analysis_table_monthly(table_name: str) -> bool:
             if cur: cur.close()
             if conn: close_db_connection(conn)
 
+@_instrument_write("save_sub_program_analysis_report")
 def save_sub_program_analysis_report(machine_name: str, report_date: datetime.date, df_efficiency: pd.DataFrame) -> bool:
     if df_efficiency.empty:
         logger.info(f"No efficiency data for {machine_name} on {report_date} to archive.")
@@ -448,69 +895,68 @@ def save_sub_program_analysis_report(machine_name: str, report_date: datetime.da
         logger.error(f"Failed to ensure archive table '{table_name}' exists before saving efficiency report.")
         return False
 
-    with db_write_lock:
-        conn = None
-        cur = None
-        try:
-            conn = connect_db()
-            if conn is None:
-                logger.error(f"Failed to connect to database for saving program efficiency report for {machine_name} on {report_date}.")
-                return False
-            cur = conn.cursor()
-
-            insert_query = sql.SQL("""
-                INSERT INTO {} (
-                    machine_name, report_date, program_name, actual_avg_duration_seconds, 
-                    target_duration_seconds, efficiency_percent, efficiency_status, 
-                    actual_spindle_speed_mode, actual_feed_rate_mode, 
-                    target_spindle_speed, target_feed_rate, notes
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) 
-                ON CONFLICT (machine_name, report_date, program_name) DO UPDATE SET
-                    actual_avg_duration_seconds = EXCLUDED.actual_avg_duration_seconds,
-                    target_duration_seconds = EXCLUDED.target_duration_seconds,
-                    efficiency_percent = EXCLUDED.efficiency_percent,
-                    efficiency_status = EXCLUDED.efficiency_status,
-                    actual_spindle_speed_mode = EXCLUDED.actual_spindle_speed_mode, 
-                    actual_feed_rate_mode = EXCLUDED.actual_feed_rate_mode,     
-                    target_spindle_speed = EXCLUDED.target_spindle_speed,      
-                    target_feed_rate = EXCLUDED.target_feed_rate,              
-                    notes = EXCLUDED.notes,                                    
-                    archived_at = CURRENT_TIMESTAMP;
-            """).format(sql.Identifier(table_name))
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error(f"Failed to connect to database for saving program efficiency report for {machine_name} on {report_date}.")
+            return False
+        cur = conn.cursor()
 
-            data_to_insert = []
-            for _, row in df_efficiency.iterrows():
-                data_to_insert.append((
-                    machine_name,
-                    report_date, 
-                    row['program_name'],
-                    float(row.get('actual_avg_duration_per_piece_seconds', 0.0)),
-                    float(row.get('target_duration_seconds', 0.0)),
-                    float(row.get('efficiency_percent', 0.0)),
-                    str(row.get('efficiency_status', '')),
-                    int(row.get('most_common_spindle_speed', 0)), 
-                    int(row.get('most_common_feed_rate', 0)),     
-                    int(row.get('target_spindle_speed', 0)),     
-                    int(row.get('target_feed_rate', 0)),         
-                    str(row.get('notes', ''))
-                ))
+        insert_query = sql.SQL("""
+            INSERT INTO {} (
+                machine_name, report_date, program_name, actual_avg_duration_seconds, 
+                target_duration_seconds, efficiency_percent, efficiency_status, 
+                actual_spindle_speed_mode, actual_feed_rate_mode, 
+                target_spindle_speed, target_feed_rate, notes
+            )
+            VALUES %s
+            ON CONFLICT (machine_name, report_date, program_name) DO UPDATE SET
+                actual_avg_duration_seconds = EXCLUDED.actual_avg_duration_seconds,
+                target_duration_seconds = EXCLUDED.target_duration_seconds,
+                efficiency_percent = EXCLUDED.efficiency_percent,
+                efficiency_status = EXCLUDED.efficiency_status,
+                actual_spindle_speed_mode = EXCLUDED.actual_spindle_speed_mode, 
+                actual_feed_rate_mode = EXCLUDED.actual_feed_rate_mode,     
+                target_spindle_speed = EXCLUDED.target_spindle_speed,      
+                target_feed_rate = EXCLUDED.target_feed_rate,              
+                notes = EXCLUDED.notes,                                    
+                archived_at = CURRENT_TIMESTAMP;
+        """).format(sql.Identifier(table_name))
+
+        data_to_insert = []
+        for _, row in df_efficiency.iterrows():
+            data_to_insert.append((
+                machine_name,
+                report_date, 
+                row['program_name'],
+                float(row.get('actual_avg_duration_per_piece_seconds', 0.0)),
+                float(row.get('target_duration_seconds', 0.0)),
+                float(row.get('efficiency_percent', 0.0)),
+                str(row.get('efficiency_status', '')),
+                int(row.get('most_common_spindle_speed', 0)), 
+                int(row.get('most_common_feed_rate', 0)),     
+                int(row.get('target_spindle_speed', 0)),     
+                int(row.get('target_feed_rate', 0)),         
+                str(row.get('notes', ''))
+            ))
             
-            cur.executemany(insert_query, data_to_insert)
-            conn.commit()
-            logger.info(f"Successfully archived efficiency report for {machine_name} on {report_date} ({len(df_efficiency)} programs) to table '{table_name}'.")
-            return True
-        except psycopg2.Error as e:
-            logger.error(f"Database error saving program efficiency report for {machine_name} on {report_date}: {e}", exc_info=True)
-            if conn: conn.rollback()
-            return False
-        except Exception as e:
-            logger.critical(f"CRITICAL: An unexpected error occurred while saving program efficiency report for {machine_name} on {report_date}: {e}", exc_info=True)
-            if conn: conn.rollback()
-            return False
-        finally:
-            if cur: cur.close()
-            if conn: close_db_connection(conn)
+        _bulk_write(cur, insert_query, data_to_insert, "save_sub_program_analysis_report", conflict_key=(0, 1, 2))
+        conn.commit()
+        logger.info(f"Successfully archived efficiency report for {machine_name} on {report_date} ({len(df_efficiency)} programs) to table '{table_name}'.")
+        return True
+    except psycopg2.Error as e:
+        logger.error(f"Database error saving program efficiency report for {machine_name} on {report_date}: {e}", exc_info=True)
+        if conn: conn.rollback()
+        return False
+    except Exception as e:
+        logger.critical(f"CRITICAL: An unexpected error occurred while saving program efficiency report for {machine_name} on {report_date}: {e}", exc_info=True)
+        if conn: conn.rollback()
+        return False
+    finally:
+        if cur: cur.close()
+        if conn: close_db_connection(conn)
 
 def get_sub_program_analysis_report(
     machine_name: str = None, 
@@ -573,8 +1019,7 @@ def get_sub_program_analysis_report(
 
         for table_name in sorted(list(table_names_to_query)):
             try:
-                cur.execute(sql.SQL("SELECT to_regclass({})").format(sql.Literal(table_name)))
-                if cur.fetchone()[0] is None:
+                if not table_exists(table_name, cur):
                     logger.debug(f"Archive table '{table_name}' does not exist. Skipping.")
                     continue
                 
@@ -614,8 +1059,9 @@ def get_sub_program_analysis_report(
         if cur: cur.close()
         if conn: close_db_connection(conn)
 
+@_ensure_schema_once
 def create_status_log_table(table_name: str): 
-    with db_write_lock: 
+    with _ddl_lock:
         conn = None
         cur = None
         try:
@@ -634,11 +1080,22 @@ def create_status_log_table(table_name: str):
                         spindle_speed INTEGER,
                         feed_rate INTEGER,
                         current_program VARCHAR(255), 
+                        program_id INTEGER,
                         raw_log_data JSONB, 
                         created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
                         UNIQUE (machine_name, timestamp_log)
                     );
-                """).format(sql.Identifier(table_name)))
+                    -- Tabel lama dibuat sebelum ada dimensi program
+                    ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS program_id INTEGER;
+                    -- Pencarian prefix nama program di get_program_report_from_db2 (upper(current_program) LIKE ...)
+                    CREATE INDEX IF NOT EXISTS {idx_program_prefix} ON {table_name}
+                        (machine_name, (upper(current_program)) text_pattern_ops)
+                        WHERE status_text = 'Running';
+                """).format(
+                    sql.Identifier(table_name),
+                    idx_program_prefix=sql.Identifier(f"idx_{table_name}_running_program_prefix"),
+                    table_name=sql.Identifier(table_name),
+                ))
                 conn.commit()
                 logger.debug(f"Table '{table_name}' checked/created successfully.")
                 return True
@@ -653,8 +1110,9 @@ def create_status_log_table(table_name: str):
             if conn:
                 close_db_connection(conn)
 
+@_ensure_schema_once
 def create_shift_metrics_table(table_name: str) -> bool:
-    with db_write_lock: 
+    with _ddl_lock:
         conn = None
         cur = None
         try:
@@ -665,7 +1123,7 @@ def create_shift_metrics_table(table_name: str) -> bool:
             if conn:  
                 cur = conn.cursor()
                 cur.execute(sql.SQL("""
-                    CREATE TABLE IF NOT EXISTS {} (
+                    CREATE TABLE IF NOT EXISTS {table_name} (
                         machine_name VARCHAR(255) NOT NULL,
                         shift_name VARCHAR(50) NOT NULL,
                         runtime_seconds REAL NOT NULL,
@@ -676,7 +1134,11 @@ def create_shift_metrics_table(table_name: str) -> bool:
                         last_updated TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
                         PRIMARY KEY (machine_name, shift_name, shift_start_time)
                     );
-                """).format(sql.Identifier(table_name)))
+                    CREATE INDEX IF NOT EXISTS {idx_shift} ON {table_name} (shift_start_time, shift_name);
+                """).format(
+                    table_name=sql.Identifier(table_name),
+                    idx_shift=sql.Identifier(f"idx_{table_name}_shift"),
+                ))
                 conn.commit()
                 logger.debug(f"Table '{table_name}' checked/created successfully.")
                 return True
@@ -690,8 +1152,9 @@ def create_shift_metrics_table(table_name: str) -> bool:
                 cur.close()
             if conn:
                 close_db_connection(conn)
+@_ensure_schema_once
 def create_final_shift_metrics_table_if_not_exists(table_name: str):
-    with db_write_lock:
+    with _ddl_lock:
         conn = None
         cur = None
         try:
@@ -729,13 +1192,9 @@ def create_final_shift_metrics_table_if_not_exists(table_name: str):
             if conn:
                 close_db_connection(conn)
 
+@_ensure_schema_once
 def create_program_report_table_monthly(table_name: str) -> bool:
-    with _verified_table_lock:
-        if table_name in _verified_program_report_tables_in_session:
-            logger.debug(f"Table '{table_name}' already verified in this session. Skipping creation.")
-            return True
-        
-    with db_write_lock:
+    with _ddl_lock:
         conn = None
         cur = None
         try:
@@ -756,12 +1215,15 @@ def create_program_report_table_monthly(table_name: str) -> bool:
                     end_time TIMESTAMP WITH TIME ZONE NOT NULL,
                     duration_seconds INTEGER NOT NULL,
                     report_date DATE NOT NULL,
+                    program_id INTEGER,
                     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
                     CONSTRAINT {} UNIQUE (machine_name, program_name, start_time)
                 );
+                ALTER TABLE {table_name_for_index_1} ADD COLUMN IF NOT EXISTS program_id INTEGER;
                 CREATE INDEX IF NOT EXISTS {idx_machine} ON {table_name_for_index_1} (machine_name);
                 CREATE INDEX IF NOT EXISTS {idx_report_date} ON {table_name_for_index_2} (report_date);
                 CREATE INDEX IF NOT EXISTS {idx_start_time} ON {table_name_for_index_3} (start_time);
+                CREATE INDEX IF NOT EXISTS {idx_program_id} ON {table_name_for_index_1} (machine_name, program_id);
             """).format(
                 sql.Identifier(table_name),
                 sql.Identifier(unique_constraint_name),
@@ -770,13 +1232,12 @@ def create_program_report_table_monthly(table_name: str) -> bool:
                 idx_report_date=sql.Identifier(f"idx_{table_name}_report_date"), 
                 table_name_for_index_2=sql.Identifier(table_name),
                 idx_start_time=sql.Identifier(f"idx_{table_name}_start_time"), 
-                table_name_for_index_3=sql.Identifier(table_name)
+                table_name_for_index_3=sql.Identifier(table_name),
+                idx_program_id=sql.Identifier(f"idx_{table_name}_program_id"),
             ))
             
             conn.commit()
             logger.info(f"Table '{table_name}' checked/created successfully.")
-            with _verified_table_lock:
-                _verified_program_report_tables_in_session.add(table_name)
             return True
         except psycopg2.Error as e:
             logger.error(f"Error creating/checking program_report table '{table_name}': {e}", exc_info=True)
@@ -795,44 +1256,41 @@ def create_program_report_table_monthly(table_name: str) -> bool:
                 close_db_connection(conn)
                 
 
-def save_status_log(machine_name: str, timestamp: float, status_text: str, spindle_speed: int, feed_rate: int, current_program: str, table_name: str):
-    with db_write_lock:
-        start_lock_time = time.time()
+# --- Dimensi program: nama program dinormalisasi sekali, baris status/laporan merujuk program_id ---
+_program_id_cache = {}
+_program_id_cache_lock = threading.Lock()
+
+@_ensure_schema_once
+def create_program_dim_table(table_name: str) -> bool:
+    with _ddl_lock:
         conn = None
         cur = None
         try:
             conn = connect_db()
             if conn is None:
-                logger.error(f"Failed to connect to database to save status log for {machine_name}.")
+                logger.error(f"Failed to connect to database to create program dimension table '{table_name}'.")
                 return False
-            if conn:
-                cur = conn.cursor()
-                dt_object = datetime.datetime.fromtimestamp(timestamp).astimezone(datetime.timezone.utc)
-                    
-                raw_log_data_dict = {
-                    "timestamp": timestamp,
-                    "status_text": status_text,
-                    "spindle_speed": spindle_speed,
-                    "feed_rate": feed_rate,
-                    "current_program": current_program
-                }
-                raw_log_data_json = json.dumps(raw_log_data_dict, default=str)
-
-                cur.execute(sql.SQL("""
-                    INSERT INTO {} (machine_name, timestamp_log, status_text, spindle_speed, feed_rate, current_program, raw_log_data)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (machine_name, timestamp_log) DO NOTHING;
-                """).format(sql.Identifier(table_name)),
-                (machine_name, dt_object, status_text, spindle_speed, feed_rate, current_program, raw_log_data_json))
-                conn.commit()
-                if cur.rowcount > 0:
-                    logger.debug(f"[{machine_name}] Successfully saved status log at {dt_object}.")
-                    return True
-                else:
-                    logger.debug(f"[{machine_name}] Status log at {dt_object} already exists. Skipped.")
-                    return True 
+            cur = conn.cursor()
+            cur.execute(sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {table_name} (
+                    program_id SERIAL PRIMARY KEY,
+                    machine_name VARCHAR(255) NOT NULL,
+                    raw_name VARCHAR(255) NOT NULL,
+                    clean_name VARCHAR(255) NOT NULL,
+                    main_name VARCHAR(255) NOT NULL,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE (machine_name, raw_name)
+                );
+                CREATE INDEX IF NOT EXISTS {idx_main_name} ON {table_name} (machine_name, main_name);
+            """).format(
+                table_name=sql.Identifier(table_name),
+                idx_main_name=sql.Identifier(f"idx_{table_name}_main_name"),
+            ))
+            conn.commit()
+            logger.info(f"Table '{table_name}' checked/created successfully.")
+            return True
         except psycopg2.Error as e:
-            logger.error(f"Error saving status log for {machine_name} to {table_name}: {e}", exc_info=True)
+            logger.error(f"Error creating program dimension table '{table_name}': {e}", exc_info=True)
             if conn:
                 conn.rollback()
             return False
@@ -841,112 +1299,547 @@ def save_status_log(machine_name: str, timestamp: float, status_text: str, spind
                 cur.close()
             if conn:
                 close_db_connection(conn)
-            end_lock_time = time.time()
-            logger.debug(f"db_write_lock held for {end_lock_time - start_lock_time:.4f} seconds while saving status log for {machine_name}.")
 
-def save_shift_metrics(machine_name: str, shift_name: str, runtime_sec: float, idletime_sec: float, other_time_sec: float, shift_start_time: datetime.datetime, shift_end_time: datetime.datetime, table_name: str):
-    with db_write_lock:
+def get_program_ids(machine_program_pairs) -> dict:
+    """
+    Mengembalikan {(machine_name, raw_name): program_id}. Program yang belum dikenal didaftarkan
+    ke program_dim (beserta clean_name dan main_name) dalam transaksinya sendiri, lalu di-cache,
+    sehingga penulisan rutin tidak menyentuh tabel dimensi. Pasangan yang gagal didaftarkan tidak
+    ada di hasil (program_id ditulis NULL dan bisa diisi nanti dengan backfill_program_ids).
+    """
+    pairs = {(machine_name, raw_name) for machine_name, raw_name in machine_program_pairs if machine_name and raw_name}
+    with _program_id_cache_lock:
+        program_ids = {pair: _program_id_cache[pair] for pair in pairs if pair in _program_id_cache}
+    missing = pairs - program_ids.keys()
+    if not missing:
+        return program_ids
+
+    if not create_program_dim_table(PROGRAM_DIM_TABLE):
+        return program_ids
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error("Failed to connect to database to register program names.")
+            return program_ids
+        cur = conn.cursor()
+        rows = execute_values(cur, sql.SQL("""
+            INSERT INTO {} (machine_name, raw_name, clean_name, main_name)
+            VALUES %s
+            ON CONFLICT (machine_name, raw_name) DO UPDATE SET raw_name = EXCLUDED.raw_name
+            RETURNING machine_name, raw_name, program_id;
+        """).format(sql.Identifier(PROGRAM_DIM_TABLE)), [
+            (machine_name, raw_name, *normalize_program_name(raw_name))
+            for machine_name, raw_name in sorted(missing)
+        ], fetch=True)
+        conn.commit()
+        registered = {(machine_name, raw_name): program_id for machine_name, raw_name, program_id in rows}
+        with _program_id_cache_lock:
+            _program_id_cache.update(registered)
+        program_ids.update(registered)
+        logger.debug(f"Registered/resolved {len(registered)} program names in '{PROGRAM_DIM_TABLE}'.")
+        return program_ids
+    except psycopg2.Error as e:
+        logger.error(f"Error registering program names in '{PROGRAM_DIM_TABLE}': {e}", exc_info=True)
+        if conn:
+            conn.rollback()
+        _forget_table_if_undefined(e, PROGRAM_DIM_TABLE)
+        return program_ids
+    finally:
+        if cur: cur.close()
+        if conn: close_db_connection(conn)
+
+def _fetch_unassigned_program_names(table_name: str, name_column: str) -> list:
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error(f"Failed to connect to database to read program names from '{table_name}'.")
+            return []
+        cur = conn.cursor()
+        cur.execute(sql.SQL("""
+            SELECT DISTINCT machine_name, {name_column} FROM {table_name}
+            WHERE program_id IS NULL AND {name_column} IS NOT NULL;
+        """).format(name_column=sql.Identifier(name_column), table_name=sql.Identifier(table_name)))
+        return cur.fetchall()
+    except psycopg2.Error as e:
+        logger.error(f"Error reading unassigned program names from '{table_name}': {e}", exc_info=True)
+        return []
+    finally:
+        if cur: cur.close()
+        if conn:
+            conn.rollback()
+            close_db_connection(conn)
+
+def migrate_program_id_columns():
+    """
+    Memastikan semua tabel status log dan program report yang sudah ada punya kolom program_id
+    (ALTER TABLE ... ADD COLUMN IF NOT EXISTS lewat fungsi create_*). Isi kolomnya dengan backfill_program_ids.
+    """
+    refresh_table_catalog()
+    with _table_catalog_lock:
+        existing_tables = sorted(_table_catalog)
+    for table_name in existing_tables:
+        if table_name.startswith("machine_status_log_"):
+            create_status_log_table(table_name)
+        elif table_name.startswith("program_report_"):
+            create_program_report_table_monthly(table_name)
+
+def backfill_program_ids(start_date: datetime.date, end_date: datetime.date) -> dict:
+    """
+    Mengisi program_id yang masih NULL di tabel status log dan program report bulanan dalam rentang
+    tanggal. Aman dijalankan berulang. Mengembalikan {nama_tabel: jumlah_baris_diperbarui}.
+    """
+    updated = {}
+    table_columns = []
+    month_iter = datetime.datetime.combine(start_date.replace(day=1), datetime.time.min, tzinfo=timezone.utc)
+    while month_iter.date() <= end_date:
+        table_columns.append((get_status_log_table_name(month_iter), "current_program"))
+        table_columns.append((get_program_report_table_name(month_iter), "program_name"))
+        month_iter += relativedelta(months=1)
+
+    for table_name, name_column in table_columns:
+        if not table_exists(table_name):
+            continue
+        # Pastikan kolom program_id ada di tabel lama
+        if table_name.startswith("machine_status_log_"):
+            create_status_log_table(table_name)
+        else:
+            create_program_report_table_monthly(table_name)
+
+        pairs = _fetch_unassigned_program_names(table_name, name_column)
+        if not pairs:
+            updated[table_name] = 0
+            continue
+        program_ids = get_program_ids(pairs)
+
         conn = None
         cur = None
         try:
             conn = connect_db()
             if conn is None:
-                logger.error(f"Failed to connect to database to save real-time shift metrics for {machine_name}.")
-                return False
-            if conn:
-                cur = conn.cursor()
-                shift_start_time_utc = shift_start_time.astimezone(datetime.timezone.utc)
-                shift_end_time_utc = shift_end_time.astimezone(datetime.timezone.utc)
-
-                upsert_query = sql.SQL("""
-                    INSERT INTO {} (machine_name, shift_name, runtime_seconds, idletime_seconds, other_time_seconds, shift_start_time, shift_end_time)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (machine_name, shift_name, shift_start_time) DO UPDATE SET
-                        runtime_seconds = EXCLUDED.runtime_seconds,
-                        idletime_seconds = EXCLUDED.idletime_seconds,
-                        other_time_seconds = EXCLUDED.other_time_seconds,
-                        shift_end_time = EXCLUDED.shift_end_time,
-                        last_updated = CURRENT_TIMESTAMP;
-                """).format(sql.Identifier(table_name))
-
-                cur.execute(upsert_query, (
-                    machine_name,
-                    shift_name,
-                    round(runtime_sec, 2),
-                    round(idletime_sec, 2),
-                    round(other_time_sec, 2),
-                    shift_start_time_utc,
-                    shift_end_time_utc
-                ))
-                conn.commit()
-                if cur.rowcount > 0:
-                    logger.debug(f"Successfully saved/updated real-time shift metrics for {machine_name} - {shift_name} (Start: {shift_start_time.isoformat()}) to {table_name}.")
-                    return True
-                else:
-                    logger.debug(f"Real-time shift metrics for {machine_name} - {shift_name} (Start: {shift_start_time.isoformat()}) unchanged. Skipped update.")
-                    return True
+                logger.error(f"Failed to connect to database to backfill program ids in '{table_name}'.")
+                continue
+            cur = conn.cursor()
+            cur.execute(sql.SQL("""
+                UPDATE {table_name} t SET program_id = d.program_id
+                FROM {dim_table} d
+                WHERE t.program_id IS NULL
+                AND d.machine_name = t.machine_name AND d.raw_name = t.{name_column};
+            """).format(
+                table_name=sql.Identifier(table_name),
+                dim_table=sql.Identifier(PROGRAM_DIM_TABLE),
+                name_column=sql.Identifier(name_column),
+            ))
+            updated[table_name] = cur.rowcount
+            conn.commit()
+            logger.info(f"Backfilled program_id for {cur.rowcount} rows in '{table_name}' ({len(program_ids)} programs).")
         except psycopg2.Error as e:
-            logger.error(f"Error saving/updating real-time shift metrics for {machine_name} - {shift_name} to {table_name}: {e}", exc_info=True)
+            logger.error(f"Error backfilling program ids in '{table_name}': {e}", exc_info=True)
             if conn:
                 conn.rollback()
-            return False
         finally:
-            if cur:
-                cur.close()
-            if conn:
-                close_db_connection(conn)
-
-def save_final_shift_metrics(machine_name: str, shift_name: str, runtime_sec: float, idletime_sec: float, other_time_sec: float, shift_start_time: datetime.datetime, shift_end_time: datetime.datetime):
-    table_name = get_final_shift_metrics_table_name(shift_start_time)
-    
-    if not create_final_shift_metrics_table_if_not_exists(table_name):
-        logger.error(f"Failed to ensure final shift metrics table '{table_name}' exists before saving.")
-        return False
-    
-    with db_write_lock:
-        conn = None
-        cur = None
-        try:
-            conn = connect_db()
-            if conn is None:
-                logger.error(f"Failed to connect to database to save final shift metrics for {machine_name}.")
-                return False
-            if conn:
-                cur = conn.cursor()
-                shift_start_time_utc = shift_start_time.astimezone(datetime.timezone.utc)
-                shift_end_time_utc = shift_end_time.astimezone(datetime.timezone.utc)
+            if cur: cur.close()
+            if conn: close_db_connection(conn)
+    return updated
 
-                cur.execute(sql.SQL("""
-                    INSERT INTO {} (machine_name, shift_name, runtime_seconds, idletime_seconds, other_time_seconds, shift_start_time, shift_end_time)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (machine_name, shift_start_time) DO NOTHING; 
-                """).format(sql.Identifier(table_name)),
-                (machine_name, shift_name, round(runtime_sec, 2), round(idletime_sec, 2), round(other_time_sec, 2), shift_start_time_utc, shift_end_time_utc))
-                conn.commit()
-                if cur.rowcount > 0:
-                    logger.info(f"Final shift metrics for {machine_name} - {shift_name} (Start: {shift_start_time.isoformat()}) saved to {table_name}.")
-                    return True
+@_instrument_write("save_status_log")
+def save_status_log(machine_name: str, timestamp: float, status_text: str, spindle_speed: int, feed_rate: int, current_program: str, table_name: str):
+    program_id = get_program_ids([(machine_name, current_program)]).get((machine_name, current_program))
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error(f"Failed to connect to database to save status log for {machine_name}.")
+            return False
+        if conn:
+            cur = conn.cursor()
+            dt_object = datetime.datetime.fromtimestamp(timestamp).astimezone(datetime.timezone.utc)
+                    
+            raw_log_data_dict = {
+                "timestamp": timestamp,
+                "status_text": status_text,
+                "spindle_speed": spindle_speed,
+                "feed_rate": feed_rate,
+                "current_program": current_program
+            }
+            raw_log_data_json = json.dumps(raw_log_data_dict, default=str)
+
+            cur.execute(sql.SQL("""
+                INSERT INTO {} (machine_name, timestamp_log, status_text, spindle_speed, feed_rate, current_program, program_id, raw_log_data)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (machine_name, timestamp_log) DO NOTHING;
+            """).format(sql.Identifier(table_name)),
+            (machine_name, dt_object, status_text, spindle_speed, feed_rate, current_program, program_id, raw_log_data_json))
+            conn.commit()
+            if cur.rowcount > 0:
+                logger.debug(f"[{machine_name}] Successfully saved status log at {dt_object}.")
+                return True
+            else:
+                logger.debug(f"[{machine_name}] Status log at {dt_object} already exists. Skipped.")
+                return True 
+    except psycopg2.Error as e:
+        logger.error(f"Error saving status log for {machine_name} to {table_name}: {e}", exc_info=True)
+        _forget_table_if_undefined(e, table_name)
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            close_db_connection(conn)
+
+@_instrument_write("save_shift_metrics")
+def save_shift_metrics(machine_name: str, shift_name: str, runtime_sec: float, idletime_sec: float, other_time_sec: float, shift_start_time: datetime.datetime, shift_end_time: datetime.datetime, table_name: str):
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error(f"Failed to connect to database to save real-time shift metrics for {machine_name}.")
+            return False
+        if conn:
+            cur = conn.cursor()
+            shift_start_time_utc = shift_start_time.astimezone(datetime.timezone.utc)
+            shift_end_time_utc = shift_end_time.astimezone(datetime.timezone.utc)
+
+            upsert_query = sql.SQL("""
+                INSERT INTO {} (machine_name, shift_name, runtime_seconds, idletime_seconds, other_time_seconds, shift_start_time, shift_end_time)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (machine_name, shift_name, shift_start_time) DO UPDATE SET
+                    runtime_seconds = EXCLUDED.runtime_seconds,
+                    idletime_seconds = EXCLUDED.idletime_seconds,
+                    other_time_seconds = EXCLUDED.other_time_seconds,
+                    shift_end_time = EXCLUDED.shift_end_time,
+                    last_updated = CURRENT_TIMESTAMP;
+            """).format(sql.Identifier(table_name))
+
+            cur.execute(upsert_query, (
+                machine_name,
+                shift_name,
+                round(runtime_sec, 2),
+                round(idletime_sec, 2),
+                round(other_time_sec, 2),
+                shift_start_time_utc,
+                shift_end_time_utc
+            ))
+            conn.commit()
+            if cur.rowcount > 0:
+                logger.debug(f"Successfully saved/updated real-time shift metrics for {machine_name} - {shift_name} (Start: {shift_start_time.isoformat()}) to {table_name}.")
+                return True
+            else:
+                logger.debug(f"Real-time shift metrics for {machine_name} - {shift_name} (Start: {shift_start_time.isoformat()}) unchanged. Skipped update.")
+                return True
+    except psycopg2.Error as e:
+        logger.error(f"Error saving/updating real-time shift metrics for {machine_name} - {shift_name} to {table_name}: {e}", exc_info=True)
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            close_db_connection(conn)
+
+@_instrument_write("save_shift_metrics_batch")
+def save_shift_metrics_batch(shift_metrics_rows: list, min_change_seconds: float = None) -> dict:
+    """
+    Upsert metrik shift real-time untuk banyak mesin/shift sekaligus: satu statement per tabel bulanan
+    (biasanya hanya satu) dan satu commit. Baris yang runtime/idle/other-nya berubah kurang dari
+    min_change_seconds sejak penulisan terakhir dilewati, kecuali shift-nya sudah berakhir
+    (nilai akhir selalu ditulis jika berbeda dari penulisan terakhir).
+
+    Setiap baris adalah dict dengan kunci: machine_name, shift_name, runtime_sec, idletime_sec,
+    other_time_sec, shift_start_time, shift_end_time.
+    Mengembalikan dict statistik: submitted, written, skipped, ok.
+    """
+    if min_change_seconds is None:
+        min_change_seconds = SHIFT_METRICS_MIN_CHANGE_SECONDS
+
+    stats = {"submitted": len(shift_metrics_rows), "written": 0, "skipped": 0, "ok": True}
+    if not shift_metrics_rows:
+        return stats
+
+    rows_by_table = defaultdict(dict)
+    now_utc = datetime.datetime.now(datetime.timezone.utc)
+    with _last_saved_shift_metrics_lock:
+        for row in shift_metrics_rows:
+            shift_start_time_utc = row["shift_start_time"].astimezone(datetime.timezone.utc)
+            shift_end_time_utc = row["shift_end_time"].astimezone(datetime.timezone.utc)
+            table_name = get_shift_metrics_table_name(shift_start_time_utc)
+            key = (table_name, row["machine_name"], row["shift_name"], shift_start_time_utc)
+            values = (round(row["runtime_sec"], 2), round(row["idletime_sec"], 2), round(row["other_time_sec"], 2), shift_end_time_utc)
+
+            previous = _last_saved_shift_metrics.get(key)
+            if previous is not None and previous[3] == values[3]:
+                if shift_end_time_utc <= now_utc:
+                    # Shift sudah berakhir: nilai terakhir selalu ditulis (kecuali identik), agar perubahan kecil terakhir tidak hilang
+                    unchanged = values[:3] == previous[:3]
                 else:
-                    logger.debug(f"Final shift metrics for {machine_name} - {shift_name} (Start: {shift_start_time.isoformat()}) already exists. Skipped.")
-                    return True
-        except psycopg2.Error as e:
-            logger.error(f"Error saving final shift metrics for {machine_name} - {shift_name} to {table_name}: {e}", exc_info=True)
-            if conn:
-                conn.rollback()
+                    unchanged = all(abs(new - old) < min_change_seconds for new, old in zip(values[:3], previous[:3]))
+            else:
+                unchanged = False
+            if unchanged:
+                stats["skipped"] += 1
+                continue
+            rows_by_table[table_name][key] = values
+
+    to_write = sum(len(rows) for rows in rows_by_table.values())
+    if to_write == 0:
+        _record_shift_metrics_write_stats(stats)
+        return stats
+
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error("Failed to connect to database to save real-time shift metrics batch.")
+            stats["ok"] = False
+            return stats
+        cur = conn.cursor()
+        for table_name, rows in rows_by_table.items():
+            upsert_query = sql.SQL("""
+                INSERT INTO {} (machine_name, shift_name, runtime_seconds, idletime_seconds, other_time_seconds, shift_start_time, shift_end_time)
+                VALUES %s
+                ON CONFLICT (machine_name, shift_name, shift_start_time) DO UPDATE SET
+                    runtime_seconds = EXCLUDED.runtime_seconds,
+                    idletime_seconds = EXCLUDED.idletime_seconds,
+                    other_time_seconds = EXCLUDED.other_time_seconds,
+                    shift_end_time = EXCLUDED.shift_end_time,
+                    last_updated = CURRENT_TIMESTAMP;
+            """).format(sql.Identifier(table_name))
+            _bulk_write(cur, upsert_query, [
+                (machine_name, shift_name, runtime, idletime, other_time, shift_start_time_utc, shift_end_time_utc)
+                for (_, machine_name, shift_name, shift_start_time_utc), (runtime, idletime, other_time, shift_end_time_utc) in rows.items()
+            ], "save_shift_metrics_batch")
+        conn.commit()
+
+        with _last_saved_shift_metrics_lock:
+            for rows in rows_by_table.values():
+                _last_saved_shift_metrics.update(rows)
+            # Buang entri shift lama agar cache tidak tumbuh tanpa batas
+            oldest_kept = now_utc - datetime.timedelta(days=2)
+            for key in [key for key in _last_saved_shift_metrics if key[3] < oldest_kept]:
+                del _last_saved_shift_metrics[key]
+
+        stats["written"] = to_write
+        _record_shift_metrics_write_stats(stats)
+        logger.debug(f"Real-time shift metrics batch: {stats['written']} written, {stats['skipped']} skipped (below {min_change_seconds}s change).")
+        return stats
+    except psycopg2.Error as e:
+        logger.error(f"Error saving real-time shift metrics batch: {e}", exc_info=True)
+        for table_name in rows_by_table:
+            _forget_table_if_undefined(e, table_name)
+        if conn:
+            conn.rollback()
+        stats["ok"] = False
+        return stats
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            close_db_connection(conn)
+
+def _record_shift_metrics_write_stats(stats: dict):
+    with _last_saved_shift_metrics_lock:
+        for field in ("submitted", "written", "skipped"):
+            _shift_metrics_write_stats[field] += stats[field]
+
+def get_shift_metrics_write_stats() -> dict:
+    """Statistik kumulatif save_shift_metrics_batch sejak proses dimulai (submitted/written/skipped)."""
+    with _last_saved_shift_metrics_lock:
+        return dict(_shift_metrics_write_stats)
+
+@_instrument_write("save_final_shift_metrics")
+def save_final_shift_metrics(machine_name: str, shift_name: str, runtime_sec: float, idletime_sec: float, other_time_sec: float, shift_start_time: datetime.datetime, shift_end_time: datetime.datetime, overwrite: bool = False):
+    """Menyimpan metrik shift final. Baris yang sudah ada dibiarkan, kecuali overwrite=True (dipakai saat reprocess)."""
+    table_name = get_final_shift_metrics_table_name(shift_start_time)
+    
+    if not create_final_shift_metrics_table_if_not_exists(table_name):
+        logger.error(f"Failed to ensure final shift metrics table '{table_name}' exists before saving.")
+        return False
+    
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error(f"Failed to connect to database to save final shift metrics for {machine_name}.")
             return False
-        finally:
-            if cur:
-                cur.close()
+        if conn:
+            cur = conn.cursor()
+            shift_start_time_utc = shift_start_time.astimezone(datetime.timezone.utc)
+            shift_end_time_utc = shift_end_time.astimezone(datetime.timezone.utc)
+
+            if overwrite:
+                conflict_action = sql.SQL("""DO UPDATE SET
+                    shift_name = EXCLUDED.shift_name,
+                    runtime_seconds = EXCLUDED.runtime_seconds,
+                    idletime_seconds = EXCLUDED.idletime_seconds,
+                    other_time_seconds = EXCLUDED.other_time_seconds,
+                    shift_end_time = EXCLUDED.shift_end_time""")
+            else:
+                conflict_action = sql.SQL("DO NOTHING")
+            cur.execute(sql.SQL("""
+                INSERT INTO {} (machine_name, shift_name, runtime_seconds, idletime_seconds, other_time_seconds, shift_start_time, shift_end_time)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (machine_name, shift_start_time) {}; 
+            """).format(sql.Identifier(table_name), conflict_action),
+            (machine_name, shift_name, round(runtime_sec, 2), round(idletime_sec, 2), round(other_time_sec, 2), shift_start_time_utc, shift_end_time_utc))
+            conn.commit()
+            if cur.rowcount > 0:
+                logger.info(f"Final shift metrics for {machine_name} - {shift_name} (Start: {shift_start_time.isoformat()}) saved to {table_name}.")
+                return True
+            else:
+                logger.debug(f"Final shift metrics for {machine_name} - {shift_name} (Start: {shift_start_time.isoformat()}) already exists. Skipped.")
+                return True
+    except psycopg2.Error as e:
+        logger.error(f"Error saving final shift metrics for {machine_name} - {shift_name} to {table_name}: {e}", exc_info=True)
+        _forget_table_if_undefined(e, table_name)
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if cur:
+            cur.close()
             
-            if conn:
-                close_db_connection(conn)
+        if conn:
+            close_db_connection(conn)
+
+@_instrument_write("save_final_shift_metrics_batch")
+def save_final_shift_metrics_batch(final_shift_metrics_rows: list, overwrite: bool = False) -> bool:
+    """
+    Menyimpan banyak metrik shift final sekaligus (backfill/reprocess): satu statement multi-baris per tabel
+    bulanan dan satu commit. Setiap baris adalah dict dengan kunci seperti save_shift_metrics_batch.
+    Baris yang sudah ada dibiarkan, kecuali overwrite=True.
+    """
+    if not final_shift_metrics_rows:
+        return True
+
+    rows_by_table = defaultdict(list)
+    for row in final_shift_metrics_rows:
+        shift_start_time_utc = row["shift_start_time"].astimezone(datetime.timezone.utc)
+        rows_by_table[get_final_shift_metrics_table_name(shift_start_time_utc)].append((
+            row["machine_name"],
+            row["shift_name"],
+            round(row["runtime_sec"], 2),
+            round(row["idletime_sec"], 2),
+            round(row["other_time_sec"], 2),
+            shift_start_time_utc,
+            row["shift_end_time"].astimezone(datetime.timezone.utc),
+        ))
+
+    for table_name in rows_by_table:
+        if not create_final_shift_metrics_table_if_not_exists(table_name):
+            logger.error(f"Failed to ensure final shift metrics table '{table_name}' exists before saving batch.")
+            return False
+
+    if overwrite:
+        conflict_action = sql.SQL("""DO UPDATE SET
+            shift_name = EXCLUDED.shift_name,
+            runtime_seconds = EXCLUDED.runtime_seconds,
+            idletime_seconds = EXCLUDED.idletime_seconds,
+            other_time_seconds = EXCLUDED.other_time_seconds,
+            shift_end_time = EXCLUDED.shift_end_time""")
+    else:
+        conflict_action = sql.SQL("DO NOTHING")
+
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error("Failed to connect to database to save final shift metrics batch.")
+            return False
+        cur = conn.cursor()
+        for table_name, rows in rows_by_table.items():
+            _bulk_write(cur, sql.SQL("""
+                INSERT INTO {} (machine_name, shift_name, runtime_seconds, idletime_seconds, other_time_seconds, shift_start_time, shift_end_time)
+                VALUES %s
+                ON CONFLICT (machine_name, shift_start_time) {};
+            """).format(sql.Identifier(table_name), conflict_action), rows, "save_final_shift_metrics_batch", conflict_key=(0, 5))
+        conn.commit()
+        logger.info(f"Saved {len(final_shift_metrics_rows)} final shift metrics rows to {len(rows_by_table)} table(s).")
+        return True
+    except psycopg2.Error as e:
+        logger.error(f"Error saving final shift metrics batch: {e}", exc_info=True)
+        for table_name in rows_by_table:
+            _forget_table_if_undefined(e, table_name)
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            close_db_connection(conn)
+
+@_instrument_write("save_program_cycles_to_db")
+def _load_program_aliases(cur, machine_names, start_time, end_time) -> dict:
+    """
+    Alias rename per mesin yang berlaku di rentang ini, terbaru dulu (urutan yang sama dengan saat dibaca):
+    {machine_name: [(source_name, target_name, target_program_id, valid_from, valid_to), ...]}.
+    """
+    if not machine_names or not table_exists(PROGRAM_ALIAS_TABLE, cur):
+        return {}
+    cur.execute(sql.SQL("""
+        SELECT machine_name, source_name, target_name, target_program_id, valid_from, valid_to
+        FROM {}
+        WHERE machine_name = ANY(%s) AND valid_to >= %s AND valid_from <= %s
+        ORDER BY created_at DESC;
+    """).format(sql.Identifier(PROGRAM_ALIAS_TABLE)), (list(machine_names), start_time, end_time))
+    aliases = defaultdict(list)
+    for machine_name, *alias in cur.fetchall():
+        aliases[machine_name].append(tuple(alias))
+    return aliases
+
+def _resolve_program_alias(aliases: dict, machine_name: str, program_name: str, start_time_utc):
+    """(target_name, target_program_id) dari alias terbaru yang cocok dengan nama mentah atau nama bersih, atau None."""
+    machine_aliases = aliases.get(machine_name)
+    if not machine_aliases:
+        return None
+    clean_name = normalize_program_name(program_name)[0]
+    for source_name, target_name, target_program_id, valid_from, valid_to in machine_aliases:
+        if source_name in (program_name, clean_name) and valid_from <= start_time_utc <= valid_to:
+            return target_name, target_program_id
+    return None
 
-def save_program_cycles_to_db(program_cycles_data: list) -> bool:
-    if not program_cycles_data:
+def save_program_cycles_to_db(program_cycles_data: list, replace_range: tuple = None) -> bool:
+    """
+    Upsert siklus program ke tabel program_report bulanan.
+    replace_range=(machine_name, start_time, end_time): siklus mesin itu yang dimulai di dalam rentang
+    dihapus dulu dalam transaksi yang sama, sehingga hasil reprocess menggantikan hasil lama.
+    Alias rename yang berlaku diterapkan sebelum ditulis, sehingga siklus yang disimpan ulang setelah
+    compact_program_aliases() memperbarui baris yang sudah di-rename, bukan menambah baris kedua.
+    """
+    if not program_cycles_data and replace_range is None:
         logger.info("No program cycles data to save.")
         return True
 
+    # Didaftarkan sebelum mengambil koneksi penulisan, agar satu thread tidak memegang dua koneksi pool
+    program_ids = get_program_ids((entry['machine_name'], entry['nama_program']) for entry in program_cycles_data)
+
+    grouped_by_table = defaultdict(list)
+    for entry in program_cycles_data:
+        table_name = get_program_report_table_name(entry['waktu_mulai'])
+        grouped_by_table[table_name].append(entry)
+
+    # Tabel diverifikasi/dibuat sebelum transaksi penulisan dibuka: DDL memakai koneksi pool lain dan
+    # akan menunggu selamanya pada lock yang dipegang DELETE di transaksi thread ini sendiri
+    verified_tables = set()
+    for table_name in grouped_by_table:
+        if create_program_report_table_monthly(table_name):
+            verified_tables.add(table_name)
+        else:
+            logger.warning(f"Skipping save for program cycles for table '{table_name}' as it could not be verified/created.")
+
     conn = None
+    cur = None
     try:
         conn = connect_db()
         if conn is None:
@@ -954,22 +1847,40 @@ def save_program_cycles_to_db(program_cycles_data: list) -> bool:
             return False
         cur = conn.cursor()
 
-        grouped_by_table = defaultdict(list)
-        for entry in program_cycles_data:
-            table_name = get_program_report_table_name(entry['waktu_mulai'])
-            grouped_by_table[table_name].append(entry)
+        if replace_range is not None:
+            replace_machine, replace_start, replace_end = replace_range
+            replace_start_utc = replace_start.astimezone(datetime.timezone.utc)
+            replace_end_utc = replace_end.astimezone(datetime.timezone.utc)
+            month_iter = replace_start_utc.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            while month_iter < replace_end_utc:
+                table_name = get_program_report_table_name(month_iter)
+                month_iter += relativedelta(months=1)
+                if not table_exists(table_name, cur):
+                    continue
+                cur.execute(sql.SQL("""
+                    DELETE FROM {} WHERE machine_name = %s AND start_time >= %s AND start_time < %s;
+                """).format(sql.Identifier(table_name)), (replace_machine, replace_start_utc, replace_end_utc))
+
+        aliases = {}
+        if program_cycles_data:
+            aliases = _load_program_aliases(
+                cur,
+                {entry['machine_name'] for entry in program_cycles_data},
+                min(entry['waktu_mulai'] for entry in program_cycles_data).astimezone(datetime.timezone.utc),
+                max(entry['waktu_mulai'] for entry in program_cycles_data).astimezone(datetime.timezone.utc),
+            )
 
         for table_name, entries_for_table in grouped_by_table.items():
-            if not create_program_report_table_monthly(table_name):
-                logger.warning(f"Skipping save for program cycles for table '{table_name}' as it could not be verified/created.")
+            if table_name not in verified_tables:
                 continue
 
             insert_query = sql.SQL("""
-                INSERT INTO {} (machine_name, program_name, start_time, end_time, duration_seconds, report_date)
-                VALUES (%s, %s, %s, %s, %s, %s)
+                INSERT INTO {} (machine_name, program_name, start_time, end_time, duration_seconds, report_date, program_id)
+                VALUES %s
                 ON CONFLICT (machine_name, program_name, start_time) DO UPDATE SET
                     end_time = EXCLUDED.end_time,
-                    duration_seconds = EXCLUDED.duration_seconds;
+                    duration_seconds = EXCLUDED.duration_seconds,
+                    program_id = EXCLUDED.program_id;
             """).format(sql.Identifier(table_name))
 
             data_to_insert = []
@@ -977,22 +1888,31 @@ def save_program_cycles_to_db(program_cycles_data: list) -> bool:
                 start_time_utc = entry['waktu_mulai'].astimezone(datetime.timezone.utc)
                 end_time_utc = entry['waktu_selesai'].astimezone(datetime.timezone.utc)
                 report_date_val = start_time_utc.date()
+                program_name = entry['nama_program']
+                program_id = program_ids.get((entry['machine_name'], entry['nama_program']))
+                alias = _resolve_program_alias(aliases, entry['machine_name'], program_name, start_time_utc)
+                if alias is not None:
+                    program_name = alias[0]
+                    program_id = alias[1] if alias[1] is not None else program_id
                 data_to_insert.append((
                     entry['machine_name'],
-                    entry['nama_program'],
+                    program_name,
                     start_time_utc,
                     end_time_utc,
                     int(entry['durasi_seconds']),
-                    report_date_val
+                    report_date_val,
+                    program_id
                 ))
 
-            cur.executemany(insert_query, data_to_insert)
+            _bulk_write(cur, insert_query, data_to_insert, "save_program_cycles_to_db", conflict_key=(0, 1, 2))
 
         conn.commit()
         logger.info(f"Successfully saved {len(program_cycles_data)} program cycles to relevant monthly tables.")
         return True
     except psycopg2.Error as e:
         logger.error(f"Database error saving program cycles: {e}", exc_info=True)
+        for table_name in grouped_by_table:
+            _forget_table_if_undefined(e, table_name)
         if conn: conn.rollback()
         return False
     except Exception as e:
@@ -1033,8 +1953,7 @@ def get_status_logs_for_machine(machine_name: str, start_time: datetime.datetime
 
         for table_name in sorted(list(table_names_to_query)):
             try:
-                cur.execute(sql.SQL("SELECT to_regclass({})").format(sql.Literal(table_name))) 
-                if cur.fetchone()[0] is None:
+                if not table_exists(table_name, cur):
                     logger.debug(f"Table '{table_name}' does not exist. Skipping.")
                     continue
                 
@@ -1110,6 +2029,224 @@ def get_status_logs_for_machine(machine_name: str, start_time: datetime.datetime
             cur.close()
         if conn:
             close_db_connection(conn)
+
+def get_status_log_arrays(machine_name: str, start_time: datetime.datetime, end_time: datetime.datetime):
+    """
+    Versi ringan get_status_logs_for_machine untuk rentang panjang: hanya (timestamps, statuses) sebagai
+    dua list sejajar, terurut waktu. Timestamp dalam detik epoch. Mengembalikan None jika query gagal.
+    """
+    timestamps = []
+    statuses = []
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error(f"Failed to connect to database to fetch status log arrays for {machine_name}.")
+            return None
+        cur = conn.cursor()
+        start_time_utc = start_time.astimezone(datetime.timezone.utc)
+        end_time_utc = end_time.astimezone(datetime.timezone.utc)
+        month_iter = start_time_utc.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        while month_iter < end_time_utc:
+            table_name = get_status_log_table_name(month_iter)
+            month_iter += relativedelta(months=1)
+            if not table_exists(table_name, cur):
+                continue
+            cur.execute(sql.SQL("""
+                SELECT EXTRACT(EPOCH FROM timestamp_log)::float8, status_text
+                FROM {}
+                WHERE machine_name = %s AND timestamp_log >= %s AND timestamp_log < %s
+                ORDER BY timestamp_log ASC;
+            """).format(sql.Identifier(table_name)), (machine_name, start_time_utc, end_time_utc))
+            for timestamp_epoch, status_text in cur:
+                timestamps.append(timestamp_epoch)
+                statuses.append(status_text)
+        logger.debug(f"Fetched {len(timestamps)} status log rows for {machine_name} from {start_time.isoformat()} to {end_time.isoformat()}.")
+        return timestamps, statuses
+    except psycopg2.Error as e:
+        logger.error(f"Error fetching status log arrays for {machine_name}: {e}", exc_info=True)
+        return None
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            close_db_connection(conn)
+
+def _merge_extreme(fn, a, b):
+    """Menggabungkan dua ekstrem (nilai, timestamp); None berarti bucket tidak punya nilai untuk kolom itu."""
+    if a is None or a[0] is None:
+        return b
+    if b is None or b[0] is None:
+        return a
+    return fn(a, b, key=lambda extreme: extreme[0])
+
+def get_status_trend_downsampled(machine_name: str, start_time: datetime.datetime, end_time: datetime.datetime, max_points: int = 2000) -> dict:
+    """
+    Mengambil tren spindle_speed dan feed_rate yang sudah di-downsample di sisi database.
+    Rentang waktu dibagi menjadi max_points // 2 bucket; setiap bucket menghasilkan titik minimum dan
+    maksimum per kolom pada timestamp log tempat nilai itu terjadi (urut waktu), sehingga puncak dan
+    lembah tetap terlihat di tempat yang benar tanpa mengirim semua baris log ke dashboard.
+    Titik hanya berisi nilai kolom yang ekstremnya jatuh di timestamp itu; kolom lain bernilai None.
+    """
+    result = {"points": [], "raw_count": 0, "bucket_count": 0}
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error(f"Failed to connect to database to fetch downsampled trend for {machine_name}.")
+            return result
+
+        cur = conn.cursor()
+
+        start_time_utc = start_time.astimezone(datetime.timezone.utc)
+        end_time_utc = end_time.astimezone(datetime.timezone.utc)
+        bucket_count = max(1, int(max_points) // 2)
+        start_epoch = start_time_utc.timestamp()
+        end_epoch = end_time_utc.timestamp()
+        if end_epoch <= start_epoch:
+            return result
+
+        table_names_to_query = set()
+        current_dt_iter = start_time.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        while current_dt_iter <= end_time:
+            table_names_to_query.add(get_status_log_table_name(current_dt_iter))
+            current_dt_iter += relativedelta(months=1)
+
+        # bucket -> [(min_spindle, ts), (max_spindle, ts), (min_feed, ts), (max_feed, ts), count]
+        buckets = {}
+        for table_name in sorted(table_names_to_query):
+            try:
+                if not table_exists(table_name, cur):
+                    logger.debug(f"Table '{table_name}' does not exist. Skipping.")
+                    continue
+
+                query = sql.SQL("""
+                    SELECT width_bucket(EXTRACT(EPOCH FROM timestamp_log), %s, %s, %s) AS bucket,
+                           MIN(spindle_speed), (array_agg(timestamp_log ORDER BY spindle_speed ASC, timestamp_log) FILTER (WHERE spindle_speed IS NOT NULL))[1],
+                           MAX(spindle_speed), (array_agg(timestamp_log ORDER BY spindle_speed DESC, timestamp_log) FILTER (WHERE spindle_speed IS NOT NULL))[1],
+                           MIN(feed_rate), (array_agg(timestamp_log ORDER BY feed_rate ASC, timestamp_log) FILTER (WHERE feed_rate IS NOT NULL))[1],
+                           MAX(feed_rate), (array_agg(timestamp_log ORDER BY feed_rate DESC, timestamp_log) FILTER (WHERE feed_rate IS NOT NULL))[1],
+                           COUNT(*)
+                    FROM {}
+                    WHERE machine_name = %s
+                    AND timestamp_log >= %s AND timestamp_log < %s
+                    GROUP BY bucket
+                    ORDER BY bucket;
+                """).format(sql.Identifier(table_name))
+
+                cur.execute(query, (start_epoch, end_epoch, bucket_count, machine_name, start_time_utc, end_time_utc))
+                for bucket, min_spindle, min_spindle_ts, max_spindle, max_spindle_ts, min_feed, min_feed_ts, max_feed, max_feed_ts, count in cur.fetchall():
+                    extremes = [(min_spindle, min_spindle_ts), (max_spindle, max_spindle_ts), (min_feed, min_feed_ts), (max_feed, max_feed_ts)]
+                    existing = buckets.get(bucket)
+                    if existing is None:
+                        buckets[bucket] = extremes + [count]
+                        continue
+                    # Bucket yang sama bisa muncul di dua tabel bulanan (batas bulan)
+                    existing[0] = _merge_extreme(min, existing[0], extremes[0])
+                    existing[1] = _merge_extreme(max, existing[1], extremes[1])
+                    existing[2] = _merge_extreme(min, existing[2], extremes[2])
+                    existing[3] = _merge_extreme(max, existing[3], extremes[3])
+                    existing[4] += count
+            except psycopg2.Error as e:
+                logger.error(f"Error fetching downsampled trend from table '{table_name}' for {machine_name}: {e}", exc_info=True)
+                conn.rollback()
+                continue
+
+        points = []
+        raw_count = 0
+        for bucket in sorted(buckets):
+            min_spindle, max_spindle, min_feed, max_feed, count = buckets[bucket]
+            raw_count += count
+            # Titik per timestamp ekstrem; min dan max di log yang sama menjadi satu titik
+            bucket_points = {}
+            for column, extreme in (("spindle_speed", min_spindle), ("spindle_speed", max_spindle),
+                                    ("feed_rate", min_feed), ("feed_rate", max_feed)):
+                value, ts = extreme
+                if value is None or ts is None:
+                    continue
+                point = bucket_points.setdefault(ts, {"timestamp": ts.timestamp(), "spindle_speed": None, "feed_rate": None})
+                point[column] = value
+            points.extend(bucket_points[ts] for ts in sorted(bucket_points))
+
+        result = {"points": points, "raw_count": raw_count, "bucket_count": bucket_count}
+        logger.debug(f"Downsampled {raw_count} status logs to {len(points)} trend points for {machine_name}.")
+        return result
+    except Exception as e:
+        logger.critical(f"CRITICAL Error fetching downsampled trend from DB for {machine_name}: {e}", exc_info=True)
+        return {"points": [], "raw_count": 0, "bucket_count": 0}
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            close_db_connection(conn)
+
+def get_status_counts_by_bucket(machine_name: str, start_time: datetime.datetime, end_time: datetime.datetime, bucket: str = "hour") -> list:
+    """
+    Menghitung jumlah log per status_text per bucket waktu (date_trunc 'hour' atau 'day', UTC) di sisi database,
+    sehingga grafik distribusi status tidak perlu memuat semua baris log.
+    Mengembalikan list of dicts: timestamp (epoch awal bucket), status_text, count.
+    """
+    if bucket not in ("hour", "day"):
+        raise ValueError(f"Unsupported status count bucket '{bucket}'.")
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error(f"Failed to connect to database to fetch status counts for {machine_name}.")
+            return []
+
+        cur = conn.cursor()
+
+        start_time_utc = start_time.astimezone(datetime.timezone.utc)
+        end_time_utc = end_time.astimezone(datetime.timezone.utc)
+
+        table_names_to_query = set()
+        current_dt_iter = start_time.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        while current_dt_iter <= end_time:
+            table_names_to_query.add(get_status_log_table_name(current_dt_iter))
+            current_dt_iter += relativedelta(months=1)
+
+        # (awal bucket, status) -> jumlah; bucket yang sama bisa muncul di dua tabel bulanan (batas bulan)
+        counts = defaultdict(int)
+        for table_name in sorted(table_names_to_query):
+            try:
+                if not table_exists(table_name, cur):
+                    logger.debug(f"Table '{table_name}' does not exist. Skipping.")
+                    continue
+
+                query = sql.SQL("""
+                    SELECT EXTRACT(EPOCH FROM date_trunc(%s, timestamp_log AT TIME ZONE 'UTC')) AS bucket_start,
+                           status_text, COUNT(*)
+                    FROM {}
+                    WHERE machine_name = %s
+                    AND timestamp_log >= %s AND timestamp_log < %s
+                    GROUP BY bucket_start, status_text;
+                """).format(sql.Identifier(table_name))
+
+                cur.execute(query, (bucket, machine_name, start_time_utc, end_time_utc))
+                for bucket_start, status_text, count in cur.fetchall():
+                    counts[(float(bucket_start), status_text)] += count
+            except psycopg2.Error as e:
+                logger.error(f"Error fetching status counts from table '{table_name}' for {machine_name}: {e}", exc_info=True)
+                conn.rollback()
+                continue
+
+        return [
+            {"timestamp": bucket_start, "status_text": status_text, "count": count}
+            for (bucket_start, status_text), count in sorted(counts.items(), key=lambda item: (item[0][0], str(item[0][1])))
+        ]
+    except Exception as e:
+        logger.critical(f"CRITICAL Error fetching status counts from DB for {machine_name}: {e}", exc_info=True)
+        return []
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            close_db_connection(conn)
+
 def get_shift_metrics_from_db(machine_name: str = None, shift_name: str = None, start_date: datetime.date = None, end_date: datetime.date = None, is_final: bool = False) -> list:
     results = []
     conn = None
@@ -1144,8 +2281,7 @@ def get_shift_metrics_from_db(machine_name: str = None, shift_name: str = None,
 
         for table_name in table_names_to_query:
             try:
-                cur.execute(sql.SQL("SELECT to_regclass({})").format(sql.Literal(table_name)))
-                if cur.fetchone()[0] is None:
+                if not table_exists(table_name, cur):
                     logger.debug(f"Table '{table_name}' does not exist. Skipping.")
                     continue
 
@@ -1205,141 +2341,154 @@ def get_shift_metrics_from_db(machine_name: str = None, shift_name: str = None,
         if conn:
             close_db_connection(conn)
 
-def get_program_report_from_db2(machine_name: str, start_date: datetime.date, end_date: datetime.date, specific_program_filter: str):
-    logs = []
-    conn = None
+def get_current_shift_metrics_all_machines(shift_name: str, shift_start_time: datetime.datetime, machine_names=None) -> dict:
+    """
+    Metrik shift real-time semua mesin untuk satu shift dalam satu query berindeks (shift_start_time, shift_name).
+    Mengembalikan {machine_name: dict metrik} dengan kunci yang sama seperti get_shift_metrics_from_db.
+    """
+    results = {}
+    shift_start_time_utc = shift_start_time.astimezone(datetime.timezone.utc)
+    table_name = get_shift_metrics_table_name(shift_start_time_utc)
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            return results
+        cur = conn.cursor()
+        if not table_exists(table_name, cur):
+            logger.debug(f"Table '{table_name}' does not exist. No shift metrics for {shift_name} at {shift_start_time_utc.isoformat()}.")
+            return results
+
+        query = sql.SQL("""
+            SELECT machine_name, shift_name, runtime_seconds, idletime_seconds, other_time_seconds, shift_start_time, shift_end_time
+            FROM {}
+            WHERE shift_start_time = %s AND shift_name = %s
+        """).format(sql.Identifier(table_name))
+        params = [shift_start_time_utc, shift_name]
+        if machine_names:
+            query += sql.SQL(" AND machine_name = ANY(%s)")
+            params.append(list(machine_names))
+        cur.execute(query, params)
+
+        column_names = [desc[0] for desc in cur.description]
+        for record in cur.fetchall():
+            row_dict = dict(zip(column_names, record))
+            row_dict['runtime_hhmm'] = format_seconds_to_hhmm(row_dict.get('runtime_seconds'))
+            row_dict['idletime_hhmm'] = format_seconds_to_hhmm(row_dict.get('idletime_seconds'))
+            results[row_dict['machine_name']] = row_dict
+        logger.debug(f"Fetched shift metrics for {len(results)} machines ({shift_name}, {shift_start_time_utc.isoformat()}).")
+        return results
+    except psycopg2.Error as e:
+        logger.error(f"Error fetching shift metrics for all machines ({shift_name}, {shift_start_time_utc.isoformat()}): {e}", exc_info=True)
+        _forget_table_if_undefined(e, table_name)
+        return {}
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            close_db_connection(conn)
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def get_program_report_from_db2(machine_name: str, start_date: datetime.date, end_date: datetime.date, specific_program_filter: str):
+    """
+    Mengambil semua log status mesin dalam rentang waktu program induk berjalan: dari log 'Running'
+    pertama hingga terakhir yang current_program-nya diawali specific_program_filter (tanpa membedakan huruf).
+    Rentang dan log diambil dalam satu query lintas tabel bulanan; pencarian prefix memakai indeks
+    parsial (machine_name, upper(current_program) text_pattern_ops) dari create_status_log_table.
+    """
+    conn = None
     cur = None
     try:
         conn = connect_db()
         if conn is None:
             logger.error(f"Failed to connect to database to fetch program run span for {machine_name}.")
-            return logs
+            return []
 
         cur = conn.cursor()
 
-        table_names_to_query_status_log = set()
+        table_names = []
         current_dt_iter_span = datetime.datetime.combine(start_date.replace(day=1), datetime.time.min, tzinfo=timezone.utc)
         end_dt_for_iter_span = datetime.datetime.combine(end_date, datetime.time.max, tzinfo=timezone.utc)
-        
         while current_dt_iter_span <= end_dt_for_iter_span.replace(day=1, hour=0, minute=0, second=0, microsecond=0):
-            table_names_to_query_status_log.add(get_status_log_table_name(current_dt_iter_span))
-            if current_dt_iter_span.month == 12:
-                current_dt_iter_span = current_dt_iter_span.replace(year=current_dt_iter_span.year + 1, month=1)
+            table_name = get_status_log_table_name(current_dt_iter_span)
+            if table_exists(table_name, cur):
+                table_names.append(table_name)
             else:
-                current_dt_iter_span = current_dt_iter_span.replace(month=current_dt_iter_span.month + 1)
-            if (current_dt_iter_span.year - start_date.year) * 12 + (current_dt_iter_span.month - start_date.month) > 24:
+                logger.debug(f"Status log table '{table_name}' does not exist. Skipping.")
+            current_dt_iter_span += relativedelta(months=1)
+            if len(table_names) > 24:
                 logger.warning("Loop for status log table names exceeded 24 months, breaking to prevent infinite loop.")
                 break
 
-        min_timestamp_span = None
-        max_timestamp_span = None
-
-        for table_name_status_log in sorted(list(table_names_to_query_status_log)):
-            try:
-                cur.execute(sql.SQL("SELECT to_regclass({})").format(sql.Literal(table_name_status_log)))
-                if cur.fetchone()[0] is None:
-                    logger.debug(f"Status log table '{table_name_status_log}' does not exist. Skipping timestamp span search.")
-                    continue
-
-                min_max_ts_query = sql.SQL("""
-                    SELECT MIN(timestamp_log), MAX(timestamp_log)
-                    FROM {}
-                    WHERE machine_name = %s
-                    AND current_program ILIKE %s
-                    AND status_text = 'Running'
-                    AND timestamp_log >= %s AND timestamp_log <= %s;
-                """).format(sql.Identifier(table_name_status_log))
-
-                cur.execute(min_max_ts_query, (machine_name, f"{specific_program_filter}%", 
-                                             datetime.datetime.combine(start_date, datetime.time.min).astimezone(timezone.utc), 
-                                             datetime.datetime.combine(end_date, datetime.time.max).astimezone(timezone.utc)))
-                
-                min_ts, max_ts = cur.fetchone()
-
-                if min_ts and max_ts:
-                    if min_timestamp_span is None or min_ts < min_timestamp_span:
-                        min_timestamp_span = min_ts
-                    if max_timestamp_span is None or max_ts > max_timestamp_span:
-                        max_timestamp_span = max_ts
-            except psycopg2.ProgrammingError as e:
-                if "column \"current_program\" does not exist" in str(e):
-                    logger.warning(f"Table '{table_name_status_log}' missing 'current_program' column. Cannot search by program name.")
-                else:
-                    logger.warning(f"Error searching timestamp span in status log table '{table_name_status_log}': {e}", exc_info=True)
-                continue
-            except Exception as e:
-                logger.error(f"An unexpected error occurred during timestamp span search in status log table '{table_name_status_log}': {e}", exc_info=True)
-                continue
-
-        if min_timestamp_span is None or max_timestamp_span is None:
-            logger.info(f"No running timestamp span found for program '{specific_program_filter}' on {machine_name} between {start_date} and {end_date}.")
-            return [] 
-
-        all_relevant_logs_in_span = []
-        current_dt_iter_fetch = min_timestamp_span.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        while current_dt_iter_fetch <= max_timestamp_span.replace(day=1, hour=0, minute=0, second=0, microsecond=0):
-            table_name_to_fetch = get_status_log_table_name(current_dt_iter_fetch)
-            
-            try:
-                cur.execute(sql.SQL("SELECT to_regclass({})").format(sql.Literal(table_name_to_fetch)))
-                if cur.fetchone()[0] is None:
-                    logger.debug(f"Status log table '{table_name_to_fetch}' does not exist during span fetch. Skipping.")
-                else: 
-                    fetch_span_query = sql.SQL("""
-                        SELECT timestamp_log, status_text, spindle_speed, feed_rate, current_program
-                        FROM {}
-                        WHERE machine_name = %s
-                        AND timestamp_log >= %s AND timestamp_log <= %s
-                        ORDER BY timestamp_log ASC;
-                    """).format(sql.Identifier(table_name_to_fetch))
-
-                    cur.execute(fetch_span_query, (machine_name, min_timestamp_span, max_timestamp_span))
-                    all_relevant_logs_in_span.extend(cur.fetchall())
-            except psycopg2.ProgrammingError as e:
-                if "column \"current_program\" does not exist" in str(e):
-                    logger.warning(f"Table '{table_name_to_fetch}' missing 'current_program' column. Fetching without it.")
-                    fetch_span_query_no_program = sql.SQL("""
-                        SELECT timestamp_log, status_text, spindle_speed, feed_rate
-                        FROM {}
-                        WHERE machine_name = %s
-                        AND timestamp_log >= %s AND timestamp_log <= %s
-                        ORDER BY timestamp_log ASC;
-                    """).format(sql.Identifier(table_name_to_fetch))
-                    cur.execute(fetch_span_query_no_program, (machine_name, min_timestamp_span, max_timestamp_span))
-                    fetched_rows = cur.fetchall()
-                    all_relevant_logs_in_span.extend([row + (None,) for row in fetched_rows])
-                else:
-                    logger.error(f"Error fetching span from status log table '{table_name_to_fetch}': {e}", exc_info=True)
-            except Exception as e:
-                logger.error(f"An unexpected error occurred during span fetch from status log table '{table_name_to_fetch}': {e}", exc_info=True)
-                
-            if current_dt_iter_fetch.month == 12:
-                current_dt_iter_fetch = current_dt_iter_fetch.replace(year=current_dt_iter_fetch.year + 1, month=1)
-            else:
-                current_dt_iter_fetch = current_dt_iter_fetch.replace(month=current_dt_iter_fetch.month + 1)
-            if (current_dt_iter_fetch.year - min_timestamp_span.year) * 12 + (current_dt_iter_fetch.month - min_timestamp_span.month) > 24: 
-                logger.warning("Span fetch loop exceeded 24 months, breaking.")
-                break
+        if not table_names:
+            logger.info(f"No status log tables found for {machine_name} between {start_date} and {end_date}.")
+            return []
+
+        span_parts = [
+            sql.SQL("""
+                SELECT MIN(timestamp_log) AS span_start, MAX(timestamp_log) AS span_end
+                FROM {}
+                WHERE machine_name = %(machine_name)s
+                AND upper(current_program) LIKE %(program_prefix)s
+                AND status_text = 'Running'
+                AND timestamp_log >= %(range_start)s AND timestamp_log <= %(range_end)s
+            """).format(sql.Identifier(table_name))
+            for table_name in table_names
+        ]
+        log_parts = [
+            sql.SQL("""
+                SELECT l.timestamp_log, l.status_text, l.spindle_speed, l.feed_rate, l.current_program
+                FROM {} l, span
+                WHERE l.machine_name = %(machine_name)s
+                AND l.timestamp_log >= span.span_start AND l.timestamp_log <= span.span_end
+            """).format(sql.Identifier(table_name))
+            for table_name in table_names
+        ]
+        query = sql.SQL("""
+            WITH span AS (
+                SELECT MIN(span_start) AS span_start, MAX(span_end) AS span_end
+                FROM ({span_parts}) AS per_table
+            )
+            {log_parts}
+            ORDER BY timestamp_log ASC;
+        """).format(
+            span_parts=sql.SQL(" UNION ALL ").join(span_parts),
+            log_parts=sql.SQL(" UNION ALL ").join(log_parts),
+        )
+
+        cur.execute(query, {
+            "machine_name": machine_name,
+            "program_prefix": _escape_like(specific_program_filter.upper()) + "%",
+            "range_start": datetime.datetime.combine(start_date, datetime.time.min).astimezone(timezone.utc),
+            "range_end": datetime.datetime.combine(end_date, datetime.time.max).astimezone(timezone.utc),
+        })
 
         columns = ['timestamp', 'status_text', 'spindle_speed', 'feed_rate', 'current_program']
-        result_list = []
-        for row_tuple in all_relevant_logs_in_span:
-            if len(columns) == len(row_tuple):
-                row_dict = dict(zip(columns, row_tuple))
-                result_list.append(row_dict)
-            else:
-                logger.error(f"Mismatched column count in fetched span row. Expected {len(columns)}, got {len(row_tuple)} for row: {row_tuple}")
+        result_list = [dict(zip(columns, row_tuple)) for row_tuple in cur.fetchall()]
 
-        logger.info(f"Fetched {len(result_list)} status logs within timestamp span for program '{specific_program_filter}' on {machine_name}.")
+        if not result_list:
+            logger.info(f"No running timestamp span found for program '{specific_program_filter}' on {machine_name} between {start_date} and {end_date}.")
+        else:
+            logger.info(f"Fetched {len(result_list)} status logs within timestamp span for program '{specific_program_filter}' on {machine_name}.")
         return result_list
 
+    except psycopg2.Error as e:
+        if getattr(e, "pgcode", None) == errorcodes.UNDEFINED_COLUMN:
+            logger.warning(f"A status log table for {machine_name} is missing the 'current_program' column. Cannot search by program name: {e}")
+        else:
+            logger.error(f"Error fetching program run span for '{specific_program_filter}' on {machine_name}: {e}", exc_info=True)
+        return []
     except Exception as e:
         logger.critical(f"CRITICAL Error in get_program_report_from_db2 for {specific_program_filter}: {e}", exc_info=True)
         return []
     finally:
         if cur: cur.close()
-        if conn: close_db_connection(conn)
+        if conn:
+            conn.rollback()
+            close_db_connection(conn)
 
 def get_program_report_from_db(machine_name: str, start_date: datetime.date, end_date: datetime.date):
     conn = None
@@ -1371,18 +2520,32 @@ def get_program_report_from_db(machine_name: str, start_date: datetime.date, end
 
         for table_name in sorted(list(table_names_to_query)):
             try:
-                cur.execute(sql.SQL("SELECT to_regclass({})").format(sql.Literal(table_name)))
-                if cur.fetchone()[0] is None:
+                if not table_exists(table_name, cur):
                     logger.debug(f"Table '{table_name}' does not exist. Skipping.")
                     continue
 
+                # Alias (rename) diterapkan saat dibaca: alias terbaru yang cocok dengan nama mentah atau nama bersih
                 select_query = sql.SQL("""
-                    SELECT machine_name, program_name, start_time, end_time, duration_seconds
-                    FROM {}
-                    WHERE machine_name = %s
-                    AND start_time >= %s AND start_time < %s
-                    ORDER BY start_time;
-                """).format(sql.Identifier(table_name))
+                    SELECT r.machine_name, r.program_name, r.start_time, r.end_time, r.duration_seconds,
+                           COALESCE(a.target_program_id, r.program_id), d.clean_name, d.main_name, a.target_name
+                    FROM {table_name} r
+                    LEFT JOIN {dim_table} d ON d.program_id = r.program_id
+                    LEFT JOIN LATERAL (
+                        SELECT target_name, target_program_id FROM {alias_table}
+                        WHERE machine_name = r.machine_name
+                        AND source_name IN (r.program_name, d.clean_name)
+                        AND r.start_time >= valid_from AND r.start_time <= valid_to
+                        ORDER BY created_at DESC
+                        LIMIT 1
+                    ) a ON TRUE
+                    WHERE r.machine_name = %s
+                    AND r.start_time >= %s AND r.start_time < %s
+                    ORDER BY r.start_time;
+                """).format(
+                    table_name=sql.Identifier(table_name),
+                    dim_table=sql.Identifier(PROGRAM_DIM_TABLE),
+                    alias_table=sql.Identifier(PROGRAM_ALIAS_TABLE),
+                )
                 
                 cur.execute(select_query, (machine_name, start_time_utc, end_time_utc))
                 all_records.extend(cur.fetchall())
@@ -1394,12 +2557,17 @@ def get_program_report_from_db(machine_name: str, start_date: datetime.date, end
                 logger.error(f"An unexpected error occurred while fetching from program report table '{table_name}': {e}", exc_info=True)
                 continue
 
-        columns = ['machine_name', 'program_name', 'start_time', 'end_time', 'duration_seconds']
+        columns = ['machine_name', 'program_name', 'start_time', 'end_time', 'duration_seconds', 'program_id', 'program_clean_name', 'program_main_name']
         result_list = []
         for row in all_records:
-            row_dict = {}
-            for i, col_name in enumerate(columns):
-                row_dict[col_name] = row[i]
+            row_dict = dict(zip(columns, row[:-1]))
+            alias_target_name = row[-1]
+            if alias_target_name is not None:
+                row_dict['program_name'] = alias_target_name
+                row_dict['program_clean_name'], row_dict['program_main_name'] = normalize_program_name(alias_target_name)
+            elif row_dict['program_clean_name'] is None:
+                # Baris lama yang belum di-backfill: normalisasi di sini
+                row_dict['program_clean_name'], row_dict['program_main_name'] = normalize_program_name(row_dict['program_name'])
             result_list.append(row_dict)
 
         logger.info(f"Fetched {len(result_list)} program report entries for {machine_name} from {start_date} to {end_date}.")
@@ -1413,166 +2581,322 @@ def get_program_report_from_db(machine_name: str, start_date: datetime.date, end
         if conn:
             close_db_connection(conn)
 
-def check_and_save_completed_shifts(shift_metrics_data: dict, current_time: datetime.datetime, shifts_saved_state: dict, shift_metrics_lock: threading.Lock, shifts_saved_to_db_lock: threading.Lock):
-    messages = []
-    newly_saved_shifts = []
-
-    for machine_name, shifts_info in shift_metrics_data.items():
-        for shift_name, metrics in shifts_info.items():
-            shift_start_iso = metrics.get("shift_start")
-            shift_end_iso = metrics.get("shift_end")
-
-            if not shift_start_iso or not shift_end_iso:
-                logger.warning(f"Skipping shift {shift_name} for {machine_name} due to missing start/end time in metrics.")
-                continue
-
-            try:
-                shift_start_dt = datetime.datetime.fromisoformat(shift_start_iso)
-                shift_end_dt = datetime.datetime.fromisoformat(shift_end_iso)
-            except ValueError:
-                logger.error(f"Invalid ISO format for shift times for {machine_name} - {shift_name}. Skipping.")
-                continue
-
-            shift_unique_id = f"{machine_name}_{shift_name}_{shift_start_iso}"
+@_ensure_schema_once
+def create_shift_finalization_watermark_table(table_name: str) -> bool:
+    with _ddl_lock:
+        conn = None
+        cur = None
+        try:
+            conn = connect_db()
+            if conn is None:
+                logger.error(f"Failed to connect to database to create shift finalization watermark table '{table_name}'.")
+                return False
+            cur = conn.cursor()
+            cur.execute(sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {table_name} (
+                    machine_name VARCHAR(255) PRIMARY KEY,
+                    last_shift_end TIMESTAMP WITH TIME ZONE NOT NULL,
+                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                );
+            """).format(table_name=sql.Identifier(table_name)))
+            conn.commit()
+            logger.info(f"Table '{table_name}' checked/created successfully.")
+            return True
+        except psycopg2.Error as e:
+            logger.error(f"Error creating shift finalization watermark table '{table_name}': {e}", exc_info=True)
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                close_db_connection(conn)
 
-            with shifts_saved_to_db_lock:
-                already_saved = shifts_saved_state.get(shift_unique_id, False)
+def get_shift_finalization_watermarks() -> dict:
+    """{machine_name: last_shift_end (UTC aware)} untuk semua mesin. Mengembalikan None jika query gagal."""
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error("Failed to connect to database to fetch shift finalization watermarks.")
+            return None
+        cur = conn.cursor()
+        if not table_exists(SHIFT_FINALIZATION_WATERMARK_TABLE, cur):
+            return {}
+        cur.execute(sql.SQL("SELECT machine_name, last_shift_end FROM {};").format(sql.Identifier(SHIFT_FINALIZATION_WATERMARK_TABLE)))
+        return {machine_name: last_shift_end.astimezone(datetime.timezone.utc) for machine_name, last_shift_end in cur.fetchall()}
+    except psycopg2.Error as e:
+        logger.error(f"Error fetching shift finalization watermarks: {e}", exc_info=True)
+        _forget_table_if_undefined(e, SHIFT_FINALIZATION_WATERMARK_TABLE)
+        return None
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            close_db_connection(conn)
 
-            if current_time >= shift_end_dt and not already_saved:
-                logger.info(f"Shift {shift_name} for {machine_name} has completed. Saving final metrics...")
-                
-                runtime_sec = metrics.get("runtime_seconds", 0.0)
-                idletime_sec = metrics.get("idletime_seconds", 0.0)
-
-                total_shift_duration_seconds = (shift_end_dt - shift_start_dt).total_seconds()
-                accounted_time_seconds = runtime_sec + idletime_sec
-                other_time_sec = max(0.0, total_shift_duration_seconds - accounted_time_seconds)
-
-                if save_final_shift_metrics(
-                    machine_name,
-                    shift_name,
-                    runtime_sec,
-                    idletime_sec,
-                    other_time_sec,
-                    shift_start_dt,
-                    shift_end_dt
-                ):
-                    with shifts_saved_to_db_lock:
-                        shifts_saved_state[shift_unique_id] = True
-                    messages.append(f"Successfully saved final metrics for {machine_name} - {shift_name} ({shift_start_iso}).")
-                    newly_saved_shifts.append(shift_unique_id)
-                else:
-                    messages.append(f"Failed to save final metrics for {machine_name} - {shift_name} ({shift_start_iso}).")
-            elif current_time >= shift_end_dt and already_saved:
-                logger.debug(f"Shift {shift_name} for {machine_name} (Start: {shift_start_iso}) is ended and already marked as saved.")
-            else:
-                logger.debug(f"Shift {shift_name} for {machine_name} is still ongoing or not yet completed. Current time: {current_time.isoformat()}, Shift end: {shift_end_dt.isoformat()}")
+@_instrument_write("save_shift_finalization_watermark")
+def save_shift_finalization_watermark(machine_name: str, last_shift_end: datetime.datetime) -> bool:
+    """Memajukan watermark finalisasi shift mesin ini. Watermark tidak pernah mundur."""
+    if not create_shift_finalization_watermark_table(SHIFT_FINALIZATION_WATERMARK_TABLE):
+        logger.error(f"Failed to ensure table '{SHIFT_FINALIZATION_WATERMARK_TABLE}' exists before saving watermark.")
+        return False
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error(f"Failed to connect to database to save shift finalization watermark for {machine_name}.")
+            return False
+        cur = conn.cursor()
+        cur.execute(sql.SQL("""
+            INSERT INTO {table_name} AS w (machine_name, last_shift_end) VALUES (%s, %s)
+            ON CONFLICT (machine_name) DO UPDATE SET
+                last_shift_end = GREATEST(w.last_shift_end, EXCLUDED.last_shift_end),
+                updated_at = CURRENT_TIMESTAMP;
+        """).format(table_name=sql.Identifier(SHIFT_FINALIZATION_WATERMARK_TABLE)),
+        (machine_name, last_shift_end.astimezone(datetime.timezone.utc)))
+        conn.commit()
+        return True
+    except psycopg2.Error as e:
+        logger.error(f"Error saving shift finalization watermark for {machine_name}: {e}", exc_info=True)
+        _forget_table_if_undefined(e, SHIFT_FINALIZATION_WATERMARK_TABLE)
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            close_db_connection(conn)
 
-    return messages, newly_saved_shifts
+@_ensure_schema_once
+def create_program_alias_table(table_name: str) -> bool:
+    with _ddl_lock:
+        conn = None
+        cur = None
+        try:
+            conn = connect_db()
+            if conn is None:
+                logger.error(f"Failed to connect to database to create program alias table '{table_name}'.")
+                return False
+            cur = conn.cursor()
+            cur.execute(sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {table_name} (
+                    alias_id SERIAL PRIMARY KEY,
+                    machine_name VARCHAR(255) NOT NULL,
+                    source_name VARCHAR(255) NOT NULL,
+                    target_name VARCHAR(255) NOT NULL,
+                    target_program_id INTEGER,
+                    valid_from TIMESTAMP WITH TIME ZONE NOT NULL,
+                    valid_to TIMESTAMP WITH TIME ZONE NOT NULL,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    compacted_at TIMESTAMP WITH TIME ZONE
+                );
+                CREATE INDEX IF NOT EXISTS {idx_lookup} ON {table_name} (machine_name, source_name, valid_from);
+            """).format(
+                table_name=sql.Identifier(table_name),
+                idx_lookup=sql.Identifier(f"idx_{table_name}_lookup"),
+            ))
+            conn.commit()
+            logger.info(f"Table '{table_name}' checked/created successfully.")
+            return True
+        except psycopg2.Error as e:
+            logger.error(f"Error creating program alias table '{table_name}': {e}", exc_info=True)
+            if conn:
+                conn.rollback()
+            return False
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                close_db_connection(conn)
 
 def update_program_name_in_db(old_program_name, new_program_name, machine_name, start_date, end_date):
-    if not db_pool:
-        logging.error("Database connection pool not initialized.")
+    """
+    Mengganti nama program di laporan untuk rentang tanggal dengan menambah satu baris alias.
+    Baris laporan tidak ditulis ulang: alias diterapkan saat dibaca (get_program_report_from_db)
+    dan bisa dipadatkan belakangan dengan compact_program_aliases().
+    """
+    if not create_program_alias_table(PROGRAM_ALIAS_TABLE):
         return False
-        
+    new_program_id = get_program_ids([(machine_name, new_program_name)]).get((machine_name, new_program_name))
+    valid_from = datetime.datetime.combine(start_date, datetime.time.min).astimezone(timezone.utc)
+    valid_to = datetime.datetime.combine(end_date, datetime.time.max).astimezone(timezone.utc)
+    params = {
+        "machine_name": machine_name,
+        "old_name": old_program_name,
+        "new_name": new_program_name,
+        "new_program_id": new_program_id,
+        "valid_from": valid_from,
+        "valid_to": valid_to,
+    }
+
     conn = None
-    all_updates_successful = True
-    
-    current_date = start_date
-    table_names_to_update = set()
-    while current_date <= end_date:
-        table_name = f"program_report_{current_date.strftime('%Y_%m')}"
-        table_names_to_update.add(table_name)
-        current_date += relativedelta(months=1)
-    
+    cur = None
     try:
-        conn = db_pool.getconn()
-        
-        for table_name in table_names_to_update:
-            with conn.cursor() as cur:
-                check_sql = f"SELECT EXISTS (SELECT 1 FROM information_schema.tables WHERE table_name = '{table_name}');"
-                cur.execute(check_sql)
-                table_exists = cur.fetchone()[0]
-
-                if table_exists:
-                    sql = f"""
-                        UPDATE "{table_name}"
-                        SET program_name = %s
-                        WHERE machine_name = %s AND program_name = %s;
-                    """
-                    try:
-                        cur.execute(sql, (new_program_name, machine_name, old_program_name))
-                        logging.info(f"Updated program name from '{old_program_name}' to '{new_program_name}' on table '{table_name}'. Rows affected: {cur.rowcount}")
-                    except Exception as update_e:
-                        logging.error(f"Error updating table '{table_name}': {update_e}", exc_info=True)
-                        all_updates_successful = False
-                else:
-                    logging.warning(f"Table '{table_name}' does not exist. Skipping update for this table.")
-                    
+        conn = connect_db()
+        if conn is None:
+            logger.error("Failed to connect to database to update program name.")
+            return False
+        cur = conn.cursor()
+        # Alias lain yang menghasilkan nama lama ikut diarahkan ke nama baru, agar rename berantai tetap satu langkah saat dibaca
+        cur.execute(sql.SQL("""
+            UPDATE {} SET target_name = %(new_name)s, target_program_id = %(new_program_id)s
+            WHERE machine_name = %(machine_name)s AND target_name = %(old_name)s
+            AND valid_from <= %(valid_to)s AND valid_to >= %(valid_from)s
+            AND compacted_at IS NULL;
+        """).format(sql.Identifier(PROGRAM_ALIAS_TABLE)), params)
+        cur.execute(sql.SQL("""
+            INSERT INTO {} (machine_name, source_name, target_name, target_program_id, valid_from, valid_to)
+            VALUES (%(machine_name)s, %(old_name)s, %(new_name)s, %(new_program_id)s, %(valid_from)s, %(valid_to)s);
+        """).format(sql.Identifier(PROGRAM_ALIAS_TABLE)), params)
         conn.commit()
-        return all_updates_successful
-        
-    except Exception as e:
-        logging.error(f"Critical error during program name update transaction: {e}", exc_info=True)
+        logger.info(f"Program '{old_program_name}' on {machine_name} renamed to '{new_program_name}' for {start_date} to {end_date} (alias).")
+        return True
+    except psycopg2.Error as e:
+        logger.error(f"Error saving program alias '{old_program_name}' -> '{new_program_name}' for {machine_name}: {e}", exc_info=True)
         if conn:
             conn.rollback()
+        _forget_table_if_undefined(e, PROGRAM_ALIAS_TABLE)
         return False
     finally:
-        if conn:
-            db_pool.putconn(conn)
-
+        if cur: cur.close()
+        if conn: close_db_connection(conn)
 
-def save_loss_breakdown_report(machine_name, report_date, df_loss_breakdown):
+def compact_program_aliases(min_age_hours: float = 24, batch_size: int = 5000) -> int:
     """
-    Menyimpan rincian waktu loss ke database.
+    Menerapkan alias yang sudah berumur min_age_hours secara permanen ke tabel program_report bulanan,
+    dalam batch kecil (transaksi pendek), lalu menandai alias sebagai compacted. Alias tetap disimpan
+    sebagai riwayat. Mengembalikan jumlah baris laporan yang diperbarui.
+
+    Baris sumber yang akan bentrok UNIQUE (machine_name, program_name, start_time) dengan baris bernama target
+    yang sudah ada (atau dengan baris sumber lain di start_time yang sama) digabung: baris yang sudah ada
+    dipertahankan dan baris sumber dihapus, sehingga compaction tidak gagal dan diulang terus.
     """
-    if df_loss_breakdown.empty:
-        logging.warning("Tidak ada data loss breakdown untuk disimpan.")
-        return True 
+    if not table_exists(PROGRAM_ALIAS_TABLE):
+        return 0
+    conn = None
+    cur = None
+    total_updated = 0
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error("Failed to connect to database to compact program aliases.")
+            return 0
+        cur = conn.cursor()
+        cur.execute(sql.SQL("""
+            SELECT alias_id, machine_name, source_name, target_name, target_program_id, valid_from, valid_to
+            FROM {}
+            WHERE compacted_at IS NULL AND created_at < now() - make_interval(secs => %s)
+            ORDER BY created_at;
+        """).format(sql.Identifier(PROGRAM_ALIAS_TABLE)), (min_age_hours * 3600,))
+        aliases = cur.fetchall()
+        conn.rollback()
+
+        for alias_id, machine_name, source_name, target_name, target_program_id, valid_from, valid_to in aliases:
+            try:
+                month_iter = valid_from.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+                while month_iter <= valid_to:
+                    table_name = get_program_report_table_name(month_iter)
+                    month_iter += relativedelta(months=1)
+                    if not table_exists(table_name, cur):
+                        continue
+                    compact_query = sql.SQL("""
+                        WITH candidates AS (
+                            SELECT r.id, r.start_time FROM {table_name} r
+                            LEFT JOIN {dim_table} d ON d.program_id = r.program_id
+                            WHERE r.machine_name = %(machine_name)s
+                            AND r.program_name <> %(target_name)s
+                            AND (r.program_name = %(source_name)s OR d.clean_name = %(source_name)s)
+                            AND r.start_time >= %(valid_from)s AND r.start_time <= %(valid_to)s
+                            LIMIT %(batch_size)s
+                        ), merged AS (
+                            DELETE FROM {table_name} r
+                            USING candidates c
+                            WHERE r.id = c.id AND (
+                                EXISTS (
+                                    SELECT 1 FROM {table_name} e
+                                    WHERE e.machine_name = %(machine_name)s AND e.program_name = %(target_name)s
+                                    AND e.start_time = c.start_time
+                                )
+                                OR EXISTS (SELECT 1 FROM candidates other WHERE other.start_time = c.start_time AND other.id < c.id)
+                            )
+                            RETURNING r.id
+                        ), renamed AS (
+                            UPDATE {table_name} SET program_name = %(target_name)s, program_id = %(target_program_id)s
+                            WHERE id IN (SELECT id FROM candidates) AND id NOT IN (SELECT id FROM merged)
+                            RETURNING id
+                        )
+                        SELECT (SELECT COUNT(*) FROM merged), (SELECT COUNT(*) FROM renamed);
+                    """).format(table_name=sql.Identifier(table_name), dim_table=sql.Identifier(PROGRAM_DIM_TABLE))
+                    while True:
+                        cur.execute(compact_query, {
+                            "target_name": target_name, "target_program_id": target_program_id,
+                            "machine_name": machine_name, "source_name": source_name,
+                            "valid_from": valid_from, "valid_to": valid_to, "batch_size": batch_size,
+                        })
+                        merged, updated = cur.fetchone()
+                        conn.commit()
+                        total_updated += updated
+                        if merged:
+                            logger.info(f"Program alias {alias_id}: merged {merged} '{source_name}' rows into existing '{target_name}' rows in '{table_name}'.")
+                        if merged + updated < batch_size:
+                            break
+                cur.execute(sql.SQL("UPDATE {} SET compacted_at = now() WHERE alias_id = %s;").format(sql.Identifier(PROGRAM_ALIAS_TABLE)), (alias_id,))
+                conn.commit()
+            except psycopg2.Error as e:
+                # Alias tetap berlaku saat dibaca; dicoba lagi pada interval berikutnya
+                logger.warning(f"Could not compact program alias {alias_id} ('{source_name}' -> '{target_name}'): {e}")
+                conn.rollback()
 
-    table_name = get_program_loss_breakdown_reports_table_name(datetime.datetime.now(timezone.utc))
+        if total_updated:
+            logger.info(f"Compacted {len(aliases)} program aliases, {total_updated} program report rows rewritten.")
+        return total_updated
+    except psycopg2.Error as e:
+        logger.error(f"Error compacting program aliases: {e}", exc_info=True)
+        if conn:
+            conn.rollback()
+        return total_updated
+    finally:
+        if cur: cur.close()
+        if conn: close_db_connection(conn)
 
-    if not create_program_loss_breakdown_reports_table(table_name):
-        logger.error(f"Failed to ensure loss breakdown archive table '{table_name}' exists before saving.")
-        return False
 
-    with db_write_lock:
+@_ensure_schema_once
+def create_program_target_table(table_name: str) -> bool:
+    with _ddl_lock:
         conn = None
         cur = None
         try:
-            conn = db_pool.getconn()
+            conn = connect_db()
             if conn is None:
-                logger.error("Failed to connect to database for saving loss breakdown report.")
+                logger.error(f"Failed to connect to database to create program target table '{table_name}'.")
                 return False
             cur = conn.cursor()
-
-            sql_query = sql.SQL("""
-                INSERT INTO {} (
-                    machine_name,
-                    report_date,
-                    loss_category,
-                    duration_seconds
-                ) VALUES (
-                    %s, %s, %s, %s
-                ) ON CONFLICT (machine_name, report_date, loss_category) DO UPDATE SET
-                    duration_seconds = EXCLUDED.duration_seconds;
-            """).format(sql.Identifier(table_name))
-
-            data_to_insert = []
-            for _, row in df_loss_breakdown.iterrows():
-                data_to_insert.append((
-                    machine_name,
-                    report_date,
-                    row['Category'],
-                    float(row['Duration (seconds)'])
-                ))
-
-            cur.executemany(sql_query, data_to_insert)
+            # Setiap perubahan target menambah versi baru; versi tertinggi per program adalah target yang berlaku
+            cur.execute(sql.SQL("""
+                CREATE TABLE IF NOT EXISTS {table_name} (
+                    target_id SERIAL PRIMARY KEY,
+                    program_name VARCHAR(255) NOT NULL,
+                    version INTEGER NOT NULL,
+                    target_duration_seconds REAL NOT NULL DEFAULT 0,
+                    target_spindle_speed INTEGER NOT NULL DEFAULT 0,
+                    target_feed_rate INTEGER NOT NULL DEFAULT 0,
+                    notes TEXT,
+                    remarks TEXT,
+                    source VARCHAR(255),
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE (program_name, version)
+                );
+            """).format(table_name=sql.Identifier(table_name)))
             conn.commit()
-            logger.info(f"Successfully saved loss breakdown report for {machine_name} to table '{table_name}'.")
+            logger.info(f"Table '{table_name}' checked/created successfully.")
             return True
-        except Exception as e:
-            logger.error(f"Error saving loss breakdown report: {e}", exc_info=True)
+        except psycopg2.Error as e:
+            logger.error(f"Error creating program target table '{table_name}': {e}", exc_info=True)
             if conn:
                 conn.rollback()
             return False
@@ -1580,9 +2904,183 @@ def save_loss_breakdown_report(machine_name, report_date, df_loss_breakdown):
             if cur:
                 cur.close()
             if conn:
-                db_pool.putconn(conn)
+                close_db_connection(conn)
+
+@_instrument_write("save_program_targets")
+def save_program_targets(df_targets: pd.DataFrame, source: str = None) -> bool:
+    """
+    Menyimpan target program secara massal. Kolom: program_name, target_duration_seconds,
+    target_spindle_speed, target_feed_rate, dan opsional notes, remarks.
+    Hanya program yang targetnya berubah (atau baru) yang mendapat versi baru; versi lama tetap disimpan.
+    """
+    if df_targets.empty:
+        logger.info("No program targets to save.")
+        return True
+    if not create_program_target_table(PROGRAM_TARGET_TABLE):
+        logger.error(f"Failed to ensure program target table '{PROGRAM_TARGET_TABLE}' exists before saving.")
+        return False
+
+    df_rows = pd.DataFrame({
+        'program_name': df_targets['program_name'].astype(str).str.strip(),
+        'target_duration_seconds': pd.to_numeric(df_targets['target_duration_seconds'], errors='coerce').fillna(0.0).astype(float),
+        'target_spindle_speed': pd.to_numeric(df_targets['target_spindle_speed'], errors='coerce').fillna(0).round().astype(int),
+        'target_feed_rate': pd.to_numeric(df_targets['target_feed_rate'], errors='coerce').fillna(0).round().astype(int),
+        # Kolom yang tidak dikirim (None) mempertahankan nilai versi sebelumnya
+        'notes': df_targets['notes'].fillna('').astype(str) if 'notes' in df_targets else None,
+        'remarks': df_targets['remarks'].fillna('').astype(str) if 'remarks' in df_targets else None,
+        'source': source,
+    })
+    df_rows = df_rows[df_rows['program_name'] != '']
+    rows = [tuple(row) for row in df_rows.astype(object).itertuples(index=False, name=None)]
+
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error("Failed to connect to database for saving program targets.")
+            return False
+        cur = conn.cursor()
+        # Versi baru = versi terakhir + 1; simpan serentak untuk program yang sama diserialkan dengan advisory lock
+        # per program (urutan tetap agar dua batch tidak saling menunggu) hingga transaksi selesai
+        program_names = sorted({row[0] for row in rows})
+        cur.execute(
+            "SELECT pg_advisory_xact_lock(hashtext(p)) FROM (SELECT p FROM unnest(%s::text[]) AS p ORDER BY p) AS ordered",
+            (program_names,)
+        )
+        insert_query = sql.SQL("""
+            INSERT INTO {table_name} (program_name, version, target_duration_seconds, target_spindle_speed, target_feed_rate, notes, remarks, source)
+            SELECT i.program_name, COALESCE(current.version, 0) + 1, i.target_duration_seconds, i.target_spindle_speed,
+                   i.target_feed_rate, COALESCE(i.notes, current.notes), COALESCE(i.remarks, current.remarks), i.source
+            FROM (VALUES %s) AS i(program_name, target_duration_seconds, target_spindle_speed, target_feed_rate, notes, remarks, source)
+            LEFT JOIN LATERAL (
+                SELECT version, target_duration_seconds, target_spindle_speed, target_feed_rate, notes, remarks
+                FROM {table_name} t
+                WHERE t.program_name = i.program_name
+                ORDER BY version DESC
+                LIMIT 1
+            ) current ON TRUE
+            WHERE current.version IS NULL
+            OR (current.target_duration_seconds, current.target_spindle_speed, current.target_feed_rate, current.notes, current.remarks)
+               IS DISTINCT FROM (i.target_duration_seconds, i.target_spindle_speed, i.target_feed_rate,
+                                 COALESCE(i.notes, current.notes), COALESCE(i.remarks, current.remarks));
+        """).format(table_name=sql.Identifier(PROGRAM_TARGET_TABLE))
+        _bulk_write(cur, insert_query, rows, "save_program_targets", conflict_key=(0,),
+                    template="(%s, %s::real, %s::integer, %s::integer, %s::text, %s::text, %s::varchar)")
+        conn.commit()
+        logger.info(f"Saved {len(rows)} program targets to '{PROGRAM_TARGET_TABLE}' (source: {source}); unchanged targets kept their version.")
+        return True
+    except psycopg2.Error as e:
+        logger.error(f"Database error saving program targets: {e}", exc_info=True)
+        if conn:
+            conn.rollback()
+        _forget_table_if_undefined(e, PROGRAM_TARGET_TABLE)
+        return False
+    finally:
+        if cur: cur.close()
+        if conn: close_db_connection(conn)
+
+def get_program_targets(program_names=None, as_of: datetime.datetime = None) -> list:
+    """
+    Target yang berlaku per program (versi terbaru, atau versi terbaru pada waktu as_of).
+    Mengembalikan list of dicts: program_name, version, target_duration_seconds, target_spindle_speed,
+    target_feed_rate, notes, remarks.
+    """
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            return []
+        cur = conn.cursor()
+        if not table_exists(PROGRAM_TARGET_TABLE, cur):
+            return []
+        conditions = []
+        params = []
+        if program_names is not None:
+            conditions.append(sql.SQL("program_name = ANY(%s)"))
+            params.append(list(program_names))
+        if as_of is not None:
+            conditions.append(sql.SQL("created_at <= %s"))
+            params.append(as_of)
+        where_clause = sql.SQL(" WHERE ") + sql.SQL(" AND ").join(conditions) if conditions else sql.SQL("")
+        cur.execute(sql.SQL("""
+            SELECT DISTINCT ON (program_name)
+                program_name, version, target_duration_seconds, target_spindle_speed, target_feed_rate, notes, remarks
+            FROM {}{}
+            ORDER BY program_name, version DESC;
+        """).format(sql.Identifier(PROGRAM_TARGET_TABLE), where_clause), params)
+        column_names = [desc[0] for desc in cur.description]
+        return [dict(zip(column_names, record)) for record in cur.fetchall()]
+    except psycopg2.Error as e:
+        logger.error(f"Error fetching program targets: {e}", exc_info=True)
+        _forget_table_if_undefined(e, PROGRAM_TARGET_TABLE)
+        return []
+    finally:
+        if cur: cur.close()
+        if conn: close_db_connection(conn)
+
+@_instrument_write("save_loss_breakdown_report")
+def save_loss_breakdown_report(machine_name, report_date, df_loss_breakdown):
+    """
+    Menyimpan rincian waktu loss ke database.
+    """
+    if df_loss_breakdown.empty:
+        logging.warning("Tidak ada data loss breakdown untuk disimpan.")
+        return True 
+
+    table_name = get_program_loss_breakdown_reports_table_name(datetime.datetime.now(timezone.utc))
+
+    if not create_program_loss_breakdown_reports_table(table_name):
+        logger.error(f"Failed to ensure loss breakdown archive table '{table_name}' exists before saving.")
+        return False
+
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error("Failed to connect to database for saving loss breakdown report.")
+            return False
+        cur = conn.cursor()
+
+        sql_query = sql.SQL("""
+            INSERT INTO {} (
+                machine_name,
+                report_date,
+                loss_category,
+                duration_seconds
+            ) VALUES %s
+            ON CONFLICT (machine_name, report_date, loss_category) DO UPDATE SET
+                duration_seconds = EXCLUDED.duration_seconds;
+        """).format(sql.Identifier(table_name))
+
+        data_to_insert = []
+        for _, row in df_loss_breakdown.iterrows():
+            data_to_insert.append((
+                machine_name,
+                report_date,
+                row['Category'],
+                float(row['Duration (seconds)'])
+            ))
+
+        _bulk_write(cur, sql_query, data_to_insert, "save_loss_breakdown_report", conflict_key=(0, 1, 2))
+        conn.commit()
+        logger.info(f"Successfully saved loss breakdown report for {machine_name} to table '{table_name}'.")
+        return True
+    except Exception as e:
+        logger.error(f"Error saving loss breakdown report: {e}", exc_info=True)
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            close_db_connection(conn)
 
 
+@_instrument_write("save_loss_breakdown_per_piece_report")
 def save_loss_breakdown_per_piece_report(machine_name, report_date, df_loss_breakdown_per_piece):
     """
     Menyimpan rincian waktu loss ke database.
@@ -1597,55 +3095,54 @@ def save_loss_breakdown_per_piece_report(machine_name, report_date, df_loss_brea
         logger.error(f"Failed to ensure loss breakdown archive table '{table_name}' exists before saving.")
         return False
 
-    with db_write_lock:
-        conn = None
-        cur = None
-        try:
-            conn = db_pool.getconn()
-            if conn is None:
-                logger.error("Failed to connect to database for saving loss breakdown report.")
-                return False
-            cur = conn.cursor()
-
-            sql_query = sql.SQL("""
-                INSERT INTO {} (
-                    machine_name,
-                    report_date,
-                    loss_category,
-                    duration_seconds
-                ) VALUES (
-                    %s, %s, %s, %s
-                ) ON CONFLICT (machine_name, report_date, loss_category) DO UPDATE SET
-                    duration_seconds = EXCLUDED.duration_seconds;
-            """).format(sql.Identifier(table_name))
+    conn = None
+    cur = None
+    try:
+        conn = connect_db()
+        if conn is None:
+            logger.error("Failed to connect to database for saving loss breakdown report.")
+            return False
+        cur = conn.cursor()
 
-            data_to_insert = []
-            for _, row in df_loss_breakdown_per_piece.iterrows():
-                data_to_insert.append((
-                    machine_name,
-                    report_date,
-                    row['Category'],
-                    float(row['Duration (seconds)'])
-                ))
+        sql_query = sql.SQL("""
+            INSERT INTO {} (
+                machine_name,
+                report_date,
+                loss_category,
+                duration_seconds
+            ) VALUES %s
+            ON CONFLICT (machine_name, report_date, loss_category) DO UPDATE SET
+                duration_seconds = EXCLUDED.duration_seconds;
+        """).format(sql.Identifier(table_name))
+
+        data_to_insert = []
+        for _, row in df_loss_breakdown_per_piece.iterrows():
+            data_to_insert.append((
+                machine_name,
+                report_date,
+                row['Category'],
+                float(row['Duration (seconds)'])
+            ))
 
-            cur.executemany(sql_query, data_to_insert)
-            conn.commit()
-            logger.info(f"Successfully saved loss breakdown report for {machine_name} to table '{table_name}'.")
-            return True
-        except Exception as e:
-            logger.error(f"Error saving loss breakdown report: {e}", exc_info=True)
-            if conn:
-                conn.rollback()
-            return False
-        finally:
-            if cur:
-                cur.close()
-            if conn:
-                db_pool.putconn(conn)
+        _bulk_write(cur, sql_query, data_to_insert, "save_loss_breakdown_per_piece_report", conflict_key=(0, 1, 2))
+        conn.commit()
+        logger.info(f"Successfully saved loss breakdown report for {machine_name} to table '{table_name}'.")
+        return True
+    except Exception as e:
+        logger.error(f"Error saving loss breakdown report: {e}", exc_info=True)
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            close_db_connection(conn)
 
 
+@_ensure_schema_once
 def create_program_loss_breakdown_reports_table(table_name: str):
-    with db_write_lock:
+    with _ddl_lock:
         conn = None
         cur = None
         try:
@@ -1680,8 +3177,9 @@ def create_program_loss_breakdown_reports_table(table_name: str):
                 close_db_connection(conn)
 
 
+@_ensure_schema_once
 def create_program_loss_breakdown_per_piece_reports_table(table_name: str):
-    with db_write_lock:
+    with _ddl_lock:
         conn = None
         cur = None
         try:
@@ -1758,8 +3256,7 @@ def get_loss_breakdown_report(machine_name: str = None, start_date: datetime.dat
         
         for table_name in sorted(list(table_names_to_query)):
             try:
-                cur.execute(sql.SQL("SELECT to_regclass({})").format(sql.Literal(table_name)))
-                if cur.fetchone()[0] is None:
+                if not table_exists(table_name, cur):
                     logger.debug(f"Loss breakdown archive table '{table_name}' does not exist. Skipping.")
                     continue
                 
@@ -1835,8 +3332,7 @@ def get_loss_breakdown_per_piece_report(machine_name: str = None, start_date: da
         
         for table_name in sorted(list(table_names_to_query)):
             try:
-                cur.execute(sql.SQL("SELECT to_regclass({})").format(sql.Literal(table_name)))
-                if cur.fetchone()[0] is None:
+                if not table_exists(table_name, cur):
                     logger.debug(f"Loss breakdown per piece archive table '{table_name}' does not exist. Skipping.")
                     continue
                 
@@ -0,0 +1,208 @@
+# app_core/live_api.py
+
+import json
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from app_core.metrics import render_prometheus
+
+logger = logging.getLogger(__name__)
+
+
+class LiveDataHub:
+    """
+    Menyimpan salinan terbaru latest_machine_data dan machine_shift_metrics untuk API live.
+
+    Setiap publish() membuat snapshot baru dan menserialisasi setiap mesin satu kali saja.
+    Hanya mesin yang berubah yang masuk ke riwayat delta, sehingga biaya per klien hanya
+    menyambung string yang sudah jadi, tidak bergantung pada jumlah klien.
+
+    Args:
+        machine_data_ref (dict): Referensi ke latest_machine_data.
+        machine_data_lock: Lock untuk machine_data_ref.
+        shift_metrics_ref (dict): Referensi ke machine_shift_metrics.
+        shift_metrics_lock: Lock untuk shift_metrics_ref.
+        history_size (int): Jumlah versi delta yang disimpan untuk klien yang tertinggal.
+    """
+
+    def __init__(self, machine_data_ref, machine_data_lock, shift_metrics_ref, shift_metrics_lock, history_size=120):
+        self.machine_data_ref = machine_data_ref
+        self.machine_data_lock = machine_data_lock
+        self.shift_metrics_ref = shift_metrics_ref
+        self.shift_metrics_lock = shift_metrics_lock
+        self.version = 0
+        self._machine_json = {}
+        self._history = deque(maxlen=history_size)
+        self._condition = threading.Condition()
+
+    def publish(self) -> int:
+        """Mengambil snapshot baru dari state main_app. Mengembalikan jumlah mesin yang berubah."""
+        with self.machine_data_lock:
+            machine_data = {name: dict(data) for name, data in self.machine_data_ref.items()}
+        with self.shift_metrics_lock:
+            shift_metrics = {
+                name: {shift: dict(values) for shift, values in shifts.items()}
+                for name, shifts in self.shift_metrics_ref.items()
+            }
+
+        machine_json = {}
+        for machine_name in set(machine_data) | set(shift_metrics):
+            machine_json[machine_name] = json.dumps(
+                {"data": machine_data.get(machine_name), "shift_metrics": shift_metrics.get(machine_name, {})},
+                default=str,
+                sort_keys=True,
+            )
+
+        changed = {name: payload for name, payload in machine_json.items() if self._machine_json.get(name) != payload}
+        if changed:
+            with self._condition:
+                self.version += 1
+                self._machine_json = machine_json
+                self._history.append((self.version, changed))
+                self._condition.notify_all()
+        return len(changed)
+
+    def run_publisher(self, stop_event, interval=1.0):
+        logger.info(f"Starting live data hub publisher, every {interval} seconds.")
+        while not stop_event.is_set():
+            try:
+                self.publish()
+            except Exception as e:
+                logger.error(f"Error publishing live data snapshot: {e}", exc_info=True)
+            stop_event.wait(interval)
+        with self._condition:
+            self._condition.notify_all()
+        logger.info("Live data hub publisher stopped.")
+
+    def snapshot(self, machines=None):
+        with self._condition:
+            return self.version, _filter_machines(self._machine_json, machines)
+
+    def changes_since(self, version, machines=None):
+        """
+        Mengembalikan (versi_baru, {mesin: json}) berisi mesin yang berubah sejak 'version'.
+        Mengembalikan None jika riwayat tidak lagi mencakup versi tersebut (klien perlu snapshot penuh).
+        """
+        with self._condition:
+            if version == self.version:
+                return self.version, {}
+            if version > self.version or not self._history or self._history[0][0] > version + 1:
+                return None
+            merged = {}
+            for entry_version, changed in self._history:
+                if entry_version > version:
+                    merged.update(changed)
+            return self.version, _filter_machines(merged, machines)
+
+    def wait_for_change(self, version, timeout) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: self.version != version, timeout=timeout)
+
+
+def _filter_machines(machine_json, machines):
+    if not machines:
+        return dict(machine_json)
+    return {name: payload for name, payload in machine_json.items() if name in machines}
+
+
+def _render_payload(version, machine_json) -> str:
+    body = ", ".join(f"{json.dumps(name)}: {payload}" for name, payload in sorted(machine_json.items()))
+    return f'{{"version": {version}, "machines": {{{body}}}}}'
+
+
+class LiveApiRequestHandler(BaseHTTPRequestHandler):
+    """
+    Endpoint:
+        GET /api/live?machine=A&machine=B          -> snapshot JSON (filter mesin opsional)
+        GET /api/live/stream?machine=A,B           -> Server-Sent Events: 'snapshot' lalu 'delta'
+        GET /metrics                               -> metrik internal dalam format teks Prometheus
+    """
+
+    hub = None
+    keepalive_seconds = 15.0
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug(f"[Live-API] {self.address_string()} {format % args}")
+
+    def _requested_machines(self, query):
+        machines = set()
+        for value in query.get("machine", []):
+            machines.update(name.strip() for name in value.split(",") if name.strip())
+        return machines or None
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        machines = self._requested_machines(query)
+
+        if parsed.path == "/api/live":
+            version, machine_json = self.hub.snapshot(machines)
+            self._send_body(200, "application/json", _render_payload(version, machine_json))
+        elif parsed.path == "/api/live/stream":
+            self._stream(machines)
+        elif parsed.path == "/metrics":
+            self._send_body(200, "text/plain; version=0.0.4", render_prometheus())
+        else:
+            self._send_body(404, "application/json", json.dumps({"error": "not found"}))
+
+    def _send_body(self, status, content_type, body):
+        encoded = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def _send_event(self, event, version, payload):
+        self.wfile.write(f"event: {event}\nid: {version}\ndata: {payload}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def _stream(self, machines):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "keep-alive")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.close_connection = True
+
+        try:
+            last_event_id = self.headers.get("Last-Event-ID")
+            version = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+            if version is None or self.hub.changes_since(version, machines) is None:
+                version, machine_json = self.hub.snapshot(machines)
+                self._send_event("snapshot", version, _render_payload(version, machine_json))
+
+            while True:
+                if not self.hub.wait_for_change(version, timeout=self.keepalive_seconds):
+                    self.wfile.write(b": keepalive\n\n")
+                    self.wfile.flush()
+                    continue
+                delta = self.hub.changes_since(version, machines)
+                if delta is None:
+                    # Klien terlalu tertinggal dari riwayat delta: kirim ulang snapshot penuh.
+                    version, machine_json = self.hub.snapshot(machines)
+                    self._send_event("snapshot", version, _render_payload(version, machine_json))
+                    continue
+                version, machine_json = delta
+                if machine_json:
+                    self._send_event("delta", version, _render_payload(version, machine_json))
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+            logger.debug(f"[Live-API] Stream client {self.address_string()} disconnected.")
+
+
+def start_live_api_server(hub, host, port):
+    """Menjalankan server HTTP live API di thread daemon. Mengembalikan instance server."""
+    handler_class = type("BoundLiveApiRequestHandler", (LiveApiRequestHandler,), {"hub": hub})
+    server = ThreadingHTTPServer((host, port), handler_class)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="Live-API-Server-Thread", daemon=True)
+    thread.start()
+    logger.info(f"Live data API listening on http://{host}:{port}/api/live")
+    return server
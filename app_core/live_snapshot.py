@@ -0,0 +1,237 @@
+# app_core/live_snapshot.py
+
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Snapshot data mesin terbaru yang ditulis main_app ke file yang di-memory-map.
+# Layout tetap: header lalu satu record per mesin. Header berisi counter 'seq' (seqlock):
+# ganjil selama penulisan, genap jika snapshot konsisten. Pembaca menyalin buffer lalu
+# memeriksa seq lagi, sehingga tidak pernah melihat data setengah tertulis.
+SNAPSHOT_MAGIC = b"IOTS"
+SNAPSHOT_LAYOUT_VERSION = 1
+
+# magic, layout_version, slot_count, seq, updated_at, machine_count
+_HEADER = struct.Struct("<4sHHQdI4x")
+_SEQ_OFFSET = 8
+_SEQ = struct.Struct("<Q")
+
+# name, Status_Text, Current_Program, lalu nilai numerik (NaN = None)
+_RECORD = struct.Struct("<64s48s96s9d")
+_NUMERIC_FIELDS = (
+    "Spindle_Speed",
+    "FeedRate_mm_per_min",
+    "Moden",
+    "Motion",
+    "State_Number",
+    "OvrSpindle",
+    "OvrFeed",
+    "Status",
+    "Timestamp_Processed",
+)
+
+
+def _snapshot_size(slot_count: int) -> int:
+    return _HEADER.size + slot_count * _RECORD.size
+
+
+def _encode_text(value, size: int) -> bytes:
+    if value is None:
+        return b""
+    return str(value).encode("utf-8")[:size]
+
+
+def _decode_text(raw: bytes):
+    text = raw.rstrip(b"\0").decode("utf-8", errors="ignore")
+    return text or None
+
+
+def _encode_number(value) -> float:
+    if value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _decode_number(value: float):
+    if math.isnan(value):
+        return None
+    if value.is_integer() and abs(value) < 2 ** 53:
+        return int(value)
+    return value
+
+
+class LiveSnapshotWriter:
+    """
+    Penulis snapshot (hanya satu, di main_app).
+
+    Args:
+        path (str): Lokasi file snapshot.
+        slot_count (int): Jumlah mesin maksimum yang bisa disimpan.
+    """
+
+    def __init__(self, path, slot_count):
+        self.path = path
+        self.slot_count = max(1, int(slot_count))
+        self._slots = {}
+        self._last_records = None
+        size = _snapshot_size(self.slot_count)
+
+        # Pakai ulang file yang sudah ada jika ukurannya cocok, agar pembaca yang sedang
+        # me-map file lama tetap melihat pembaruan setelah main_app di-restart.
+        mode = "r+b" if os.path.exists(path) and os.path.getsize(path) == size else "w+b"
+        self._file = open(path, mode)
+        if mode == "w+b":
+            self._file.truncate(size)
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        seq = _SEQ.unpack_from(self._mm, _SEQ_OFFSET)[0] if mode == "r+b" else 0
+        self._seq = seq + (seq % 2)
+        _HEADER.pack_into(self._mm, 0, SNAPSHOT_MAGIC, SNAPSHOT_LAYOUT_VERSION, self.slot_count, self._seq, time.time(), 0)
+
+    def write(self, machine_data: dict) -> int:
+        """
+        Menulis seluruh data mesin sebagai satu snapshot baru. Mengembalikan seq baru.
+        Jika isinya sama persis dengan snapshot terakhir, tidak ada yang ditulis dan seq tidak berubah,
+        sehingga pembaca bisa melewati decode dan gambar ulang.
+        """
+        records = []
+        for machine_name, data in machine_data.items():
+            slot = self._slots.get(machine_name)
+            if slot is None:
+                if len(self._slots) >= self.slot_count:
+                    logger.warning(f"Live snapshot is full ({self.slot_count} slots). Skipping machine '{machine_name}'.")
+                    continue
+                slot = len(self._slots)
+                self._slots[machine_name] = slot
+            data = data or {}
+            records.append((slot, _RECORD.pack(
+                _encode_text(machine_name, 64),
+                _encode_text(data.get("Status_Text"), 48),
+                _encode_text(data.get("Current_Program"), 96),
+                *(_encode_number(data.get(field)) for field in _NUMERIC_FIELDS),
+            )))
+        # NaN tidak sama dengan dirinya sendiri sebagai float, tetapi bytes-nya sama, jadi bandingkan hasil pack
+        if records == self._last_records:
+            return self._seq
+
+        self._seq += 1
+        _SEQ.pack_into(self._mm, _SEQ_OFFSET, self._seq)
+        for slot, packed in records:
+            offset = _HEADER.size + slot * _RECORD.size
+            self._mm[offset:offset + _RECORD.size] = packed
+        self._last_records = records
+        self._seq += 1
+        _HEADER.pack_into(self._mm, 0, SNAPSHOT_MAGIC, SNAPSHOT_LAYOUT_VERSION, self.slot_count, self._seq, time.time(), len(self._slots))
+        return self._seq
+
+    def close(self):
+        try:
+            self._mm.close()
+        finally:
+            self._file.close()
+
+
+class LiveSnapshotReader:
+    """
+    Pembaca snapshot untuk dashboard. Aman dipakai bersama oleh beberapa sesi: map, map ulang, baca
+    dan close dijaga satu lock, sehingga satu sesi tidak bisa menutup mapping yang sedang dibaca sesi lain.
+
+    Args:
+        path (str): Lokasi file snapshot.
+        max_retries (int): Jumlah percobaan jika snapshot sedang ditulis.
+    """
+
+    def __init__(self, path, max_retries=50):
+        self.path = path
+        self.max_retries = max_retries
+        self._file = None
+        self._mm = None
+        self._size = 0
+        # RLock: read() dan _ensure_mapped() memanggil close() saat lock sudah dipegang
+        self._lock = threading.RLock()
+
+    def _ensure_mapped(self) -> bool:
+        # Dipanggil dengan self._lock dipegang
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            self.close()
+            return False
+        if self._mm is not None and size == self._size:
+            return True
+        self.close()
+        if size < _HEADER.size:
+            return False
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        self._size = size
+        return True
+
+    def read(self, last_seq=None):
+        """
+        Mengembalikan (seq, data). Jika seq sama dengan last_seq, data bernilai None
+        (tidak ada perubahan, tidak ada yang di-decode). Mengembalikan (None, None) jika
+        snapshot belum tersedia.
+        """
+        with self._lock:
+            return self._read_locked(last_seq)
+
+    def _read_locked(self, last_seq):
+        if not self._ensure_mapped():
+            return None, None
+
+        for _ in range(self.max_retries):
+            seq_before = _SEQ.unpack_from(self._mm, _SEQ_OFFSET)[0]
+            if seq_before % 2 == 1:
+                time.sleep(0.001)
+                continue
+            if seq_before == last_seq:
+                return seq_before, None
+            buffer = self._mm[:self._size]
+            if _SEQ.unpack_from(self._mm, _SEQ_OFFSET)[0] != seq_before:
+                continue
+
+            magic, layout_version, slot_count, seq, updated_at, machine_count = _HEADER.unpack_from(buffer, 0)
+            if magic != SNAPSHOT_MAGIC or layout_version != SNAPSHOT_LAYOUT_VERSION:
+                logger.warning(f"Live snapshot '{self.path}' has an unknown layout. Ignoring it.")
+                return None, None
+            if _snapshot_size(slot_count) != self._size:
+                # File dibuat ulang dengan jumlah slot berbeda; map ulang pada panggilan berikutnya.
+                self.close()
+                return None, None
+
+            machine_data = {}
+            for slot in range(min(machine_count, slot_count)):
+                name_raw, status_raw, program_raw, *numbers = _RECORD.unpack_from(buffer, _HEADER.size + slot * _RECORD.size)
+                machine_name = _decode_text(name_raw)
+                if machine_name is None:
+                    continue
+                data = {
+                    "Status_Text": _decode_text(status_raw),
+                    "Current_Program": _decode_text(program_raw),
+                }
+                for field, value in zip(_NUMERIC_FIELDS, numbers):
+                    data[field] = _decode_number(value)
+                machine_data[machine_name] = data
+            return seq, machine_data
+
+        logger.warning(f"Could not get a consistent live snapshot from '{self.path}' after {self.max_retries} attempts.")
+        return None, None
+
+    def close(self):
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._size = 0
@@ -0,0 +1,185 @@
+# app_core/log_setup.py
+"""
+Logging asinkron untuk main_app.
+
+Semua logger menulis ke satu antrean (QueueHandler); satu thread listener memformat record dan menulisnya ke
+file per logger (berputar berdasarkan ukuran) atau ke konsol. Thread polling/DB hanya memasukkan record ke
+antrean, tidak pernah menunggu disk. Jika antrean penuh, record dibuang dan dihitung di metrik
+iot_log_records_dropped_total, alih-alih memblokir ingest.
+
+LogSampler membatasi pesan jalur panas yang berulang per mesin (misal data mentah tiap poll) menjadi paling
+banyak satu per interval, dengan jumlah pesan yang dilewati dicatat di pesan berikutnya.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+from app_core import metrics
+from app_core.config import LOG_FILE_MAX_BYTES, LOG_FILE_BACKUP_COUNT, LOG_QUEUE_MAX_SIZE, LOG_SAMPLE_INTERVAL_SECONDS
+
+DEFAULT_LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+LOG_RECORDS_DROPPED = metrics.counter("iot_log_records_dropped_total", "Log records dropped because the log queue was full.")
+LOG_QUEUE_DEPTH = metrics.gauge("iot_log_queue_depth", "Log records waiting for the log listener thread.")
+
+_listener = None
+_log_queue = None
+_listener_lock = threading.Lock()
+_atexit_registered = False
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler yang membuang record saat antrean penuh, agar thread pemanggil tidak pernah tertahan."""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class _RoutingHandler(logging.Handler):
+    """
+    Handler di thread listener: meneruskan record ke handler file milik logger terkonfigurasi terdekat
+    (berdasarkan nama bertitik), atau ke handler default (konsol).
+    """
+
+    def __init__(self, routes: dict, default_handler: logging.Handler):
+        super().__init__()
+        self.routes = routes
+        self.default_handler = default_handler
+        self._resolved = {}
+
+    def _target(self, logger_name: str) -> logging.Handler:
+        handler = self._resolved.get(logger_name)
+        if handler is None:
+            probe = logger_name
+            while probe and probe not in self.routes:
+                probe = probe.rpartition(".")[0]
+            handler = self._resolved[logger_name] = self.routes.get(probe, self.default_handler)
+        return handler
+
+    def emit(self, record):
+        handler = self._target(record.name)
+        if record.levelno >= handler.level:
+            handler.handle(record)
+
+    def close(self):
+        for handler in list(self.routes.values()) + [self.default_handler]:
+            handler.close()
+        super().close()
+
+
+def _collect_queue_depth():
+    if _log_queue is not None:
+        LOG_QUEUE_DEPTH.set(_log_queue.qsize())
+
+
+metrics.get_registry().add_collector(_collect_queue_depth)
+
+
+def configure_logging(loggers_config: dict, log_format: str = DEFAULT_LOG_FORMAT, root_level=logging.DEBUG,
+                      max_bytes: int = None, backup_count: int = None, queue_size: int = None):
+    """
+    Memasang logging berbasis antrean untuk proses ini (memanggil ulang mengganti konfigurasi sebelumnya).
+
+    Args:
+        loggers_config (dict): {nama_logger: {'file': path, 'level': level}}. Logger ini menulis ke file
+                               sendiri (RotatingFileHandler) dan tidak diteruskan ke root.
+        log_format (str): Format record untuk file dan konsol.
+        root_level: Level logger root; record root dan logger lain ditulis ke konsol.
+        max_bytes (int), backup_count (int): Rotasi file log; default LOG_FILE_MAX_BYTES / LOG_FILE_BACKUP_COUNT.
+        queue_size (int): Kapasitas antrean record; default LOG_QUEUE_MAX_SIZE.
+    """
+    global _listener, _log_queue, _atexit_registered
+    max_bytes = LOG_FILE_MAX_BYTES if max_bytes is None else max_bytes
+    backup_count = LOG_FILE_BACKUP_COUNT if backup_count is None else backup_count
+    queue_size = LOG_QUEUE_MAX_SIZE if queue_size is None else queue_size
+
+    stop_logging()
+    with _listener_lock:
+        formatter = logging.Formatter(log_format)
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+
+        routes = {}
+        for logger_name, config_setting in loggers_config.items():
+            file_handler = logging.handlers.RotatingFileHandler(
+                config_setting['file'], maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+            )
+            file_handler.setFormatter(formatter)
+            routes[logger_name] = file_handler
+
+        _log_queue = queue.Queue(maxsize=queue_size)
+        queue_handler = _DroppingQueueHandler(_log_queue)
+
+        root_logger = logging.getLogger()
+        root_logger.setLevel(root_level)
+        for handler in root_logger.handlers[:]:
+            root_logger.removeHandler(handler)
+        root_logger.addHandler(queue_handler)
+
+        for logger_name, config_setting in loggers_config.items():
+            specific_logger = logging.getLogger(logger_name)
+            specific_logger.setLevel(config_setting['level'])
+            for handler in specific_logger.handlers[:]:
+                specific_logger.removeHandler(handler)
+            specific_logger.addHandler(queue_handler)
+            specific_logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(_log_queue, _RoutingHandler(routes, console_handler))
+        _listener.start()
+        if not _atexit_registered:
+            atexit.register(stop_logging)
+            _atexit_registered = True
+
+
+def stop_logging():
+    """Menghentikan thread listener setelah record yang sudah ada di antrean ditulis, lalu menutup file."""
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            return
+        listener, _listener = _listener, None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+class LogSampler:
+    """
+    Membatasi pesan yang berulang: per (kunci, template pesan) paling banyak satu record per interval.
+    Pesan dan argumennya hanya diformat jika level aktif dan record lolos sampling.
+
+    Args:
+        interval_seconds (float): Jarak minimum antar pesan yang sama untuk kunci yang sama; 0 = tanpa sampling.
+    """
+
+    def __init__(self, interval_seconds: float = None):
+        self.interval_seconds = LOG_SAMPLE_INTERVAL_SECONDS if interval_seconds is None else interval_seconds
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def log(self, target_logger: logging.Logger, level: int, key, msg: str, *args, **kwargs) -> bool:
+        """Seperti target_logger.log(level, msg, *args) dengan sampling per kunci (misal nama mesin)."""
+        if not target_logger.isEnabledFor(level):
+            return False
+        now = time.monotonic()
+        state_key = (key, msg)
+        with self._lock:
+            state = self._state.get(state_key)
+            if state is not None and now - state[0] < self.interval_seconds:
+                state[1] += 1
+                return False
+            suppressed = state[1] if state is not None else 0
+            self._state[state_key] = [now, 0]
+        if suppressed:
+            msg = f"{msg} (%d similar messages suppressed)"
+            args = args + (suppressed,)
+        kwargs.setdefault("stacklevel", 2)
+        target_logger.log(level, msg, *args, **kwargs)
+        return True
@@ -0,0 +1,309 @@
+# app_core/metrics.py
+
+import bisect
+import contextlib
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Batas bucket default untuk durasi (detik) dan ukuran batch (baris)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _label_key(labelnames, labels) -> tuple:
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(sorted(labels))}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=()) -> str:
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    """Nilai kumulatif yang hanya naik (jumlah sampel, kegagalan, ...)."""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def values(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> list:
+        lines = self._header()
+        for key, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Nilai sesaat (kedalaman antrean, koneksi dipakai, heartbeat thread, ...)."""
+
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def values(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> list:
+        lines = self._header()
+        for key, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class _HistogramState:
+    __slots__ = ("bucket_counts", "count", "total", "max")
+
+    def __init__(self, bucket_count):
+        self.bucket_counts = [0] * bucket_count
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class Histogram(_Metric):
+    """
+    Distribusi nilai dalam bucket tetap (latensi, ukuran batch). observe() hanya menaikkan satu bucket,
+    jadi murah untuk jalur panas. Persentil di summary_lines() diperkirakan dari batas bucket.
+
+    Args:
+        buckets: Batas atas bucket (urut naik), tanpa +Inf.
+    """
+
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = _HistogramState(len(self.buckets) + 1)
+            state.bucket_counts[index] += 1
+            state.count += 1
+            state.total += value
+            if value > state.max:
+                state.max = value
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Mengukur durasi blok with dalam detik."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> dict:
+        """{label_key: (bucket_counts, count, total, max)} salinan konsisten per label."""
+        with self._lock:
+            return {key: (list(state.bucket_counts), state.count, state.total, state.max) for key, state in self._values.items()}
+
+    def quantile(self, bucket_counts, count, q: float) -> float:
+        """Batas atas bucket tempat persentil q jatuh (perkiraan)."""
+        if not count:
+            return 0.0
+        rank = q * count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), bucket_counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return bound
+        return math.inf
+
+    def render(self) -> list:
+        lines = self._header()
+        for key, (bucket_counts, count, total, _) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), bucket_counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Kumpulan metrik proses ini. Metrik didaftarkan sekali per nama (counter()/gauge()/histogram()
+    mengembalikan instance yang sama untuk nama yang sama). Collector dipanggil sebelum render/summary
+    untuk mengisi gauge dari statistik yang sudah ada (misal pool koneksi DB).
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._last_summary = {}
+
+    def _get_or_create(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric '{name}' already registered with a different type or labels.")
+            return metric
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def add_collector(self, collector):
+        with self._lock:
+            self._collectors.append(collector)
+
+    def _collect(self):
+        with self._lock:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+
+    def render_prometheus(self) -> str:
+        """Semua metrik dalam format teks Prometheus (exposition format 0.0.4)."""
+        self._collect()
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self) -> list:
+        """
+        Ringkasan untuk log berkala: histogram (jumlah, rata-rata, p50/p95, maks sejak start),
+        counter (total dan laju per detik sejak ringkasan sebelumnya), gauge (nilai sekarang).
+        """
+        self._collect()
+        now = time.monotonic()
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            if isinstance(metric, Histogram):
+                for key, (bucket_counts, count, total, max_value) in sorted(metric.snapshot().items()):
+                    if not count:
+                        continue
+                    lines.append(
+                        f"{metric.name}{_format_labels(metric.labelnames, key)}: count={count}, avg={total / count:.4f}, "
+                        f"p50<={_format_value(metric.quantile(bucket_counts, count, 0.5))}, "
+                        f"p95<={_format_value(metric.quantile(bucket_counts, count, 0.95))}, max={max_value:.4f}"
+                    )
+            elif isinstance(metric, Counter):
+                for key, value in sorted(metric.values().items()):
+                    previous = self._last_summary.get((metric.name, key))
+                    rate = ""
+                    if previous is not None and now > previous[1]:
+                        rate = f", rate={(value - previous[0]) / (now - previous[1]):.2f}/s"
+                    self._last_summary[(metric.name, key)] = (value, now)
+                    lines.append(f"{metric.name}{_format_labels(metric.labelnames, key)}: total={value:.0f}{rate}")
+            elif metric.name.endswith("_timestamp_seconds"):
+                for key, value in sorted(metric.values().items()):
+                    lines.append(f"{metric.name}{_format_labels(metric.labelnames, key)}: age={time.time() - value:.1f}s")
+            else:
+                for key, value in sorted(metric.values().items()):
+                    lines.append(f"{metric.name}{_format_labels(metric.labelnames, key)}: {value:g}")
+        return lines
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    return _registry
+
+
+def counter(name, help_text, labelnames=()) -> Counter:
+    return _registry.counter(name, help_text, labelnames)
+
+
+def gauge(name, help_text, labelnames=()) -> Gauge:
+    return _registry.gauge(name, help_text, labelnames)
+
+
+def histogram(name, help_text, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+    return _registry.histogram(name, help_text, labelnames, buckets=buckets)
+
+
+def render_prometheus() -> str:
+    return _registry.render_prometheus()
+
+
+def log_summary():
+    """Menulis ringkasan semua metrik ke log (satu baris per metrik dan label)."""
+    for line in _registry.summary_lines():
+        logger.info(f"[Metrics] {line}")
+
+
+LOCK_WAIT_SECONDS = histogram("iot_lock_wait_seconds", "Time spent waiting to acquire a shared lock.", ("lock",))
+LOCK_HOLD_SECONDS = histogram("iot_lock_hold_seconds", "Time a shared lock was held.", ("lock",))
+THREAD_HEARTBEAT = gauge("iot_thread_heartbeat_timestamp_seconds", "Unix time of the last completed loop of a worker thread.", ("thread",))
+
+
+@contextlib.contextmanager
+def timed_lock(lock, lock_name: str):
+    """Seperti 'with lock:', sekaligus mencatat waktu tunggu dan lama lock dipegang."""
+    wait_start = time.perf_counter()
+    with lock:
+        acquired_at = time.perf_counter()
+        LOCK_WAIT_SECONDS.observe(acquired_at - wait_start, lock=lock_name)
+        try:
+            yield
+        finally:
+            LOCK_HOLD_SECONDS.observe(time.perf_counter() - acquired_at, lock=lock_name)
+
+
+def heartbeat(thread_name: str):
+    """Menandai satu putaran thread selesai; thread yang tertinggal terlihat dari heartbeat yang basi."""
+    THREAD_HEARTBEAT.set(time.time(), thread=thread_name)
@@ -0,0 +1,379 @@
+# app_core/opcua_simulator.py
+"""
+Simulator server OPC UA lokal untuk menjalankan dan menguji beban main_app tanpa gateway asli.
+
+Membaca machines_config.json dan melayani semua NodeId yang dikonfigurasi. Setiap mesin punya state machine
+sesuai keluarga kontrolernya (Makino Moden/Motion, Heidenhain, Fanuc/Yasda, Mitsubishi Wele/Quaser), dengan
+nilai yang sama seperti yang didekode data_processor: status, spindle/feed saat Running, nama program yang
+berganti antar siklus. --scale menggandakan armada menjadi mesin sintetis dengan NodeId baru, dan
+--write-config menulis machines_config untuk armada tersebut.
+
+Contoh:
+    python -m app_core.opcua_simulator --scale 10 --speed 60 --write-config sim_machines_config.json
+    IOT_MACHINES_CONFIG=sim_machines_config.json OPC_UA_USER=sim OPC_UA_PASSWORD=sim python main_app.py
+
+Gangguan yang bisa disuntikkan:
+    --fault-rate   peluang per mesin per menit (waktu simulasi) masuk ke state gangguan (alarm/terputus)
+    --bad-read-rate  peluang setiap update sebuah variabel dilayani dengan status Bad (pembacaan klien gagal)
+    --stall-rate   peluang per mesin per menit nilainya membeku (tidak berubah) selama satu dwell
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import signal
+import sys
+import threading
+import time
+
+from opcua import Server, ua
+
+from app_core.config import MACHINES_CONFIG_FILE
+
+logger = logging.getLogger(__name__)
+
+FAMILY_MAKINO = "makino"
+FAMILY_HEIDENHAIN = "heidenhain"
+FAMILY_FANUC_YASDA = "fanuc_yasda"
+FAMILY_MITSUBISHI_WELE = "mitsubishi_wele"
+FAMILY_MITSUBISHI_QUASER = "mitsubishi_quaser"
+FAMILY_GENERIC = "generic"
+
+# State generik: (durasi rata-rata dalam detik, transisi {state_berikut: bobot})
+STATE_PROFILE = {
+    "running": (900, {"ready": 6, "waiting": 2, "interrupted": 1}),
+    "ready": (180, {"running": 6, "manual": 2, "waiting": 1}),
+    "waiting": (120, {"running": 3, "ready": 2}),
+    "manual": (300, {"ready": 3, "running": 1}),
+    "interrupted": (240, {"ready": 2, "manual": 1}),
+    # Hanya dimasuki lewat injeksi gangguan
+    "fault": (240, {"ready": 3, "manual": 1}),
+    "offline": (600, {"ready": 1}),
+}
+
+# Nilai variabel status per keluarga untuk setiap state generik (sesuai peta status di data_processor)
+FAMILY_STATUS_VALUES = {
+    FAMILY_MAKINO: {  # (Moden, Motion)
+        "running": (10, 1), "ready": (10, 0), "waiting": (10, 0), "manual": (5, 0),
+        "interrupted": (4, 0), "fault": (0, 0), "offline": (None, None),
+    },
+    FAMILY_HEIDENHAIN: {"running": 2, "ready": 1, "waiting": 5, "manual": 3, "interrupted": 4, "fault": 4, "offline": 0},
+    FAMILY_FANUC_YASDA: {"running": 2, "ready": 1, "waiting": 5, "manual": 3, "interrupted": 4, "fault": 4, "offline": 0},
+    FAMILY_MITSUBISHI_WELE: {"running": 2, "ready": 1, "waiting": 5, "manual": 3, "interrupted": 4, "fault": 4, "offline": 0},
+    FAMILY_MITSUBISHI_QUASER: {"running": 3, "ready": 2, "waiting": 5, "manual": 6, "interrupted": 7, "fault": 1, "offline": 0},
+    FAMILY_GENERIC: {"running": 2, "ready": 1, "waiting": 5, "manual": 3, "interrupted": 4, "fault": 5, "offline": 0},
+}
+
+# Variabel yang dilayani sebagai string; sisanya numerik
+STRING_VARIABLES = {"Program", "Current_Program", "ProgramName", "PathProgramName", "ActiveProgramName", "PROGN"}
+INTEGER_VARIABLES = {"Status", "State_Number", "Moden", "Motion", "Program_num", "Setting_num", "Sub_process_num", "Program_id"}
+# Nama program string mengikuti standar N<induk>-OP<sub>: beberapa sub-program berurutan berbagi satu program
+# induk (sesi Program Induk), dan sesekali program non-standar (O...) seperti program manual/uji di mesin
+SUB_PROGRAMS_PER_MAIN = 3
+NON_STANDARD_PROGRAM_EVERY = 8
+
+
+def detect_family(machine_name: str) -> str:
+    """Keluarga kontroler dengan aturan nama yang sama seperti data_processor.process_opcua_data."""
+    name = machine_name.lower()
+    if "makino" in name:
+        return FAMILY_MAKINO
+    if "yasda" in name:
+        return FAMILY_FANUC_YASDA
+    if "wele" in name:
+        return FAMILY_MITSUBISHI_WELE
+    if "quaser" in name:
+        return FAMILY_MITSUBISHI_QUASER
+    if "hpm" in name or "hsm" in name or "p500" in name:
+        return FAMILY_HEIDENHAIN
+    return FAMILY_GENERIC
+
+
+class SimulatedMachine:
+    """
+    State machine satu mesin. tick(now) memajukan state bila dwell habis dan mengembalikan nilai
+    variabel yang berubah ({nama_variabel: nilai}). Tidak bergantung pada server OPC UA.
+
+    Args:
+        name (str): Nama mesin (menentukan keluarga kontroler).
+        variables (dict): {nama_variabel: NodeId} dari machines_config.
+        rng (random.Random): Sumber acak (dengan seed agar bisa diulang).
+        speed (float): Percepatan waktu; 60 berarti satu menit simulasi per detik.
+        fault_rate (float): Peluang gangguan per menit waktu simulasi.
+        stall_rate (float): Peluang nilai membeku per menit waktu simulasi.
+    """
+
+    def __init__(self, name, variables, rng, speed=1.0, fault_rate=0.0, stall_rate=0.0):
+        self.name = name
+        self.variables = dict(variables)
+        self.family = detect_family(name)
+        self.rng = rng
+        self.speed = max(speed, 1e-6)
+        self.fault_rate = fault_rate
+        self.stall_rate = stall_rate
+        self.state = "ready"
+        self.state_until = 0.0
+        self.stalled_until = 0.0
+        self.program_counter = rng.randint(100, 900)
+        self.cut_spindle = 0.0
+        self.cut_feed = 0.0
+        self.values = {}
+        self._last_tick = None
+        self._enter_state(rng.choice(["running", "ready", "waiting"]), time.monotonic())
+
+    def _dwell(self, state) -> float:
+        mean_seconds = STATE_PROFILE[state][0]
+        return self.rng.expovariate(1.0 / mean_seconds) / self.speed
+
+    def _enter_state(self, state, now):
+        if state == "running" and self.state != "running":
+            # Siklus baru: kadang program berikutnya, kadang mengulang program yang sama
+            if self.rng.random() < 0.6:
+                self.program_counter += 1
+            self.cut_spindle = self.rng.choice([6000, 8000, 12000, 18000, 24000])
+            self.cut_feed = self.rng.choice([800, 1200, 2000, 3500])
+        self.state = state
+        self.state_until = now + self._dwell(state)
+
+    def _next_state(self) -> str:
+        transitions = STATE_PROFILE[self.state][1]
+        states = list(transitions)
+        return self.rng.choices(states, weights=[transitions[state] for state in states])[0]
+
+    def _program_values(self) -> dict:
+        values = {}
+        if "Program_num" in self.variables:
+            # Makino V77/V33: N<program>-<setting><sub-process huruf><id>
+            values["Program_num"] = self.program_counter
+            values["Setting_num"] = self.program_counter % 7 + 1
+            values["Sub_process_num"] = self.program_counter % 4 + 1
+            values["Program_id"] = self.program_counter % 50 + 1
+        for variable in self.variables:
+            if variable in STRING_VARIABLES:
+                values[variable] = self._program_name()
+        return values
+
+    def _program_name(self) -> str:
+        if self.program_counter % NON_STANDARD_PROGRAM_EVERY == 0:
+            return f"O{self.program_counter:04d}.NC"
+        main_number, sub_number = divmod(self.program_counter, SUB_PROGRAMS_PER_MAIN)
+        return f"N{main_number:04d}-OP{sub_number + 1}.NC"
+
+    def _state_values(self) -> dict:
+        status_value = FAMILY_STATUS_VALUES[self.family][self.state]
+        values = {}
+        if self.family == FAMILY_MAKINO:
+            values["Moden"], values["Motion"] = status_value
+        if "Status" in self.variables and self.family != FAMILY_MAKINO:
+            values["Status"] = status_value
+        if "State_Number" in self.variables:
+            values["State_Number"] = status_value
+        elif self.family == FAMILY_MAKINO and "Status" in self.variables:
+            values["Status"] = 2 if self.state == "running" else 1
+
+        running = self.state == "running"
+        if running:
+            # Variasi kecil di sekitar parameter potong siklus ini
+            values["Spindle"] = float(round(self.cut_spindle * self.rng.uniform(0.97, 1.03)))
+            values["FeedRate"] = float(round(self.cut_feed * self.rng.uniform(0.9, 1.1)))
+        else:
+            values["Spindle"] = 0.0
+            values["FeedRate"] = 0.0
+        if "OvrSpindle" in self.variables:
+            values["OvrSpindle"] = 100.0 if running else 0.0
+        if "OvrFeed" in self.variables:
+            values["OvrFeed"] = float(self.rng.choice([80, 100, 100, 120])) if running else 0.0
+        values.update(self._program_values())
+        return {variable: value for variable, value in values.items() if variable in self.variables}
+
+    def tick(self, now: float) -> dict:
+        elapsed_minutes = 0.0 if self._last_tick is None else (now - self._last_tick) * self.speed / 60.0
+        self._last_tick = now
+        if now < self.stalled_until:
+            return {}
+
+        if self.state not in ("fault", "offline") and self.fault_rate and self.rng.random() < self.fault_rate * elapsed_minutes:
+            self._enter_state(self.rng.choice(["fault", "fault", "offline"]), now)
+            logger.info(f"[{self.name}] Injected fault: {self.state}.")
+        elif now >= self.state_until:
+            self._enter_state(self._next_state(), now)
+
+        if self.stall_rate and self.rng.random() < self.stall_rate * elapsed_minutes:
+            self.stalled_until = now + self._dwell("waiting")
+            logger.info(f"[{self.name}] Injected stall for {self.stalled_until - now:.1f}s.")
+
+        new_values = self._state_values()
+        changed = {variable: value for variable, value in new_values.items() if self.values.get(variable) != value}
+        self.values.update(changed)
+        return changed
+
+
+def expand_fleet(machine_configs: list, scale: int) -> list:
+    """
+    Menggandakan armada: salinan ke-k (k >= 2) dari setiap mesin mendapat nama '<nama> #k'
+    dan NodeId '/<kode>_k/...' sehingga tidak bentrok dengan mesin asli.
+    """
+    fleet = [dict(machine, variables=dict(machine["variables"])) for machine in machine_configs]
+    for copy_index in range(2, scale + 1):
+        for machine in machine_configs:
+            fleet.append({
+                **machine,
+                "name": f"{machine['name']} #{copy_index}",
+                "variables": {
+                    variable: re.sub(r"s=/([^/]+)/", lambda match: f"s=/{match.group(1)}_{copy_index}/", node_id)
+                    for variable, node_id in machine["variables"].items()
+                },
+            })
+    return fleet
+
+
+def _variant_type(variable: str):
+    if variable in STRING_VARIABLES:
+        return ua.VariantType.String
+    if variable in INTEGER_VARIABLES:
+        return ua.VariantType.Int32
+    return ua.VariantType.Double
+
+
+def _initial_value(variable: str):
+    if variable in STRING_VARIABLES:
+        return ""
+    return 0 if variable in INTEGER_VARIABLES else 0.0
+
+
+class MachineSimulatorServer:
+    """
+    Server OPC UA yang melayani NodeId semua mesin dan memperbaruinya dari SimulatedMachine.
+
+    Args:
+        endpoint (str): URL endpoint, misal "opc.tcp://0.0.0.0:4840/".
+        fleet (list): Konfigurasi mesin (format machines_config 'machines').
+        update_interval (float): Jeda antar update (detik waktu nyata).
+        bad_read_rate (float): Peluang setiap nilai yang diperbarui ditandai Bad.
+    """
+
+    def __init__(self, endpoint, fleet, update_interval=1.0, speed=1.0, fault_rate=0.0, stall_rate=0.0, bad_read_rate=0.0, seed=None):
+        self.endpoint = endpoint
+        self.update_interval = update_interval
+        self.bad_read_rate = bad_read_rate
+        self.rng = random.Random(seed)
+        self.machines = [
+            SimulatedMachine(machine["name"], machine["variables"], random.Random(self.rng.random()), speed, fault_rate, stall_rate)
+            for machine in fleet
+        ]
+        self.server = Server()
+        self.server.set_endpoint(endpoint)
+        self.server.set_server_name("IoT Machine Simulator")
+        self.server.set_security_policy([ua.SecurityPolicyType.NoSecurity])
+        self.server.set_security_IDs(["Anonymous", "Username"])
+        # Simulator menerima kredensial apa pun (main_app tetap mewajibkan OPC_UA_USER/OPC_UA_PASSWORD)
+        self.server.user_manager.set_user_manager(lambda isession, username, password: True)
+        self.nodes = {}
+        self.stats = {"updates": 0, "bad_values": 0}
+        self._build_address_space()
+
+    def _build_address_space(self):
+        objects = self.server.get_objects_node()
+        for machine in self.machines:
+            machine_object = objects.add_object(f"ns=1;s=sim/{machine.name}", f"1:{machine.name}")
+            for variable, node_id in machine.variables.items():
+                node = machine_object.add_variable(node_id, f"1:{variable}", ua.Variant(_initial_value(variable), _variant_type(variable)))
+                self.nodes[(machine.name, variable)] = node
+
+    def update_once(self):
+        now = time.monotonic()
+        for machine in self.machines:
+            for variable, value in machine.tick(now).items():
+                variant_type = _variant_type(variable)
+                # None = mesin offline: dilayani dengan status Bad, seperti gateway untuk mesin yang tidak terhubung
+                offline = value is None
+                if offline:
+                    value = _initial_value(variable)
+                elif variant_type == ua.VariantType.Int32:
+                    value = int(value)
+                variant = ua.Variant(value, variant_type)
+                if offline or (self.bad_read_rate and self.rng.random() < self.bad_read_rate):
+                    data_value = ua.DataValue(variant)
+                    data_value.StatusCode = ua.StatusCode(ua.StatusCodes.BadCommunicationError)
+                    self.nodes[(machine.name, variable)].set_value(data_value)
+                    self.stats["bad_values"] += 1
+                else:
+                    self.nodes[(machine.name, variable)].set_value(variant)
+                self.stats["updates"] += 1
+
+    def run(self, stop_event, duration=None):
+        self.server.start()
+        logger.info(f"OPC UA simulator serving {len(self.machines)} machines ({len(self.nodes)} nodes) at {self.endpoint}")
+        started = time.monotonic()
+        last_report = started
+        try:
+            while not stop_event.is_set():
+                tick_started = time.monotonic()
+                self.update_once()
+                if tick_started - last_report >= 60:
+                    last_report = tick_started
+                    states = {}
+                    for machine in self.machines:
+                        states[machine.state] = states.get(machine.state, 0) + 1
+                    logger.info(f"Simulator: {self.stats['updates']} value updates, {self.stats['bad_values']} bad values, states {states}.")
+                if duration and tick_started - started >= duration:
+                    break
+                stop_event.wait(max(0.0, self.update_interval - (time.monotonic() - tick_started)))
+        finally:
+            self.server.stop()
+            logger.info("OPC UA simulator stopped.")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Local OPC UA simulator for the machines in machines_config.json.")
+    parser.add_argument("--config", default=MACHINES_CONFIG_FILE, help="machines_config.json to read the fleet and NodeIds from.")
+    parser.add_argument("--endpoint", default="opc.tcp://127.0.0.1:4840/", help="Endpoint to serve.")
+    parser.add_argument("--scale", type=int, default=1, help="Multiply the fleet: each configured machine is simulated this many times.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time compression for state changes (60 = one simulated minute per second).")
+    parser.add_argument("--update-interval", type=float, default=1.0, help="Seconds between value updates.")
+    parser.add_argument("--fault-rate", type=float, default=0.0, help="Fault injections per machine per simulated minute.")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Frozen-value stalls per machine per simulated minute.")
+    parser.add_argument("--bad-read-rate", type=float, default=0.0, help="Probability that an updated value is served with Bad status.")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds.")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible runs.")
+    parser.add_argument("--write-config", help="Write a machines_config.json for the simulated fleet pointing at --endpoint, then serve.")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    try:
+        with open(args.config, "r") as f:
+            machine_configs = json.load(f).get("machines", [])
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Could not load machine configuration from '{args.config}': {e}")
+        return 1
+    if not machine_configs:
+        logger.error(f"No machines found in '{args.config}'.")
+        return 1
+
+    fleet = expand_fleet(machine_configs, max(1, args.scale))
+    if args.write_config:
+        with open(args.write_config, "w") as f:
+            json.dump({"url": args.endpoint, "machines": fleet}, f, indent=4)
+        logger.info(f"Wrote configuration for {len(fleet)} simulated machines to '{args.write_config}' (use IOT_MACHINES_CONFIG={args.write_config}).")
+
+    simulator = MachineSimulatorServer(
+        args.endpoint, fleet,
+        update_interval=args.update_interval,
+        speed=args.speed,
+        fault_rate=args.fault_rate,
+        stall_rate=args.stall_rate,
+        bad_read_rate=args.bad_read_rate,
+        seed=args.seed,
+    )
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    simulator.run(stop_event, duration=args.duration)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
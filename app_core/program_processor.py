@@ -37,7 +37,7 @@ def process_program_cycles_from_logs(machine_name: str, logs: list):
     df_log = pd.DataFrame(logs)
     df_log['datetime'] = pd.to_datetime(df_log['timestamp'], unit='s', utc=True)
     df_log = df_log.sort_values(by='datetime').reset_index(drop=True)
-    logger.debug(f"[{machine_name}] df_log head after initial processing:\n{df_log.head()}")
+    logger.debug("[%s] df_log head after initial processing:\n%s", machine_name, df_log.head())
     
     # Variabel untuk melacak siklus 'Running' yang sedang aktif
     is_running_cycle_active = False
@@ -65,7 +65,7 @@ def process_program_cycles_from_logs(machine_name: str, logs: list):
                 current_cycle_start_time = log_time
                 program_name_at_cycle_start = log_program # Ambil nama program saat running dimulai
                 is_running_cycle_active = True
-                logger.debug(f"[{machine_name}] Starting new running cycle at {current_cycle_start_time} with program '{program_name_at_cycle_start}'.")
+                logger.debug("[%s] Starting new running cycle at %s with program '%s'.", machine_name, current_cycle_start_time, program_name_at_cycle_start)
             # else: already running, just continue the current cycle
         else: # log_status is not a RUNNING_STATUS
             if is_running_cycle_active:
@@ -79,22 +79,17 @@ def process_program_cycles_from_logs(machine_name: str, logs: list):
                 duration_milliseconds = int(duration_seconds * 1000)
 
                 logger.debug(
-                    f"[{machine_name}] ENDING running cycle: "
-                    f"Program='{program_name_at_cycle_start}', "
-                    f"Start={current_cycle_start_time}, "
-                    f"End={cycle_end_time}, "
-                    f"Duration={duration_seconds:.3f} seconds. "
-                    f"Condition duration_milliseconds > 1: {duration_milliseconds > 1}"
+                    "[%s] ENDING running cycle: Program='%s', Start=%s, End=%s, Duration=%.3f seconds. "
+                    "Condition duration_milliseconds > 1: %s",
+                    machine_name, program_name_at_cycle_start, current_cycle_start_time, cycle_end_time,
+                    duration_seconds, duration_milliseconds > 1,
                 )
 
                 if duration_milliseconds > 1: # Removed program name filter
                     # --- LOG DEBUG KETIKA SIKLUS BENAR-BENAR TERDETEKSI & DISIMPAN ---
                     logger.debug(
-                        f"[{machine_name}] FINISHED cycle: "
-                        f"Program='{program_name_at_cycle_start}', "
-                        f"Start={current_cycle_start_time}, "
-                        f"End={cycle_end_time}, "
-                        f"Duration={duration_seconds:.2f} seconds. Adding to raw list."
+                        "[%s] FINISHED cycle: Program='%s', Start=%s, End=%s, Duration=%.2f seconds. Adding to raw list.",
+                        machine_name, program_name_at_cycle_start, current_cycle_start_time, cycle_end_time, duration_seconds,
                     )
                     program_cycles_raw.append({
                     "machine_name": machine_name,
@@ -106,11 +101,10 @@ def process_program_cycles_from_logs(machine_name: str, logs: list):
                 else:
                     # Log jika siklus berakhir tetapi tidak memenuhi syarat untuk disimpan
                     logger.debug(
-                        f"[{machine_name}] Running cycle ended but not saved: "
-                        f"Program='{program_name_at_cycle_start}', "
-                        f"Start={current_cycle_start_time}, "
-                        f"End={cycle_end_time}, "
-                        f"Duration={duration_seconds:.2f} seconds. (Duration <= 0.001 - Milliseconds: {duration_milliseconds})" # Updated log message
+                        "[%s] Running cycle ended but not saved: Program='%s', Start=%s, End=%s, "
+                        "Duration=%.2f seconds. (Duration <= 0.001 - Milliseconds: %s)",
+                        machine_name, program_name_at_cycle_start, current_cycle_start_time, cycle_end_time,
+                        duration_seconds, duration_milliseconds,
                     )
                 
                 # Reset state for next cycle, regardless if saved or not
@@ -129,23 +123,18 @@ def process_program_cycles_from_logs(machine_name: str, logs: list):
 
         # NEW DEBUG LOG: Print exact duration for final ongoing cycle
         logger.debug(
-            f"[{machine_name}] FINAL (ongoing) cycle check: "
-            f"Program='{program_name_at_cycle_start}', "
-            f"Start={current_cycle_start_time}, "
-            f"End={cycle_end_time}, "
-            f"Duration={duration_seconds:.3f} seconds. "
-            f"Condition duration_milliseconds > 1: {duration_milliseconds > 1}"
+            "[%s] FINAL (ongoing) cycle check: Program='%s', Start=%s, End=%s, Duration=%.3f seconds. "
+            "Condition duration_milliseconds > 1: %s",
+            machine_name, program_name_at_cycle_start, current_cycle_start_time, cycle_end_time,
+            duration_seconds, duration_milliseconds > 1,
         )
 
         # MODIFIED CONDITION: Only check for duration > 1 millisecond
         if duration_milliseconds > 1: # Removed program name filter
             # --- LOG DEBUG KETIKA SIKLUS TERAKHIR (SEDANG BERJALAN) DISIMPAN ---
             logger.debug(
-                f"[{machine_name}] FINAL (ongoing) cycle: "
-                f"Program='{program_name_at_cycle_start}', "
-                f"Start={current_cycle_start_time}, "
-                f"End={cycle_end_time}, "
-                f"Duration={duration_seconds:.2f} seconds. Adding to raw list."
+                "[%s] FINAL (ongoing) cycle: Program='%s', Start=%s, End=%s, Duration=%.2f seconds. Adding to raw list.",
+                machine_name, program_name_at_cycle_start, current_cycle_start_time, cycle_end_time, duration_seconds,
             )
             program_cycles_raw.append({
                 "machine_name": machine_name,
@@ -157,11 +146,10 @@ def process_program_cycles_from_logs(machine_name: str, logs: list):
         else:
             # Log jika siklus terakhir berakhir tetapi tidak memenuhi syarat untuk disimpan
             logger.debug(
-                f"[{machine_name}] Final (ongoing) running cycle NOT SAVED (too short): "
-                f"Program='{program_name_at_cycle_start}', "
-                f"Start={current_cycle_start_time}, "
-                f"End={cycle_end_time}, "
-                f"Duration={duration_seconds:.2f} seconds. (Duration <= 0.001 - Milliseconds: {duration_milliseconds})"
+                "[%s] Final (ongoing) running cycle NOT SAVED (too short): Program='%s', Start=%s, End=%s, "
+                "Duration=%.2f seconds. (Duration <= 0.001 - Milliseconds: %s)",
+                machine_name, program_name_at_cycle_start, current_cycle_start_time, cycle_end_time,
+                duration_seconds, duration_milliseconds,
             )
 
     # Log jumlah total siklus yang valid sebelum dikembalikan
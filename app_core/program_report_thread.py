@@ -15,10 +15,6 @@ from app_core.program_processor import process_program_cycles_from_logs
 
 logger = logging.getLogger(__name__)
 
-# Cache untuk tabel yang sudah dipastikan ada
-_verified_program_report_tables = set()
-_table_verification_lock = threading.Lock() # Lock baru untuk melindungi set ini
-
 def program_report_thread_target(
         interval: int, 
         stop_event: threading.Event, 
@@ -50,16 +46,11 @@ def program_report_thread_target(
             month_of_report = report_start_dt_utc.strftime('%Y_%m')
             table_name_for_report = get_program_report_table_name(report_start_dt_utc)
 
-            with _table_verification_lock:
-                if table_name_for_report not in _verified_program_report_tables:
-                    logger.debug(f"[Program-Report-Thread] Verifying/creating table '{table_name_for_report}' for program reports.")
-                    if create_program_report_table_monthly(table_name_for_report):
-                        _verified_program_report_tables.add(table_name_for_report)
-                        logger.debug(f"[Program-Report-Thread] Table '{table_name_for_report}' verified/created successfully by this thread.")
-                    else:
-                        logger.error(f"[Program-Report-Thread] Failed to create or verify program report table '{table_name_for_report}'. Skipping report generation for this cycle.")
-                        stop_event.wait(interval)
-                        continue
+            # create_program_report_table_monthly memakai registry skema di db_manager, jadi DDL hanya sekali per tabel
+            if not create_program_report_table_monthly(table_name_for_report):
+                logger.error(f"[Program-Report-Thread] Failed to create or verify program report table '{table_name_for_report}'. Skipping report generation for this cycle.")
+                stop_event.wait(interval)
+                continue
                     
             machines_to_process = []
             try:
@@ -0,0 +1,198 @@
+# app_core/program_sessions.py
+"""
+Segmentasi sesi Program Induk dari log status (dipakai halaman Program Analysis).
+
+Log dipecah menjadi segmen (log -> log berikutnya). Sesi Program Induk dimulai saat program induk itu
+Running dengan program standar (diawali 'N'), dan berakhir saat jeda lebih panjang dari ambang batas
+atau saat program standar lain mulai Running. Loss sesi = durasi sesi - waktu running di dalamnya.
+"""
+
+import logging
+
+import pandas as pd
+
+from app_core.config import IDLE_STATUSES, OTHER_STATUSES, PROGRAM_SESSION_GAP_SECONDS
+from app_core.db_manager import format_seconds_to_hhmmss
+from app_core.shift_calendar import get_local_tz
+
+logger = logging.getLogger(__name__)
+
+
+def get_status_category_for_loss(status):
+    if status in IDLE_STATUSES: return 'IDLE'
+    if status in OTHER_STATUSES: return 'OTHER'
+    return 'RUNNING_OR_OTHER_KNOWN'
+
+
+def is_standard_program(program_name):
+    if program_name and isinstance(program_name, str) and program_name.strip().upper().startswith('N'):
+        return True
+    return False
+
+
+def build_program_segments(logs: list, overall_end_time) -> pd.DataFrame:
+    """
+    Mengubah log status (dict dengan 'timestamp', 'status_text', 'current_program', ...) menjadi segmen
+    berdurasi. Log terakhir diperpanjang hingga overall_end_time lewat baris sintetis.
+    Mengembalikan DataFrame kosong jika tidak ada log.
+    """
+    if not logs:
+        return pd.DataFrame()
+
+    logs_in_overall_window = pd.DataFrame(logs)
+    logs_in_overall_window['timestamp_log'] = pd.to_datetime(logs_in_overall_window['timestamp'], utc=True)
+    logs_in_overall_window['program_main_name_from_log'] = logs_in_overall_window['current_program'].apply(
+        lambda x: str(x).split('-')[0].strip() if x and '-' in str(x) else None
+    )
+    logs_in_overall_window['status_category'] = logs_in_overall_window['status_text'].apply(get_status_category_for_loss)
+    logs_in_overall_window = logs_in_overall_window.sort_values(by='timestamp_log').copy()
+
+    cols_to_carry = [col for col in logs_in_overall_window.columns if col != 'timestamp_log']
+    synthetic_end_row_data = {col: logs_in_overall_window[col].iloc[-1] for col in cols_to_carry}
+    synthetic_end_row_data['timestamp_log'] = overall_end_time
+    synthetic_end_row = pd.DataFrame([synthetic_end_row_data])
+    synthetic_end_row['timestamp_log'] = pd.to_datetime(synthetic_end_row['timestamp_log'], utc=True)
+
+    segments = pd.concat([logs_in_overall_window, synthetic_end_row])
+    segments = segments.sort_values('timestamp_log').drop_duplicates(subset=['timestamp_log'], keep='first').copy()
+
+    segments['timestamp_log'] = pd.to_datetime(segments['timestamp_log'], utc=True)
+    segments['next_timestamp_log'] = segments['timestamp_log'].shift(-1)
+    segments['duration_segment'] = (segments['next_timestamp_log'] - segments['timestamp_log']).dt.total_seconds()
+    return segments.dropna(subset=['next_timestamp_log']).copy()
+
+
+def _session_row(program_main_name, start_time, end_time, process_seconds, loss_seconds, notes) -> dict:
+    return {
+        'program_main_name': program_main_name,
+        'session_start_time': start_time,
+        'session_end_time': end_time,
+        'total_process_time_seconds': process_seconds,
+        'total_loss_time_seconds': loss_seconds,
+        'notes': notes,
+    }
+
+
+def detect_program_sessions(program_main_name: str, segments: pd.DataFrame, overall_start_time, overall_end_time,
+                            local_tz=None, gap_threshold_seconds: float = None) -> list:
+    """
+    Mendeteksi sesi Program Induk dari segmen build_program_segments().
+
+    Args:
+        program_main_name (str): Nama program induk yang dianalisis.
+        segments (pd.DataFrame): Segmen log dalam rentang program induk.
+        overall_start_time, overall_end_time: Rentang keseluruhan program induk (UTC aware).
+        local_tz: Zona waktu untuk waktu di kolom notes; default get_local_tz().
+        gap_threshold_seconds (float): Jeda yang lebih pendek dari ini tetap bagian dari sesi yang sama.
+    Returns:
+        list: Dict per sesi. Jika tidak ada sesi Running sama sekali, satu sesi loss penuh untuk seluruh rentang.
+    """
+    local_tz = local_tz or get_local_tz()
+    if gap_threshold_seconds is None:
+        gap_threshold_seconds = PROGRAM_SESSION_GAP_SECONDS
+
+    current_session_start_time = None
+    current_session_actual_running_time = 0.0
+    current_session_notes = []
+    is_main_program_active_in_this_session = False
+    last_running_timestamp = None
+    last_log_timestamp = None
+
+    detected_sessions = []
+
+    for _, segment_row in segments.iterrows():
+        segment_start_time = segment_row['timestamp_log']
+        segment_end_time = segment_row['next_timestamp_log']
+        segment_duration = segment_row['duration_segment']
+        segment_status_category = segment_row['status_category']
+        segment_program_main_name_from_log = segment_row['program_main_name_from_log']
+        segment_current_program_value = str(segment_row['current_program']).strip() if segment_row['current_program'] is not None else ""
+
+        is_current_segment_this_main_program_running = \
+            (program_main_name == segment_program_main_name_from_log) and \
+            (segment_status_category == 'RUNNING_OR_OTHER_KNOWN') and \
+            is_standard_program(segment_current_program_value)
+
+        is_current_segment_other_standard_program_running = \
+            (program_main_name != segment_program_main_name_from_log) and \
+            (segment_status_category == 'RUNNING_OR_OTHER_KNOWN') and \
+            is_standard_program(segment_current_program_value)
+
+        last_log_timestamp = segment_end_time
+
+        # --- Skenario 1: Program Induk Aktif Terdeteksi ---
+        if is_current_segment_this_main_program_running:
+            if not is_main_program_active_in_this_session: # Program Induk baru saja dimulai/dilanjutkan
+                current_session_start_time = segment_start_time
+                current_session_actual_running_time = 0.0
+                current_session_notes = []
+
+                if len(detected_sessions) > 0:
+                    current_session_notes.append(f"Lanjutan (Waktu: {current_session_start_time.tz_convert(local_tz).strftime('%Y-%m-%d %H:%M:%S')})")
+                else:
+                    current_session_notes.append(f"Mulai Sesi (Waktu: {current_session_start_time.tz_convert(local_tz).strftime('%Y-%m-%d %H:%M:%S')})")
+
+                is_main_program_active_in_this_session = True
+
+            current_session_actual_running_time += segment_duration
+            last_running_timestamp = segment_end_time
+
+        # --- Skenario 2: Jeda panjang, sesi berakhir ---
+        elif segment_duration > gap_threshold_seconds and is_main_program_active_in_this_session:
+            current_session_end_time = last_running_timestamp
+            if current_session_end_time is None:
+                continue # Lewati jika tidak ada running time sebelumnya
+
+            total_session_duration = (current_session_end_time - current_session_start_time).total_seconds()
+            loss_time = total_session_duration - current_session_actual_running_time
+            detected_sessions.append(_session_row(
+                program_main_name, current_session_start_time, current_session_end_time, total_session_duration, loss_time,
+                "; ".join(current_session_notes) + f"; Jeda Panjang Terdeteksi (Durasi: {format_seconds_to_hhmmss(segment_duration)})"
+            ))
+            is_main_program_active_in_this_session = False
+            current_session_start_time = None
+            current_session_actual_running_time = 0.0
+            current_session_notes = []
+            last_running_timestamp = None
+
+        # --- Skenario 3: Interupsi oleh Program Standar Lain ---
+        elif is_current_segment_other_standard_program_running:
+            if is_main_program_active_in_this_session:
+                current_session_end_time = last_running_timestamp
+                if current_session_end_time is None:
+                    continue
+
+                total_session_duration = (current_session_end_time - current_session_start_time).total_seconds()
+                loss_time = total_session_duration - current_session_actual_running_time
+                detected_sessions.append(_session_row(
+                    program_main_name, current_session_start_time, current_session_end_time, total_session_duration, loss_time,
+                    "; ".join(current_session_notes) + f"; Sesi diakhiri oleh interupsi program lain: '{segment_current_program_value}'"
+                ))
+                is_main_program_active_in_this_session = False
+                current_session_start_time = None
+                current_session_actual_running_time = 0.0
+                current_session_notes = []
+                last_running_timestamp = None
+
+    # Sesi terakhir yang belum ditutup
+    if is_main_program_active_in_this_session and current_session_start_time is not None:
+        current_session_end_time = last_log_timestamp
+        if last_running_timestamp:
+            total_session_duration = (last_running_timestamp - current_session_start_time).total_seconds()
+            loss_time = total_session_duration - current_session_actual_running_time
+            notes = "; ".join(current_session_notes) + f"; Selesai Normal (Waktu: {last_running_timestamp.tz_convert(local_tz).strftime('%Y-%m-%d %H:%M:%S')})"
+        else:
+            total_session_duration = 0.0
+            loss_time = (current_session_end_time - current_session_start_time).total_seconds()
+            notes = "; ".join(current_session_notes) + "; Tidak ada Running Time"
+        detected_sessions.append(_session_row(
+            program_main_name, current_session_start_time, current_session_end_time, total_session_duration, loss_time, notes
+        ))
+
+    # Seluruh rentang hanya idle/other/program non-standar
+    if not detected_sessions and (overall_end_time - overall_start_time).total_seconds() > 0:
+        detected_sessions.append(_session_row(
+            program_main_name, overall_start_time, overall_end_time, 0.0, (overall_end_time - overall_start_time).total_seconds(),
+            "Tidak ada aktivitas Running Program Induk (N-standard) yang terdeteksi, hanya status non-Running atau program non-standar."
+        ))
+    return detected_sessions
@@ -0,0 +1,292 @@
+# app_core/query_cache.py
+
+import copy
+import datetime
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from app_core.config import QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_STALE_SECONDS
+from app_core.db_manager import get_db_role, set_db_role
+
+logger = logging.getLogger(__name__)
+
+
+class _CacheEntry:
+    __slots__ = ("value", "loaded_at", "ttl", "topics", "time_range", "invalid", "stale")
+
+    def __init__(self, value, ttl, topics, time_range):
+        self.value = value
+        self.loaded_at = time.monotonic()
+        self.ttl = ttl
+        self.topics = topics
+        self.time_range = time_range
+        self.invalid = False
+        self.stale = False
+
+
+class _Loading:
+    """Pemuatan yang sedang berjalan untuk satu key; ditandai jika datanya berubah selama query berjalan."""
+    __slots__ = ("event", "topics", "time_range", "invalid", "stale")
+
+    def __init__(self, topics, time_range):
+        self.event = threading.Event()
+        self.topics = topics
+        self.time_range = time_range
+        self.invalid = False
+        self.stale = False
+
+
+def _ranges_overlap(entry_range, changed_range) -> bool:
+    # Rentang None berarti tidak diketahui/tak terbatas: selalu dianggap tumpang tindih
+    if entry_range is None or changed_range is None:
+        return True
+    return entry_range[0] <= changed_range[1] and changed_range[0] <= entry_range[1]
+
+
+class QueryCache:
+    """
+    Cache hasil query yang dipakai bersama oleh semua sesi dashboard di dalam satu proses.
+
+    - LRU dengan jumlah entri terbatas (max_entries).
+    - Setiap entri ditandai topik data (lihat change_notifier) dan, jika diketahui, rentang waktu yang
+      di-query. invalidate_topics() hanya mengenai entri dengan topik tersebut yang rentangnya tumpang tindih
+      dengan rentang yang berubah; query untuk rentang historis yang sudah tertutup tidak ikut dibuang.
+    - Entri yang melewati TTL tetapi masih dalam stale_seconds langsung dikembalikan, sementara satu
+      thread memuat ulang di latar belakang (stale-while-revalidate). Invalidasi dengan stale_ok=True
+      (notifikasi dari proses lain) diperlakukan sama; tanpa stale_ok entri dimuat ulang sebelum dikembalikan.
+    - Hanya satu pemuatan per key yang berjalan bersamaan; sesi lain menunggu hasil yang sama.
+    - stale_served() memberi tahu pemanggil (misal live_fragment) bahwa thread ini mendapat hasil lama.
+    - Nilai dikembalikan sebagai salinan, sehingga satu sesi tidak bisa mengubah data sesi lain.
+
+    Args:
+        max_entries (int): Jumlah entri maksimum sebelum entri yang paling lama tidak dipakai dibuang.
+        stale_seconds (float): Berapa lama setelah TTL habis entri masih boleh dikembalikan sambil dimuat ulang.
+    """
+
+    def __init__(self, max_entries, stale_seconds):
+        self.max_entries = max_entries
+        self.stale_seconds = stale_seconds
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self._thread_state = threading.local()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "background_refreshes": 0, "evictions": 0, "invalidations": 0, "load_errors": 0}
+
+    def get_or_load(self, key, loader, ttl, topics=(), time_range=None):
+        topics = frozenset(topics)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and not entry.invalid:
+                    age = time.monotonic() - entry.loaded_at
+                    if age < entry.ttl + self.stale_seconds:
+                        self._entries.move_to_end(key)
+                        if age < entry.ttl and not entry.stale:
+                            self._stats["hits"] += 1
+                        else:
+                            self._stats["stale_hits"] += 1
+                            self._thread_state.stale_served = True
+                            if key not in self._loading:
+                                self._start_background_refresh(key, loader, ttl, topics, time_range)
+                        value = entry.value
+                        break
+                loading = self._loading.get(key)
+                is_loader = loading is None
+                if is_loader:
+                    self._loading[key] = _Loading(topics, time_range)
+                    self._stats["misses"] += 1
+                else:
+                    event = loading.event
+            if is_loader:
+                value = self._load(key, loader, ttl, topics, time_range)
+                break
+            # Sesi lain sedang memuat key yang sama: tunggu lalu baca hasilnya dari cache
+            event.wait()
+        return copy.deepcopy(value)
+
+    def _load(self, key, loader, ttl, topics, time_range):
+        try:
+            value = loader()
+        except Exception:
+            with self._lock:
+                self._stats["load_errors"] += 1
+                loading = self._loading.pop(key)
+            loading.event.set()
+            raise
+        with self._lock:
+            loading = self._loading.pop(key)
+            entry = _CacheEntry(value, ttl, topics, time_range)
+            # Data berubah selama query berjalan: simpan, tetapi muat ulang pada pembacaan berikutnya
+            entry.invalid = loading.invalid
+            entry.stale = loading.stale
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+        loading.event.set()
+        return value
+
+    def _start_background_refresh(self, key, loader, ttl, topics, time_range):
+        # Dipanggil dengan self._lock dipegang
+        self._loading[key] = _Loading(topics, time_range)
+        self._stats["background_refreshes"] += 1
+        db_role = get_db_role()
+
+        def refresh():
+            set_db_role(db_role)
+            try:
+                self._load(key, loader, ttl, topics, time_range)
+            except Exception as e:
+                logger.warning(f"Background refresh of cached query failed: {e}")
+
+        threading.Thread(target=refresh, name="Query-Cache-Refresh", daemon=True).start()
+
+    def reset_stale_served(self):
+        self._thread_state.stale_served = False
+
+    def stale_served(self) -> bool:
+        """True jika thread ini mendapat hasil lama (sedang dimuat ulang) sejak reset_stale_served() terakhir."""
+        return getattr(self._thread_state, "stale_served", False)
+
+    @staticmethod
+    def _mark(target, stale_ok):
+        if stale_ok:
+            target.stale = True
+        else:
+            target.invalid = True
+
+    def invalidate_topics(self, *topics, time_range=None, stale_ok: bool = False) -> int:
+        """
+        Menandai entri dengan salah satu topik ini (dan rentang waktu yang tumpang tindih dengan time_range,
+        pasangan epoch (awal, akhir); None = semua rentang) untuk dimuat ulang.
+        stale_ok=True: hasil lama masih dikembalikan sementara satu thread memuat ulang.
+        Mengembalikan jumlah entri yang terkena.
+        """
+        topics = set(topics)
+        invalidated = 0
+        with self._lock:
+            for loading in self._loading.values():
+                if loading.topics & topics and _ranges_overlap(loading.time_range, time_range):
+                    self._mark(loading, stale_ok)
+            for entry in self._entries.values():
+                if entry.invalid or (stale_ok and entry.stale):
+                    continue
+                if entry.topics & topics and _ranges_overlap(entry.time_range, time_range):
+                    self._mark(entry, stale_ok)
+                    invalidated += 1
+            self._stats["invalidations"] += invalidated
+        return invalidated
+
+    def invalidate_all(self, stale_ok: bool = False):
+        with self._lock:
+            for loading in self._loading.values():
+                self._mark(loading, stale_ok)
+            for entry in self._entries.values():
+                self._mark(entry, stale_ok)
+            self._stats["invalidations"] += len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), max_entries=self.max_entries)
+
+
+_query_cache = QueryCache(QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_STALE_SECONDS)
+_subscribed_listener = None
+_subscribe_lock = threading.Lock()
+
+
+def _on_data_changed(topic, time_range=None):
+    # Perubahan dari proses lain: hasil lama boleh tampil sementara satu thread memuat ulang
+    if topic is None:
+        # Listener tersambung ulang: notifikasi bisa terlewat, anggap semua data berubah
+        _query_cache.invalidate_all(stale_ok=True)
+    else:
+        _query_cache.invalidate_topics(topic, time_range=time_range, stale_ok=True)
+
+
+def get_query_cache() -> QueryCache:
+    """Cache bersama proses ini, terhubung ke listener notifikasi perubahan dari main_app."""
+    global _subscribed_listener
+    from app_core.change_notifier import get_change_listener
+
+    listener = get_change_listener()
+    if listener is not _subscribed_listener:
+        with _subscribe_lock:
+            if listener is not _subscribed_listener:
+                listener.add_callback(_on_data_changed)
+                _subscribed_listener = listener
+    return _query_cache
+
+
+def _make_key(func, args, kwargs):
+    key = (func.__code__.co_filename, func.__qualname__, args, tuple(sorted(kwargs.items())))
+    try:
+        hash(key)
+    except TypeError:
+        key = (func.__code__.co_filename, func.__qualname__, repr(args), repr(sorted(kwargs.items())))
+    return key
+
+
+def _to_epoch(value, is_end: bool) -> float:
+    if isinstance(value, datetime.datetime):
+        return value.timestamp()
+    if isinstance(value, datetime.date):
+        # Tanggal tanpa zona waktu (lokal atau UTC tergantung halaman): lebarkan satu hari agar tetap aman
+        day = value + datetime.timedelta(days=1) if is_end else value - datetime.timedelta(days=1)
+        return datetime.datetime.combine(day, datetime.time.max if is_end else datetime.time.min).timestamp()
+    return float(value)
+
+
+def _bound_time_range(signature, time_range_params, args, kwargs):
+    """Rentang epoch (awal, akhir) dari argumen pemanggilan, atau None jika tidak bisa ditentukan."""
+    try:
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        start_value, end_value = (bound.arguments[name] for name in time_range_params)
+        if start_value is None or end_value is None:
+            return None
+        return _to_epoch(start_value, is_end=False), _to_epoch(end_value, is_end=True)
+    except (TypeError, KeyError, ValueError, OverflowError):
+        return None
+
+
+def cached_query(ttl: float, topics=(), time_range=None):
+    """
+    Dekorator pengganti st.cache_data untuk fungsi pengambil data dashboard.
+    Hasil dibagi lintas sesi dan dimuat ulang saat main_app melaporkan perubahan pada 'topics'.
+
+    time_range: pasangan nama parameter (awal, akhir) berisi date/datetime yang di-query, misal
+    ("start_date", "end_date"). Notifikasi dengan rentang waktu hanya membuang hasil yang rentangnya
+    tumpang tindih; tanpa time_range setiap perubahan topik membuang hasil.
+    """
+    def decorator(func):
+        signature = inspect.signature(func) if time_range else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            query_range = _bound_time_range(signature, time_range, args, kwargs) if time_range else None
+            return get_query_cache().get_or_load(
+                _make_key(func, args, kwargs), functools.partial(func, *args, **kwargs), ttl, topics, query_range
+            )
+        return wrapper
+    return decorator
+
+
+def invalidate_topics(*topics, notify: bool = True):
+    """
+    Membuang cache untuk topik-topik ini setelah dashboard sendiri menulis ke database.
+    Dengan notify=True, proses dashboard lain juga diberi tahu lewat NOTIFY.
+    """
+    get_query_cache().invalidate_topics(*topics)
+    if notify:
+        from app_core.change_notifier import notify_change
+        notify_change(*topics)
+
+
+def get_query_cache_stats() -> dict:
+    return _query_cache.stats()
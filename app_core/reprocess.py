@@ -0,0 +1,295 @@
+# app_core/reprocess.py
+"""
+Menghitung ulang data turunan (siklus program, metrik shift final) dari log status untuk rentang tanggal apa pun.
+
+Pekerjaan dipecah per (mesin, tanggal) dan dijalankan paralel di process pool. Setiap unit hanya
+mengambil log untuk harinya sendiri (plus sedikit jendela di sekitarnya), jadi memori tetap kecil
+berapa pun panjang rentangnya. Jika hanya metrik shift yang dihitung ulang, unitnya per (mesin, bulan):
+semua shift dalam sebulan dihitung dalam satu pass vektor dari log status ringan. Unit yang selesai dicatat di file checkpoint, sehingga perintah yang
+terputus bisa dijalankan ulang dan melanjutkan dari unit berikutnya. Penulisan bersifat upsert
+(atau hapus-lalu-tulis per unit dengan --replace), jadi menjalankan ulang aman.
+
+Contoh:
+    python -m app_core.reprocess --start 2025-07-01 --end 2025-09-30 --replace
+    python -m app_core.reprocess --start 2025-07-01 --end 2025-07-31 --artifacts shift_metrics --machines "Yasda 1 - 1013"
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timezone
+
+from app_core.config import (
+    MACHINE_CONFIGS_FOR_PROGRAM_REPORT,
+    REPROCESS_MAX_WORKERS,
+    REPROCESS_LOOKAROUND_HOURS,
+    REPROCESS_CHECKPOINT_FILE,
+)
+from app_core.db_manager import (
+    init_db_pool,
+    set_default_db_role,
+    DB_ROLE_ANALYTICS,
+    get_status_logs_for_machine,
+    save_program_cycles_to_db,
+    save_final_shift_metrics_batch,
+    get_status_log_arrays,
+    ensure_monthly_tables,
+    backfill_program_ids,
+    compact_program_aliases,
+)
+from app_core.program_processor import process_program_cycles_from_logs
+from app_core.shift_calculator import build_final_shift_metrics
+from app_core.shift_calendar import get_shift_calendar
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_PROGRAM_CYCLES = "program_cycles"
+ARTIFACT_SHIFT_METRICS = "shift_metrics"
+ARTIFACTS = (ARTIFACT_PROGRAM_CYCLES, ARTIFACT_SHIFT_METRICS)
+
+
+def _unit_key(machine_name: str, day: datetime.date) -> str:
+    return f"{machine_name}|{day.isoformat()}"
+
+
+def _worker_init(log_level, months=()):
+    # Setiap proses worker punya pool koneksinya sendiri (koneksi psycopg2 tidak boleh dibagi antar proses)
+    logging.basicConfig(level=log_level, format="%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s")
+    set_default_db_role(DB_ROLE_ANALYTICS)
+    init_db_pool(DB_ROLE_ANALYTICS)
+    # Registry tabel terverifikasi tidak diwarisi dari proses induk (spawn); isi sekarang, sebelum ada transaksi penulisan
+    for month in months:
+        ensure_monthly_tables(datetime.datetime.combine(month, datetime.time.min, tzinfo=timezone.utc))
+
+
+def reprocess_unit(machine_name: str, first_day: datetime.date, last_day: datetime.date, artifacts, replace: bool = False) -> dict:
+    """
+    Menghitung ulang artefak untuk satu mesin pada tanggal lokal first_day sampai last_day (inklusif).
+    Mengembalikan ringkasan {"program_cycles": n, "shift_metrics": n, "ok": bool}.
+    """
+    shift_calendar = get_shift_calendar()
+    range_start = shift_calendar.day_bounds(first_day)[0]
+    range_end = shift_calendar.day_bounds(last_day)[1]
+    lookaround = datetime.timedelta(hours=REPROCESS_LOOKAROUND_HOURS)
+    now = datetime.datetime.now(timezone.utc)
+    fetch_start, fetch_end = range_start - lookaround, min(range_end + lookaround, now)
+    result = {"machine_name": machine_name, "day": first_day.isoformat(), ARTIFACT_PROGRAM_CYCLES: 0, ARTIFACT_SHIFT_METRICS: 0, "ok": True}
+
+    logs = None
+    if ARTIFACT_PROGRAM_CYCLES in artifacts:
+        # Jendela di sekitar rentang: status awal sebelum tengah malam dan siklus yang melewati akhir rentang
+        logs = get_status_logs_for_machine(machine_name, fetch_start, fetch_end)
+        logs.sort(key=lambda log: log['timestamp'])
+        cycles = process_program_cycles_from_logs(machine_name, logs) if logs else []
+        # Hanya siklus yang dimulai di dalam rentang; sisanya milik unit lain
+        cycles = [cycle for cycle in cycles if range_start <= cycle['waktu_mulai'] < range_end]
+        replace_range = (machine_name, range_start, range_end) if replace else None
+        if save_program_cycles_to_db(cycles, replace_range=replace_range):
+            result[ARTIFACT_PROGRAM_CYCLES] = len(cycles)
+        else:
+            result["ok"] = False
+
+    if ARTIFACT_SHIFT_METRICS in artifacts:
+        if logs is not None:
+            status_arrays = ([log['timestamp'] for log in logs], [log['status_text'] for log in logs])
+        else:
+            status_arrays = get_status_log_arrays(machine_name, fetch_start, fetch_end)
+        if status_arrays is None:
+            result["ok"] = False
+        else:
+            rows = build_final_shift_metrics(machine_name, status_arrays[0], status_arrays[1], range_start, range_end, now=now)
+            if save_final_shift_metrics_batch(rows, overwrite=replace):
+                result[ARTIFACT_SHIFT_METRICS] = len(rows)
+            else:
+                result["ok"] = False
+
+    return result
+
+
+def _unit_ranges(start_date: datetime.date, end_date: datetime.date, artifacts):
+    """(first_day, last_day) per unit: per hari jika siklus program ikut dihitung, selain itu per bulan."""
+    if ARTIFACT_PROGRAM_CYCLES in artifacts:
+        day = start_date
+        while day <= end_date:
+            yield day, day
+            day += datetime.timedelta(days=1)
+        return
+    for month in _months_in_range(start_date, end_date):
+        month_end = (month + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+        yield max(month, start_date), min(month_end, end_date)
+
+
+def _load_checkpoint(path: str, signature: dict) -> set:
+    if not path or not os.path.exists(path):
+        return set()
+    try:
+        with open(path, 'r') as f:
+            checkpoint = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Could not read checkpoint '{path}': {e}. Starting from the beginning.")
+        return set()
+    if checkpoint.get("signature") != signature:
+        logger.warning(f"Checkpoint '{path}' belongs to a different run. Starting from the beginning.")
+        return set()
+    return set(checkpoint.get("completed", []))
+
+
+def _save_checkpoint(path: str, signature: dict, completed: set):
+    if not path:
+        return
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump({"signature": signature, "completed": sorted(completed), "updated_at": datetime.datetime.now(timezone.utc).isoformat()}, f)
+    os.replace(temp_path, path)
+
+
+def _months_in_range(start_date: datetime.date, end_date: datetime.date):
+    month = start_date.replace(day=1)
+    while month <= end_date:
+        yield month
+        month = month.replace(year=month.year + 1, month=1) if month.month == 12 else month.replace(month=month.month + 1)
+
+
+def run_reprocess(start_date: datetime.date, end_date: datetime.date, machines=None, artifacts=ARTIFACTS,
+                  replace: bool = False, workers: int = None, checkpoint_path: str = REPROCESS_CHECKPOINT_FILE,
+                  resume: bool = True) -> bool:
+    """
+    Menjalankan reprocess untuk semua unit (mesin, tanggal atau bulan) dalam rentang, paralel di process pool.
+    Mengembalikan True jika semua unit berhasil.
+    """
+    machines = list(machines or [machine["name"] for machine in MACHINE_CONFIGS_FOR_PROGRAM_REPORT])
+    artifacts = [artifact for artifact in ARTIFACTS if artifact in artifacts]
+    if not machines or not artifacts:
+        logger.error("Nothing to reprocess: no machines or no artifacts selected.")
+        return False
+
+    signature = {
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "machines": sorted(machines),
+        "artifacts": artifacts,
+        "replace": replace,
+    }
+    completed = _load_checkpoint(checkpoint_path, signature) if resume else set()
+
+    units = [
+        (machine_name, first_day, last_day)
+        for first_day, last_day in _unit_ranges(start_date, end_date, artifacts)
+        for machine_name in machines
+        if _unit_key(machine_name, first_day) not in completed
+    ]
+
+    if completed:
+        logger.info(f"Resuming from checkpoint '{checkpoint_path}': {len(completed)} units already done.")
+    if not units:
+        logger.info("All units are already reprocessed.")
+        return True
+
+    # Tabel bulanan dibuat sekali di sini, bukan berebut DDL dari banyak worker
+    init_db_pool(DB_ROLE_ANALYTICS)
+    months = list(_months_in_range(start_date, end_date))
+    for month in months:
+        month_dt = datetime.datetime.combine(month, datetime.time.min, tzinfo=timezone.utc)
+        if not ensure_monthly_tables(month_dt):
+            logger.error(f"Could not verify/create monthly tables for {month:%Y-%m}. Aborting.")
+            return False
+
+    workers = max(1, min(workers or REPROCESS_MAX_WORKERS, len(units)))
+    logger.info(f"Reprocessing {artifacts} for {len(machines)} machines, {start_date} to {end_date}: {len(units)} units on {workers} workers.")
+
+    started_at = time.monotonic()
+    totals = {ARTIFACT_PROGRAM_CYCLES: 0, ARTIFACT_SHIFT_METRICS: 0}
+    failed_units = []
+    last_checkpoint_at = 0.0
+    # 'spawn': proses worker tidak mewarisi koneksi DB dari proses induk
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_worker_init, initargs=(logging.getLogger().level, months)) as executor:
+        futures = {
+            executor.submit(reprocess_unit, machine_name, first_day, last_day, artifacts, replace): (machine_name, first_day)
+            for machine_name, first_day, last_day in units
+        }
+        for index, future in enumerate(as_completed(futures), start=1):
+            machine_name, day = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Reprocessing {machine_name} on {day} failed: {e}", exc_info=True)
+                failed_units.append((machine_name, day))
+                continue
+            if not result["ok"]:
+                failed_units.append((machine_name, day))
+                continue
+            completed.add(_unit_key(machine_name, day))
+            for artifact in totals:
+                totals[artifact] += result[artifact]
+            if time.monotonic() - last_checkpoint_at >= 5 or index == len(units):
+                _save_checkpoint(checkpoint_path, signature, completed)
+                last_checkpoint_at = time.monotonic()
+            if index % 50 == 0:
+                logger.info(f"Progress: {index}/{len(units)} units, {time.monotonic() - started_at:.0f}s elapsed.")
+
+    _save_checkpoint(checkpoint_path, signature, completed)
+    logger.info(
+        f"Reprocess finished in {time.monotonic() - started_at:.1f}s: {totals[ARTIFACT_PROGRAM_CYCLES]} program cycles, "
+        f"{totals[ARTIFACT_SHIFT_METRICS]} final shift metrics, {len(failed_units)} failed units."
+    )
+    for machine_name, day in failed_units:
+        logger.warning(f"Failed unit: {machine_name} on {day}. Rerun the same command to retry.")
+    return not failed_units
+
+
+def _parse_date(value: str) -> datetime.date:
+    return datetime.date.fromisoformat(value)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Recompute derived data (program cycles, final shift metrics) from status logs.")
+    parser.add_argument("--start", type=_parse_date, required=True, help="First local date (YYYY-MM-DD).")
+    parser.add_argument("--end", type=_parse_date, required=True, help="Last local date, inclusive (YYYY-MM-DD).")
+    parser.add_argument("--machines", nargs="+", help="Machine names (default: all machines in machines_config.json).")
+    parser.add_argument("--artifacts", default=",".join(ARTIFACTS), help=f"Comma separated subset of: {', '.join(ARTIFACTS)}.")
+    parser.add_argument("--replace", action="store_true", help="Delete existing rows in each unit's range before writing.")
+    parser.add_argument("--workers", type=int, default=REPROCESS_MAX_WORKERS, help="Number of worker processes.")
+    parser.add_argument("--checkpoint", default=REPROCESS_CHECKPOINT_FILE, help="Checkpoint file used to resume an interrupted run.")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and process every unit again.")
+    parser.add_argument("--backfill-program-ids", action="store_true", help="Also fill missing program_id values for the range afterwards.")
+    parser.add_argument("--compact-aliases", action="store_true", help="Also apply pending program renames to the report tables afterwards.")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    if args.end < args.start:
+        parser.error("--end must not be before --start")
+    artifacts = [artifact.strip() for artifact in args.artifacts.split(",") if artifact.strip()]
+    unknown = set(artifacts) - set(ARTIFACTS)
+    if unknown:
+        parser.error(f"Unknown artifacts: {', '.join(sorted(unknown))}")
+
+    set_default_db_role(DB_ROLE_ANALYTICS)
+    ok = run_reprocess(
+        args.start, args.end,
+        machines=args.machines,
+        artifacts=artifacts,
+        replace=args.replace,
+        workers=args.workers,
+        checkpoint_path=args.checkpoint,
+        resume=not args.restart,
+    )
+    if args.backfill_program_ids:
+        backfill_program_ids(args.start, args.end)
+    if args.compact_aliases:
+        compact_program_aliases(min_age_hours=0)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,6 +5,7 @@ import logging
 import time
 import datetime
 from datetime import timezone
+import numpy as np
 import pandas as pd # Digunakan dalam fungsi calculate_runtime_idletime
 import threading
 
@@ -16,11 +17,16 @@ from .db_manager import (
     create_program_report_table_monthly, 
     get_program_report_table_name,
     get_shift_metrics_table_name,
-    check_and_save_completed_shifts,
+    get_status_log_arrays,
+    save_final_shift_metrics_batch,
+    get_shift_finalization_watermarks,
+    save_shift_finalization_watermark,
     format_seconds_to_hhmm # Mengimpor fungsi format HH:MM dari db_manager
 )
-from .config import SHIFTS, RUNNING_STATUSES, IDLE_STATUSES, OTHER_STATUSES, SHIFT_CALC_INTERVAL_SECONDS
+from .config import RUNNING_STATUSES, IDLE_STATUSES, OTHER_STATUSES, SHIFT_CALC_INTERVAL_SECONDS
+from .config import SHIFT_FINALIZATION_GRACE_SECONDS, SHIFT_FINALIZATION_MAX_CATCHUP_DAYS, REPROCESS_LOOKAROUND_HOURS
 from .program_processor import process_program_cycles_from_logs # NEW: Import fungsi dari file baru
+from .shift_calendar import get_shift_calendar
 
 logger = logging.getLogger(__name__)
 
@@ -36,39 +42,13 @@ def get_current_shift_info(current_time: datetime.datetime):
     Menentukan shift yang sedang berjalan berdasarkan waktu saat ini (UTC aware).
     Mengembalikan tuple: (shift_name: str, shift_start_utc_aware: datetime.datetime, shift_end_utc_aware: datetime.datetime).
     """
-    # Pastikan current_time adalah objek datetime yang timezone-aware
-    # Konversi ke waktu lokal untuk pencocokan shift
-    try:
-        import tzlocal
-        local_tz = tzlocal.get_localzone()
-    except ImportError:
-        logger.warning("tzlocal not found. Assuming Asia/Jakarta timezone for local time conversion.")
-        class AsiaJakartaTZ(datetime.tzinfo):
-            def utcoffset(self, dt): return datetime.timedelta(hours=7)
-            def dst(self, dt): return datetime.timedelta(0)
-            def tzname(self, dt): return "WIB"
-        local_tz = AsiaJakartaTZ()
-
-    current_time_local_aware = current_time.astimezone(local_tz)
-
-    for shift_name, (start_hour, end_hour) in SHIFTS.items():
-        # Buat objek datetime lokal untuk awal shift pada tanggal current_time_local_aware
-        shift_start_local = datetime.datetime.combine(current_time_local_aware.date(), datetime.time(start_hour, 0, 0), tzinfo=local_tz)
-        
-        # Tangani shift yang melintasi tengah malam (misal: 22:00-06:00)
-        if end_hour == 0: # Ini berarti shift berakhir pada 00:00 hari berikutnya
-            shift_end_local = datetime.datetime.combine(current_time_local_aware.date() + datetime.timedelta(days=1), datetime.time(0, 0, 0), tzinfo=local_tz)
-        else: # Shift berakhir pada hari yang sama
-            shift_end_local = datetime.datetime.combine(current_time_local_aware.date(), datetime.time(end_hour, 0, 0), tzinfo=local_tz)
-        
-        # Cek apakah waktu lokal saat ini berada di dalam batas shift ini
-        if shift_start_local <= current_time_local_aware < shift_end_local:
-            # Konversi kembali ke UTC aware sebelum mengembalikan
-            return shift_name, shift_start_local.astimezone(timezone.utc), shift_end_local.astimezone(timezone.utc)
+    shift = get_shift_calendar().shift_at(current_time)
+    if shift is not None:
+        return shift.name, shift.start, shift.end
 
     # Fallback jika tidak ada shift yang terdefinisi mencakup waktu saat ini
     # Ini bisa terjadi jika ada celah antar shift atau waktu di luar jadwal kerja
-    logger.warning(f"No active shift found for current time: {current_time_local_aware.isoformat()}. Defaulting to 'Unscheduled'.")
+    logger.warning(f"No active shift found for current time: {current_time.isoformat()}. Defaulting to 'Unscheduled'.")
     # Sebagai fallback, kembalikan periode 8 jam di sekitar waktu saat ini
     fallback_start_utc = current_time.replace(minute=0, second=0, microsecond=0) - datetime.timedelta(hours=4)
     fallback_end_utc = current_time.replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=4)
@@ -83,41 +63,12 @@ def get_previous_shift_info(current_time: datetime.datetime):
     # Dapatkan waktu mulai shift yang sedang aktif (dalam UTC)
     _, current_shift_start_utc, _ = get_current_shift_info(current_time)
 
-    # Konversi waktu mulai shift saat ini ke waktu lokal untuk mencari shift sebelumnya
-    try:
-        import tzlocal
-        local_tz = tzlocal.get_localzone()
-    except ImportError:
-        logger.warning("tzlocal not found. Assuming Asia/Jakarta timezone for local time conversion.")
-        class AsiaJakartaTZ(datetime.tzinfo):
-            def utcoffset(self, dt): return datetime.timedelta(hours=7)
-            def dst(self, dt): return datetime.timedelta(0)
-            def tzname(self, dt): return "WIB"
-        local_tz = AsiaJakartaTZ()
-
-    current_shift_start_local = current_shift_start_utc.astimezone(local_tz)
-
-    # Dapatkan waktu sesaat sebelum shift saat ini dimulai (misalnya 23:59:59 dari hari sebelumnya)
-    time_just_before_current_shift = current_shift_start_local - datetime.timedelta(seconds=1)
-
-    # Loop melalui semua definisi shift untuk menemukan shift yang berakhir tepat sebelum
-    # `time_just_before_current_shift` (artinya, `time_just_before_current_shift` berada di dalam shift itu)
-    # Kita hanya perlu mengiterasi `SHIFTS` sekali karena kita tahu definisinya statis.
-    for shift_name, (start_hour, end_hour) in SHIFTS.items():
-        shift_start_candidate_local = datetime.datetime.combine(time_just_before_current_shift.date(), datetime.time(start_hour, 0, 0), tzinfo=local_tz)
-        
-        # Tangani shift yang melintasi tengah malam
-        if end_hour == 0:
-            shift_end_candidate_local = datetime.datetime.combine(time_just_before_current_shift.date() + datetime.timedelta(days=1), datetime.time(0, 0, 0), tzinfo=local_tz)
-        else:
-            shift_end_candidate_local = datetime.datetime.combine(time_just_before_current_shift.date(), datetime.time(end_hour, 0, 0), tzinfo=local_tz)
-
-        if shift_start_candidate_local <= time_just_before_current_shift < shift_end_candidate_local:
-            # Jika ditemukan, kembalikan nama shift dan batasnya dalam UTC
-            return shift_name, shift_start_candidate_local.astimezone(timezone.utc), shift_end_candidate_local.astimezone(timezone.utc)
+    # Shift terakhir yang sudah selesai saat shift ini dimulai (melewati hari tanpa shift, misal hari libur)
+    shift = get_shift_calendar().shift_before(current_shift_start_utc)
+    if shift is not None:
+        return shift.name, shift.start, shift.end
     
     # Fallback jika tidak ada definisi shift yang cocok untuk waktu sebelumnya.
-    # Ini mungkin terjadi jika aplikasi baru dimulai setelah downtime panjang.
     logger.warning(f"Could not determine previous shift for {current_time.isoformat()}. Defaulting to an 8-hour block before current shift start.")
     fallback_start_utc = current_shift_start_utc - datetime.timedelta(hours=8)
     fallback_end_utc = current_shift_start_utc
@@ -166,14 +117,14 @@ def calculate_runtime_idletime(status_logs: list, shift_start: datetime.datetime
         # Perbarui status_text jika perlu, atau pastikan itu valid untuk kalkulasi
         if synthetic_entry['status_text'] not in (RUNNING_STATUSES + IDLE_STATUSES + OTHER_STATUSES):
             synthetic_entry['status_text'] = "Idle" # Fallback status
-            logger.debug(f"Adjusted synthetic entry status to 'Idle' for '{last_log_before_shift['status_text']}' before shift start.")
+            logger.debug("Adjusted synthetic entry status to 'Idle' for '%s' before shift start.", last_log_before_shift['status_text'])
 
         relevant_logs.insert(0, synthetic_entry)
-        logger.debug(f"Added synthetic entry at {shift_start.isoformat()} with status '{synthetic_entry['status_text']}' from preceding log.")
+        logger.debug("Added synthetic entry at %s with status '%s' from preceding log.", shift_start, synthetic_entry['status_text'])
 
     # Jika masih tidak ada log yang relevan sama sekali, berarti tidak ada aktivitas tercatat
     if not relevant_logs:
-        logger.debug(f"No relevant logs found within or immediately before shift {shift_start.isoformat()} - {shift_end.isoformat()}. Returning 0.0, 0.0.")
+        logger.debug("No relevant logs found within or immediately before shift %s - %s. Returning 0.0, 0.0.", shift_start, shift_end)
         return 0.0, 0.0
 
     # Urutkan ulang log setelah penambahan sintetis dan filter awal
@@ -190,7 +141,7 @@ def calculate_runtime_idletime(status_logs: list, shift_start: datetime.datetime
             else: 
                 unique_relevant_logs[-1] = relevant_logs[i] # Update dengan entri yang lebih baru jika timestamp sama
     
-    logger.debug(f"Unique relevant logs for final calculation: {unique_relevant_logs}")
+    logger.debug("Unique relevant logs for final calculation: %s", unique_relevant_logs)
 
     # Iterasi melalui log yang sudah difilter dan diurutkan untuk menghitung durasi
     for i in range(len(unique_relevant_logs)):
@@ -220,10 +171,10 @@ def calculate_runtime_idletime(status_logs: list, shift_start: datetime.datetime
         if duration > 0:
             if current_status in RUNNING_STATUSES:
                 total_runtime += duration
-                logger.debug(f"  Adding {duration:.2f}s to runtime for status '{current_status}'")
+                logger.debug("  Adding %.2fs to runtime for status '%s'", duration, current_status)
             elif current_status in IDLE_STATUSES:
                 total_idletime += duration
-                logger.debug(f"  Adding {duration:.2f}s to idletime for status '{current_status}'")
+                logger.debug("  Adding %.2fs to idletime for status '%s'", duration, current_status)
             else:
                 # Status lain (Alarm, Setup, Manual mode, dll.) akan berkontribusi ke 'other_time'
                 # Di sini kita masih memasukkannya ke total_idletime, dan kemudian 'other_time'
@@ -234,11 +185,158 @@ def calculate_runtime_idletime(status_logs: list, shift_start: datetime.datetime
                 # KOREKSI: Lebih baik kategorikan ini sebagai "unaccounted" atau biarkan default ke idletime
                 # dan biarkan logika di thread_target yang memisahkannya secara eksplisit.
                 total_idletime += duration # Untuk sementara, masukkan ke idletime, yang akan digunakan untuk total accounted time
-                logger.debug(f"  Adding {duration:.2f}s to idletime for OTHER status '{current_status}' (will be part of 'Other Time' in final calc)")
+                logger.debug("  Adding %.2fs to idletime for OTHER status '%s' (will be part of 'Other Time' in final calc)", duration, current_status)
 
     return total_runtime, total_idletime
 
 
+def build_final_shift_metrics(machine_name: str, timestamps, statuses, range_start: datetime.datetime, range_end: datetime.datetime,
+                              running_statuses=None, now: datetime.datetime = None) -> list:
+    """
+    Versi massal calculate_runtime_idletime untuk backfill: menghitung metrik semua shift yang dimulai di
+    [range_start, range_end) dan sudah selesai, dalam satu pass vektor (tanpa loop per shift atau per log).
+
+    Status pada waktu t = log terakhir dengan timestamp <= t. Runtime = waktu dengan status running,
+    idletime = waktu dengan status lain, other = waktu shift yang belum tercakup log sama sekali
+    (sebelum log pertama), sama seperti calculate_runtime_idletime.
+    Agar shift pertama punya status awal, sertakan log dari beberapa jam sebelum range_start.
+
+    Args:
+        timestamps: Timestamp log (detik epoch), lihat db_manager.get_status_log_arrays.
+        statuses: status_text untuk setiap timestamp.
+        running_statuses: Status yang dihitung sebagai runtime; default RUNNING_STATUSES.
+    Returns:
+        list: dict per shift (machine_name, shift_name, runtime_sec, idletime_sec, other_time_sec,
+              shift_start_time, shift_end_time), siap untuk db_manager.save_final_shift_metrics_batch.
+    """
+    now = now or datetime.datetime.now(timezone.utc)
+    # Shift yang masih berjalan difinalisasi oleh main_app
+    spans = [
+        span for span in get_shift_calendar().shifts_overlapping(range_start, range_end)
+        if range_start <= span.start < range_end and span.end <= now
+    ]
+    if not spans:
+        return []
+
+    shift_starts = np.array([span.start.timestamp() for span in spans])
+    shift_ends = np.array([span.end.timestamp() for span in spans])
+    runtime = np.zeros(len(spans))
+    covered = np.zeros(len(spans))
+
+    timestamps = np.asarray(timestamps, dtype=float)
+    if timestamps.size:
+        statuses = np.asarray(statuses, dtype=object)
+        order = np.argsort(timestamps, kind="stable")
+        timestamps, statuses = timestamps[order], statuses[order]
+        # Beberapa log pada timestamp yang sama: yang terakhir berlaku
+        last_of_tie = np.append(timestamps[1:] != timestamps[:-1], True)
+        timestamps, statuses = timestamps[last_of_tie], statuses[last_of_tie]
+        is_running = np.isin(statuses, list(running_statuses or RUNNING_STATUSES))
+
+        # Log terakhir berlaku sampai setelah akhir shift terakhir
+        breakpoints = np.append(timestamps, max(timestamps[-1], shift_ends.max()) + 1.0)
+        cumulative_running = np.concatenate(([0.0], np.cumsum(np.diff(breakpoints) * is_running)))
+        cumulative_covered = breakpoints - breakpoints[0]
+        # Kumulatif linear di antara breakpoint, jadi interpolasi di batas shift memotong interval dengan tepat
+        runtime = np.interp(shift_ends, breakpoints, cumulative_running) - np.interp(shift_starts, breakpoints, cumulative_running)
+        covered = np.interp(shift_ends, breakpoints, cumulative_covered) - np.interp(shift_starts, breakpoints, cumulative_covered)
+
+    idletime = covered - runtime
+    other_time = np.maximum(0.0, (shift_ends - shift_starts) - covered)
+    return [
+        {
+            "machine_name": machine_name,
+            "shift_name": span.name,
+            "runtime_sec": float(runtime[i]),
+            "idletime_sec": float(idletime[i]),
+            "other_time_sec": float(other_time[i]),
+            "shift_start_time": span.start,
+            "shift_end_time": span.end,
+        }
+        for i, span in enumerate(spans)
+    ]
+
+
+class ShiftFinalizer:
+    """
+    Menyimpan metrik shift final berdasarkan watermark per mesin di database: akhir shift terakhir yang
+    sudah difinalisasi. Setelah restart, semua shift sejak watermark (maks. max_catchup_days) dikejar sekaligus
+    dengan build_final_shift_metrics. Selama belum ada batas shift yang terlewati, run() hanya membandingkan
+    waktu sekarang dengan satu timestamp.
+
+    Args:
+        grace_seconds (float): Jeda setelah akhir shift sebelum difinalisasi (log terakhir sudah tertulis).
+        max_catchup_days (int): Batas pengejaran shift yang terlewat setelah downtime.
+    """
+
+    def __init__(self, grace_seconds: float = None, max_catchup_days: int = None):
+        self.grace = datetime.timedelta(seconds=SHIFT_FINALIZATION_GRACE_SECONDS if grace_seconds is None else grace_seconds)
+        self.max_catchup = datetime.timedelta(days=max_catchup_days or SHIFT_FINALIZATION_MAX_CATCHUP_DAYS)
+        self._watermarks = None
+        self._next_due = None
+
+    def _seed_watermark(self, now: datetime.datetime) -> datetime.datetime:
+        # Mesin tanpa watermark (pertama kali): mulai dari shift terakhir yang sudah selesai
+        last_shift = get_shift_calendar().shift_before(now - self.grace)
+        return last_shift.start if last_shift is not None else now - self.grace
+
+    def _update_next_due(self):
+        shift_calendar = get_shift_calendar()
+        next_ends = [
+            span.end for span in (shift_calendar.shift_starting_after(watermark) for watermark in self._watermarks.values())
+            if span is not None
+        ]
+        self._next_due = min(next_ends) + self.grace if next_ends else None
+
+    def run(self, now: datetime.datetime, machine_names) -> list:
+        """Memfinalisasi shift yang sudah selesai untuk machine_names. Mengembalikan pesan log."""
+        if self._watermarks is None:
+            watermarks = get_shift_finalization_watermarks()
+            if watermarks is None:
+                return ["Could not load shift finalization watermarks. Will retry next cycle."]
+            self._watermarks = watermarks
+            logger.info(f"Loaded shift finalization watermarks for {len(watermarks)} machines.")
+
+        new_machines = [machine_name for machine_name in machine_names if machine_name not in self._watermarks]
+        if new_machines:
+            for machine_name in new_machines:
+                self._watermarks[machine_name] = self._seed_watermark(now)
+            self._next_due = None
+        if self._next_due is None:
+            self._update_next_due()
+        if self._next_due is None or now < self._next_due:
+            return []
+
+        messages = []
+        cutoff = now - self.grace
+        lookaround = datetime.timedelta(hours=REPROCESS_LOOKAROUND_HOURS)
+        for machine_name in machine_names:
+            watermark = self._watermarks[machine_name]
+            range_start = max(watermark, cutoff - self.max_catchup)
+            if range_start > watermark:
+                logger.warning(
+                    f"Shift finalization for {machine_name} is behind since {watermark.isoformat()}; only the last "
+                    f"{self.max_catchup.days} days are caught up. Use app_core.reprocess for older shifts."
+                )
+            status_arrays = get_status_log_arrays(machine_name, range_start - lookaround, cutoff)
+            if status_arrays is None:
+                messages.append(f"Failed to load status logs to finalize shifts for {machine_name}.")
+                continue
+            rows = build_final_shift_metrics(machine_name, status_arrays[0], status_arrays[1], range_start, cutoff, now=cutoff)
+            if not rows:
+                continue
+            last_shift_end = rows[-1]["shift_end_time"]
+            if save_final_shift_metrics_batch(rows) and save_shift_finalization_watermark(machine_name, last_shift_end):
+                self._watermarks[machine_name] = last_shift_end
+                shift_names = ", ".join(f"{row['shift_name']} ({row['shift_start_time'].isoformat()})" for row in rows)
+                messages.append(f"Successfully saved final metrics for {machine_name}: {shift_names}.")
+            else:
+                messages.append(f"Failed to save final metrics for {machine_name} since {watermark.isoformat()}. Will retry next cycle.")
+
+        self._update_next_due()
+        return messages
+
+
 # --- Fungsi Utama Shift Calculation Thread ---
 
 def shift_calculation_thread_target(
@@ -248,10 +346,9 @@ def shift_calculation_thread_target(
     data_lock_ref,
     machine_shift_metrics_ref,
     shift_metrics_lock_ref,
-    shifts_saved_to_db_ref,
-    shifts_saved_to_db_lock_ref,
 ):
     logger.debug("--- Inside shift_calculation_thread_target function. Starting initial checks. ---")
+    shift_finalizer = ShiftFinalizer()
     
     try:
         while not stop_event.is_set():
@@ -326,22 +423,14 @@ def shift_calculation_thread_target(
                             )
                             logger.debug(f"[DB-Writer-Shift-Metrics-Realtime] Saved real-time metrics for {machine_name} - {shift_name}")
 
-                # --- Check and save completed shifts to final DB table ---
-                logger.debug("[Shift-Calc-Thread] Checking for completed shifts to save to final table.")
-                with shifts_saved_to_db_lock_ref: # Memastikan akses aman ke shifts_saved_to_db_ref
-                    try:
-                        messages, _ = check_and_save_completed_shifts(
-                            shift_metrics_data=machine_shift_metrics_ref,
-                            current_time=current_time_utc, # Gunakan current_time_utc yang akurat
-                            shifts_saved_to_db_lock=shifts_saved_to_db_lock_ref,
-                            shifts_saved_state=shifts_saved_to_db_ref,
-                            shift_metrics_lock=shift_metrics_lock_ref
-                        )
-                        for msg in messages:
-                            logger.info(msg)
-                        logger.debug("[Shift-Calc-Thread] Finished checking for completed shifts.")
-                    except Exception as e:
-                        logger.critical(f"[Shift-Calc-Thread] CRITICAL ERROR checking/saving completed shifts: {e}", exc_info=True)
+                    machine_names = list(latest_machine_data_ref.keys())
+
+            # --- Simpan shift yang sudah selesai ke tabel final (berdasarkan watermark di DB) ---
+            try:
+                for msg in shift_finalizer.run(current_time_utc, machine_names):
+                    logger.info(msg)
+            except Exception as e:
+                logger.critical(f"[Shift-Calc-Thread] CRITICAL ERROR checking/saving completed shifts: {e}", exc_info=True)
 
             stop_event.wait(interval)
             
@@ -0,0 +1,178 @@
+# app_core/shift_calendar.py
+
+import bisect
+import datetime
+import functools
+import logging
+import threading
+from collections import namedtuple
+from datetime import timezone
+
+from app_core.config import SHIFTS, SHIFT_CALENDAR_OVERRIDES, SHIFT_WEEKDAY_PATTERNS, SHIFT_CALENDAR_WINDOW_DAYS
+
+logger = logging.getLogger(__name__)
+
+# Satu shift pada satu tanggal lokal. start/end dalam UTC aware, local_date = tanggal lokal awal shift.
+ShiftSpan = namedtuple("ShiftSpan", ["name", "start", "end", "local_date"])
+
+
+@functools.lru_cache(maxsize=None)
+def get_local_tz():
+    """Zona waktu lokal, ditentukan sekali per proses (fallback WIB jika tzlocal tidak tersedia)."""
+    try:
+        import tzlocal
+        return tzlocal.get_localzone()
+    except ImportError:
+        logger.warning("tzlocal not found. Assuming Asia/Jakarta timezone (WIB) for local time conversion.")
+        return timezone(datetime.timedelta(hours=7), "WIB")
+
+
+class ShiftCalendar:
+    """
+    Batas shift yang dihitung sebelumnya untuk jendela tanggal (diperluas otomatis), dengan pencarian biner.
+
+    Definisi shift per tanggal: overrides[tanggal] (misal hari libur = {}), lalu weekday_patterns[weekday]
+    (0 = Senin), lalu shifts default. Jam selesai <= jam mulai berarti shift berakhir keesokan harinya.
+
+    Args:
+        shifts (dict): {nama_shift: (jam_mulai, jam_selesai)} default, seperti config.SHIFTS.
+        local_tz: Zona waktu lokal; default get_local_tz().
+        overrides (dict): {datetime.date atau 'YYYY-MM-DD': {nama_shift: (jam_mulai, jam_selesai)}}.
+        weekday_patterns (dict): {weekday: {nama_shift: (jam_mulai, jam_selesai)}}.
+        window_days (int): Jumlah hari di sekitar waktu yang diminta yang dihitung sekaligus.
+    """
+
+    def __init__(self, shifts=None, local_tz=None, overrides=None, weekday_patterns=None, window_days=None):
+        self.shifts = dict(SHIFTS if shifts is None else shifts)
+        self.local_tz = local_tz or get_local_tz()
+        self.overrides = {
+            datetime.date.fromisoformat(day) if isinstance(day, str) else day: dict(day_shifts)
+            for day, day_shifts in (SHIFT_CALENDAR_OVERRIDES if overrides is None else overrides).items()
+        }
+        self.weekday_patterns = {
+            int(weekday): dict(day_shifts)
+            for weekday, day_shifts in (SHIFT_WEEKDAY_PATTERNS if weekday_patterns is None else weekday_patterns).items()
+        }
+        self.window_days = window_days or SHIFT_CALENDAR_WINDOW_DAYS
+        # (spans, starts) diganti sekaligus agar pembaca tanpa lock selalu melihat pasangan yang konsisten
+        self._index = ([], [])
+        self._first_date = None
+        self._last_date = None
+        self._lock = threading.Lock()
+
+    def shifts_for_date(self, local_date: datetime.date) -> dict:
+        if local_date in self.overrides:
+            return self.overrides[local_date]
+        if local_date.weekday() in self.weekday_patterns:
+            return self.weekday_patterns[local_date.weekday()]
+        return self.shifts
+
+    def _build_spans(self, first_date: datetime.date, last_date: datetime.date) -> list:
+        spans = []
+        local_date = first_date
+        while local_date <= last_date:
+            for shift_name, (start_hour, end_hour) in self.shifts_for_date(local_date).items():
+                shift_start = datetime.datetime.combine(local_date, datetime.time(start_hour, 0, 0), tzinfo=self.local_tz)
+                end_date = local_date + datetime.timedelta(days=1) if end_hour <= start_hour else local_date
+                shift_end = datetime.datetime.combine(end_date, datetime.time(end_hour, 0, 0), tzinfo=self.local_tz)
+                spans.append(ShiftSpan(shift_name, shift_start.astimezone(timezone.utc), shift_end.astimezone(timezone.utc), local_date))
+            local_date += datetime.timedelta(days=1)
+        return spans
+
+    def _ensure_range(self, start: datetime.datetime, end: datetime.datetime):
+        # Satu hari tambahan di kedua sisi: shift yang melewati tengah malam dimulai pada tanggal sebelumnya
+        first_needed = start.astimezone(self.local_tz).date() - datetime.timedelta(days=1)
+        last_needed = end.astimezone(self.local_tz).date() + datetime.timedelta(days=1)
+        if self._first_date is not None and self._first_date <= first_needed and last_needed <= self._last_date:
+            return
+        with self._lock:
+            if self._first_date is not None and self._first_date <= first_needed and last_needed <= self._last_date:
+                return
+            margin = datetime.timedelta(days=self.window_days)
+            first_date = min(first_needed, self._first_date or first_needed) - margin
+            last_date = max(last_needed, self._last_date or last_needed) + margin
+            spans = sorted(self._build_spans(first_date, last_date), key=lambda span: span.start)
+            self._index = (spans, [span.start for span in spans])
+            self._first_date, self._last_date = first_date, last_date
+
+    def shift_at(self, moment: datetime.datetime):
+        """ShiftSpan yang mencakup 'moment', atau None jika tidak ada shift terjadwal."""
+        self._ensure_range(moment, moment)
+        spans, starts = self._index
+        index = bisect.bisect_right(starts, moment) - 1
+        if index >= 0 and moment < spans[index].end:
+            return spans[index]
+        return None
+
+    def shift_before(self, moment: datetime.datetime):
+        """Shift terakhir yang sudah selesai pada 'moment' (end <= moment)."""
+        self._ensure_range(moment - datetime.timedelta(days=self.window_days), moment)
+        spans, starts = self._index
+        index = bisect.bisect_right(starts, moment) - 1
+        while index >= 0:
+            if spans[index].end <= moment:
+                return spans[index]
+            index -= 1
+        return None
+
+    def shift_starting_after(self, moment: datetime.datetime):
+        """Shift pertama yang dimulai pada atau setelah 'moment'."""
+        self._ensure_range(moment, moment + datetime.timedelta(days=self.window_days))
+        spans, starts = self._index
+        index = bisect.bisect_left(starts, moment)
+        return spans[index] if index < len(spans) else None
+
+    def shifts_overlapping(self, start: datetime.datetime, end: datetime.datetime) -> list:
+        """Semua shift yang beririsan dengan [start, end), urut berdasarkan waktu mulai."""
+        self._ensure_range(start, end)
+        spans, starts = self._index
+        # Shift yang dimulai sebelum 'start' masih bisa beririsan; mundur satu hari sudah cukup
+        first = bisect.bisect_left(starts, start - datetime.timedelta(days=1))
+        last = bisect.bisect_left(starts, end)
+        return [span for span in spans[first:last] if span.end > start]
+
+    def shifts_starting_on(self, local_date: datetime.date) -> list:
+        """Shift yang dimulai pada tanggal lokal ini."""
+        day_start, day_end = self.day_bounds(local_date)
+        return [span for span in self.shifts_overlapping(day_start - datetime.timedelta(days=1), day_end) if span.local_date == local_date]
+
+    def day_bounds(self, local_date: datetime.date):
+        """Awal dan akhir (UTC) satu tanggal lokal."""
+        day_start = datetime.datetime.combine(local_date, datetime.time.min, tzinfo=self.local_tz)
+        day_end = datetime.datetime.combine(local_date + datetime.timedelta(days=1), datetime.time.min, tzinfo=self.local_tz)
+        return day_start.astimezone(timezone.utc), day_end.astimezone(timezone.utc)
+
+    def assign_shifts(self, timestamps):
+        """
+        Pemetaan massal timestamp (detik epoch) ke shift untuk backfill.
+        Mengembalikan (spans, indices): indices[i] adalah indeks ke spans, atau -1 jika di luar shift.
+        """
+        import numpy as np
+
+        timestamps = np.asarray(timestamps, dtype=float)
+        if timestamps.size == 0:
+            return [], np.empty(0, dtype=int)
+        first = datetime.datetime.fromtimestamp(float(timestamps.min()), tz=timezone.utc)
+        last = datetime.datetime.fromtimestamp(float(timestamps.max()), tz=timezone.utc)
+        spans = self.shifts_overlapping(first, last + datetime.timedelta(microseconds=1))
+        if not spans:
+            return spans, np.full(timestamps.shape, -1, dtype=int)
+        span_starts = np.array([span.start.timestamp() for span in spans])
+        span_ends = np.array([span.end.timestamp() for span in spans])
+        indices = np.searchsorted(span_starts, timestamps, side="right") - 1
+        inside = (indices >= 0) & (timestamps < span_ends[np.clip(indices, 0, None)])
+        return spans, np.where(inside, indices, -1)
+
+
+_default_calendar = None
+_default_calendar_lock = threading.Lock()
+
+
+def get_shift_calendar() -> ShiftCalendar:
+    """Kalender shift bersama untuk proses ini, dari SHIFTS dan pengecualian di config."""
+    global _default_calendar
+    if _default_calendar is None:
+        with _default_calendar_lock:
+            if _default_calendar is None:
+                _default_calendar = ShiftCalendar()
+    return _default_calendar
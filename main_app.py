@@ -12,14 +12,28 @@ import datetime
 from collections import defaultdict 
 from datetime import timezone # Pastikan ini diimpor untuk datetime.timezone.utc
 import app_core.program_processor as program_processor 
+from app_core.live_snapshot import LiveSnapshotWriter
+from app_core.live_api import LiveDataHub, start_live_api_server
+from app_core import metrics
+from app_core.log_setup import configure_logging, stop_logging, LogSampler
 
 # Mengimpor konfigurasi dari app_core/config.py
 from app_core.config import (
     SHIFTS,
     DATA_FILE,
+    LIVE_SNAPSHOT_FILE,
+    EXPORT_MACHINE_DATA_JSON,
+    LIVE_API_ENABLED,
+    LIVE_API_HOST,
+    LIVE_API_PORT,
+    LIVE_API_PUBLISH_INTERVAL_SECONDS,
     STATUS_LOG_RETENTION_HOURS,
     STATUS_LOG_DB_INTERVAL_SECONDS,
+    STATUS_LOG_NOTIFY_MIN_SECONDS,
     DB_CONFIG,
+    PROGRAM_ALIAS_COMPACT_INTERVAL_SECONDS,
+    METRICS_SUMMARY_INTERVAL_SECONDS,
+    MACHINES_CONFIG_FILE,
 )
 # Mengimpor fungsi manajemen DB dari app_core/db_manager.py
 from app_core.db_manager import (
@@ -28,59 +42,52 @@ from app_core.db_manager import (
     save_status_log,
     get_status_logs_for_machine, 
     create_shift_metrics_table,
-    save_shift_metrics,
+    save_shift_metrics_batch,
+    get_shift_metrics_write_stats,
     create_final_shift_metrics_table_if_not_exists,
     save_final_shift_metrics,
-    check_and_save_completed_shifts,
-    get_shift_metrics_table_name,
     get_status_log_table_name,
-    get_program_report_table_name, 
-    create_program_report_table_monthly,
+    precreate_next_month_tables,
     save_program_cycles_to_db, 
+    compact_program_aliases,
     init_db,
     init_db_pool,
-    db_write_lock
+    get_db_write_stats,
+    get_bulk_write_stats,
+    get_db_pool_stats,
+    set_default_db_role,
+    set_db_role,
+    DB_ROLE_INGESTION,
+    DB_ROLE_ANALYTICS,
+)
+from app_core.change_notifier import (
+    notify_change,
+    TOPIC_STATUS_LOGS,
+    TOPIC_SHIFT_METRICS,
+    TOPIC_PROGRAM_REPORT,
 )
 
 # --- Konfigurasi Logging ---
-# Logging setup
+# Logging setup: semua logger menulis lewat antrean ke thread listener (app_core/log_setup.py),
+# sehingga I/O disk tidak terjadi di thread polling/DB
 LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-formatter = logging.Formatter(LOG_FORMAT)
-
-# Root logger configuration
-root_logger = logging.getLogger()
-root_logger.setLevel(logging.DEBUG)
-for handler in root_logger.handlers[:]:
-    root_logger.removeHandler(handler)
-
-# Console handler for root logger
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
-root_logger.addHandler(console_handler)
-
-logging.getLogger('opcua').setLevel(logging.DEBUG)
 
-# Specific loggers configuration
+# Specific loggers configuration (file sendiri, diputar berdasarkan ukuran); logger lain ke konsol
 loggers_config = {
     '__main__': {'file': os.path.join(LOG_DIR, "main_app.log"), 'level': logging.WARNING},
     'app_core.db_manager': {'file': os.path.join(LOG_DIR, "db_manager.log"), 'level': logging.WARNING},
-    'app_core.data_processor': {'file': os.path.join(LOG_DIR, "data_processor.log"), 'level': logging.DEBUG},
+    'app_core.data_processor': {'file': os.path.join(LOG_DIR, "data_processor.log"), 'level': logging.WARNING},
     'app_core.program_processor': {'file': os.path.join(LOG_DIR, "program_processor.log"), 'level': logging.WARNING},
     'app_core.shift_calculator': {'file': os.path.join(LOG_DIR, "shift_calculator.log"), 'level': logging.WARNING},
     'app_core.program_report_thread': {'file': os.path.join(LOG_DIR, "program_report_thread.log"), 'level': logging.WARNING},
     # 'app_core.opc_client_module': {'file': os.path.join(LOG_DIR, "opc_client_module.log"), 'level': logging.WARNING}, 
     'tzlocal': {'file': os.path.join(LOG_DIR, "tzlocal.log"), 'level': logging.WARNING},
 }
-for logger_name, config_setting in loggers_config.items():
-    specific_logger = logging.getLogger(logger_name)
-    specific_logger.setLevel(config_setting['level'])
-    
-    file_handler = logging.FileHandler(config_setting['file'])
-    file_handler.setFormatter(formatter)
-    specific_logger.addHandler(file_handler)
-    specific_logger.propagate = False
+configure_logging(loggers_config, LOG_FORMAT, root_level=logging.DEBUG)
+
+logging.getLogger('opcua').setLevel(logging.DEBUG)
 
 # Get logger for main_app.py
 logger = logging.getLogger(__name__)
@@ -94,8 +101,17 @@ shift_metrics_lock = threading.RLock()
 latest_status_for_db_write = {}
 latest_status_for_db_write_lock = threading.Lock()
 
-shifts_saved_to_db = {}
-shifts_saved_to_db_lock = threading.RLock()
+# --- Metrik internal (lihat app_core/metrics.py; /metrics di API live dan ringkasan berkala di log) ---
+OPC_READ_SECONDS = metrics.histogram("iot_opc_read_seconds", "Duration of one OPC UA read of all variables.", ("machine",))
+OPC_READ_FAILURES = metrics.counter("iot_opc_read_failures_total", "OPC UA reads that returned no data or raised.", ("machine",))
+DECODE_SECONDS = metrics.histogram("iot_decode_seconds", "Duration of process_opcua_data for one sample.", ("machine",))
+SAMPLES_TOTAL = metrics.counter("iot_samples_total", "Samples read and decoded.", ("machine",))
+STATUS_WRITE_QUEUE_DEPTH = metrics.gauge("iot_status_write_queue_depth", "Machines with a pending status sample for the status log writer.")
+SHIFT_CALC_CYCLE_SECONDS = metrics.histogram("iot_shift_calc_cycle_seconds", "Duration of one shift calculation cycle (all machines).")
+PROGRAM_CYCLE_DETECTION_SECONDS = metrics.histogram("iot_program_cycle_detection_seconds", "Duration of program cycle detection from status logs.", ("machine",))
+
+# Log per poll (data mentah/terproses) disampling per mesin agar tidak membanjiri log dan thread polling
+POLL_LOG_SAMPLER = LogSampler()
 
 # --- Fungsi untuk Memuat Konfigurasi ---
 def load_machine_configs(filepath):
@@ -241,21 +257,24 @@ def poll_machine_thread_target(client_instance, interval, stop_event):
 
         # Polling loop
         try:
-            raw_data = client_instance.read_all_variables()
+            with OPC_READ_SECONDS.time(machine=client_instance.machine_name):
+                raw_data = client_instance.read_all_variables()
 
             if raw_data is not None:
-                logger.info(f"[{client_instance.machine_name}] Raw Data: {raw_data}")
+                POLL_LOG_SAMPLER.log(logger, logging.INFO, client_instance.machine_name, "[%s] Raw Data: %s", client_instance.machine_name, raw_data)
 
-                processed_data = data_processor.process_opcua_data(
-                    client_instance.machine_name, raw_data
-                )
-                logger.info(f"[{client_instance.machine_name}] Processed Data: {processed_data}")
+                with DECODE_SECONDS.time(machine=client_instance.machine_name):
+                    processed_data = data_processor.process_opcua_data(
+                        client_instance.machine_name, raw_data
+                    )
+                SAMPLES_TOTAL.inc(machine=client_instance.machine_name)
+                POLL_LOG_SAMPLER.log(logger, logging.INFO, client_instance.machine_name, "[%s] Processed Data: %s", client_instance.machine_name, processed_data)
 
-                with data_lock:
+                with metrics.timed_lock(data_lock, "data_lock"):
                     latest_machine_data[client_instance.machine_name] = processed_data
 
                 # Store latest status for DB writing
-                with latest_status_for_db_write_lock:
+                with metrics.timed_lock(latest_status_for_db_write_lock, "latest_status_for_db_write_lock"):
                     current_timestamp = time.time()
                     status_text = processed_data.get("Status_Text", "N/A")
                     spindle_speed = processed_data.get("Spindle_Speed")
@@ -269,16 +288,21 @@ def poll_machine_thread_target(client_instance, interval, stop_event):
                         "feed_rate": feed_rate,
                         "current_program": current_program 
                     }
-                    logger.debug(f"[{client_instance.machine_name}] Latest status for DB write updated with program: {current_program}.")
+                    logger.debug("[%s] Latest status for DB write updated with program: %s.", client_instance.machine_name, current_program)
             else:
-                logger.warning(
-                    f"[{client_instance.machine_name}] No raw data received. `latest_machine_data` not updated. Disconnecting to force reconnect."
+                OPC_READ_FAILURES.inc(machine=client_instance.machine_name)
+                POLL_LOG_SAMPLER.log(
+                    logger, logging.WARNING, client_instance.machine_name,
+                    "[%s] No raw data received. `latest_machine_data` not updated. Disconnecting to force reconnect.",
+                    client_instance.machine_name,
                 )
                 client_instance.disconnect()
-                
+
+            metrics.heartbeat(f"poll:{client_instance.machine_name}")
             stop_event.wait(interval)
 
         except Exception as e:
+            OPC_READ_FAILURES.inc(machine=client_instance.machine_name)
             logger.critical(
                 f"[{client_instance.machine_name}] An error occurred during polling/processing: {e}",
                 exc_info=True,
@@ -293,26 +317,47 @@ def poll_machine_thread_target(client_instance, interval, stop_event):
     logger.info(f"[{client_instance.machine_name}] Thread terminated gracefully.")
 
 
-def json_writer_thread_target(json_filepath, lock, stop_event, data_source):
+def write_json_export(json_filepath, data_to_write):
+    """
+    Menulis ekspor JSON secara atomik (file sementara lalu os.replace),
+    sehingga pembaca tidak pernah melihat file yang terpotong.
+    """
+    tmp_filepath = f"{json_filepath}.tmp"
+    with open(tmp_filepath, "w") as f:
+        json.dump(data_to_write, f, default=str)
+    os.replace(tmp_filepath, json_filepath)
+
+
+def snapshot_writer_thread_target(snapshot_filepath, slot_count, lock, stop_event, data_source, json_export_filepath=None):
     """
-    Thread target to periodically write aggregated machine data to a JSON file.
+    Thread target to periodically publish the latest machine data as a memory-mapped live snapshot.
+    Optionally also exports the same data as a JSON file.
     """
-    logger.info(f"Starting JSON writer thread, writing to {json_filepath}")
+    logger.info(f"Starting live snapshot writer thread, writing to {snapshot_filepath}")
+    try:
+        snapshot_writer = LiveSnapshotWriter(snapshot_filepath, slot_count)
+    except (OSError, ValueError) as e:
+        logger.critical(f"Cannot open live snapshot file {snapshot_filepath}: {e}", exc_info=True)
+        return
+
+    last_exported = None
     while not stop_event.is_set():
         try:
             with lock:
-                data_to_write = data_source.copy()
+                data_to_write = {name: dict(data) for name, data in data_source.items()}
 
-            with open(json_filepath, "w") as f:
-                json.dump(data_to_write, f, indent=4)
-            logger.debug(
-                f"Successfully wrote data to {json_filepath}. Data keys: {data_to_write.keys()}"
-            )
+            seq = snapshot_writer.write(data_to_write)
+            logger.debug(f"Published live snapshot seq={seq} for {len(data_to_write)} machines.")
+
+            if json_export_filepath and data_to_write != last_exported:
+                write_json_export(json_export_filepath, data_to_write)
+                last_exported = data_to_write
         except Exception as e:
-            logger.error(f"Error writing to JSON file {json_filepath}: {e}")
+            logger.error(f"Error publishing live snapshot: {e}")
 
         stop_event.wait(1)
-    logger.info("JSON writer thread stopped.")
+    snapshot_writer.close()
+    logger.info("Live snapshot writer thread stopped.")
 
 
 def db_writer_status_logs_thread_target(interval, stop_event, latest_status_data_ref, latest_status_data_lock_ref):
@@ -320,34 +365,95 @@ def db_writer_status_logs_thread_target(interval, stop_event, latest_status_data
     NEW: Thread target to periodically save the latest machine status to the database.
     """
     logger.info(f"Starting DB writer thread for status logs, saving every {interval} seconds.")
+    last_write_stats_log = time.time()
+    # Status/program terakhir yang ditulis per mesin; dashboard hanya diberi tahu jika ada yang berubah
+    last_written_states = {}
+    status_changed = False
+    last_notify = 0.0
+    # Rentang timestamp log yang ditulis sejak NOTIFY terakhir; hanya cache dashboard untuk rentang ini yang dibuang
+    written_range = None
     while not stop_event.is_set():
         current_time = datetime.datetime.now()
         table_name = get_status_log_table_name(current_time)
         
+        # Hanya lookup registry skema; DDL dijalankan sekali per tabel per proses
         create_status_log_table(table_name)
 
-        with latest_status_data_lock_ref:
-            for machine_name, status_info in latest_status_data_ref.items():
-                try:
-                    program_to_save = status_info.get("current_program", None)
+        # Salin di bawah lock, tulis ke DB di luar lock agar thread polling tidak ikut menunggu DB
+        with metrics.timed_lock(latest_status_data_lock_ref, "latest_status_for_db_write_lock"):
+            status_snapshot = {name: dict(info) for name, info in latest_status_data_ref.items()}
+        STATUS_WRITE_QUEUE_DEPTH.set(len(status_snapshot))
+
+        for machine_name, status_info in status_snapshot.items():
+            try:
+                program_to_save = status_info.get("current_program", None)
                     
-                    save_status_log(
-                        machine_name=machine_name,
-                        timestamp=status_info["timestamp"],
-                        status_text=status_info["status_text"],
-                        spindle_speed=status_info["spindle_speed"],
-                        feed_rate=status_info["feed_rate"],
-                        current_program=program_to_save, 
-                        table_name=table_name 
+                saved = save_status_log(
+                    machine_name=machine_name,
+                    timestamp=status_info["timestamp"],
+                    status_text=status_info["status_text"],
+                    spindle_speed=status_info["spindle_speed"],
+                    feed_rate=status_info["feed_rate"],
+                    current_program=program_to_save, 
+                    table_name=table_name 
+                )
+                if saved:
+                    written_range = (
+                        (status_info["timestamp"], status_info["timestamp"]) if written_range is None
+                        else (min(written_range[0], status_info["timestamp"]), max(written_range[1], status_info["timestamp"]))
                     )
-                    logger.debug(f"[DB-Writer-Status-Logs-Thread] Saved log for {machine_name} at {datetime.datetime.fromtimestamp(status_info['timestamp'])} with program: {program_to_save}")
-                except Exception as e:
-                    logger.error(f"[DB-Writer-Status-Logs-Thread] Error saving log for {machine_name}: {e}")
-            
+                written_state = (status_info["status_text"], program_to_save)
+                if saved and last_written_states.get(machine_name) != written_state:
+                    last_written_states[machine_name] = written_state
+                    status_changed = True
+                logger.debug(f"[DB-Writer-Status-Logs-Thread] Saved log for {machine_name} at {datetime.datetime.fromtimestamp(status_info['timestamp'])} with program: {program_to_save}")
+            except Exception as e:
+                logger.error(f"[DB-Writer-Status-Logs-Thread] Error saving log for {machine_name}: {e}")
+
+        # Tulisan dengan status yang sama tidak mengubah tampilan dashboard; perubahan digabung per interval
+        if status_changed and time.monotonic() - last_notify >= STATUS_LOG_NOTIFY_MIN_SECONDS:
+            notify_change(TOPIC_STATUS_LOGS, time_range=written_range)
+            status_changed = False
+            written_range = None
+            last_notify = time.monotonic()
+
+        # Ringkasan durasi penulisan DB (termasuk menunggu lock) secara berkala
+        if time.time() - last_write_stats_log >= 600:
+            last_write_stats_log = time.time()
+            for operation, stats in sorted(get_db_write_stats().items()):
+                logger.info(
+                    f"[DB-Write-Stats] {operation}: count={stats['count']}, avg={stats['avg_seconds']:.3f}s, "
+                    f"max={stats['max_seconds']:.3f}s, slow={stats['slow']}"
+                )
+            for operation, stats in sorted(get_bulk_write_stats().items()):
+                logger.info(
+                    f"[DB-Bulk-Write-Stats] {operation}: calls={stats['calls']}, rows={stats['rows']}, pages={stats['pages']}, "
+                    f"duplicates_dropped={stats['duplicates_dropped']}, rows_per_second={stats['rows_per_second']:.0f}"
+                )
+            for role, stats in sorted(get_db_pool_stats().items()):
+                logger.info(
+                    f"[DB-Pool-Stats] {role}: in_use={stats['in_use']}/{stats['maxconn']}, peak={stats['max_in_use']}, "
+                    f"checkouts={stats['checkouts']}, avg_wait={stats['avg_wait_seconds']:.3f}s, "
+                    f"max_wait={stats['max_wait_seconds']:.3f}s, timeouts={stats['timeouts']}, replaced={stats['replaced']}"
+                )
+
+        metrics.heartbeat("db_writer_status_logs")
         stop_event.wait(interval)
     logger.info("DB writer thread for status logs stopped.")
 
 
+def metrics_summary_thread_target(interval, stop_event):
+    """
+    Thread target to periodically log a summary of the internal metrics (latencies, rates, queue depths, lock times).
+    """
+    while not stop_event.wait(interval):
+        try:
+            metrics.log_summary()
+        except Exception as e:
+            logger.error(f"Error logging metrics summary: {e}")
+    logger.info("Metrics summary thread stopped.")
+
+
 def shift_calculation_thread_target(
     interval,
     stop_event,
@@ -355,14 +461,20 @@ def shift_calculation_thread_target(
     data_lock_ref,
     machine_shift_metrics_ref,
     shift_metrics_lock_ref,
-    shifts_saved_to_db_ref,
-    shifts_saved_to_db_lock_ref,
 ):
     """
     Thread target to periodically calculate shift metrics for all machines.
     Also saves current shift metrics to DB and checks for completed shifts to save to final DB.
     """
     logger.debug("--- Inside shift_calculation_thread_target function. Starting initial checks. ---")
+    # Thread ini membaca log status dalam jumlah besar; pakai pool analytics agar tidak menahan koneksi ingestion
+    set_db_role(DB_ROLE_ANALYTICS)
+
+    # Ringkasan siklus program terakhir per mesin, untuk mendeteksi apakah laporan program berubah
+    last_program_cycle_signature = {}
+    last_alias_compaction = time.monotonic()
+    # Finalisasi shift berdasarkan watermark per mesin di DB; shift yang terlewat saat aplikasi mati dikejar di siklus pertama
+    shift_finalizer = shift_calculator.ShiftFinalizer()
     
     # PERBAIKAN: Memindahkan definisi 'now' ke dalam try-while loop
     # agar selalu didefinisikan dengan scope yang benar di setiap iterasi.
@@ -370,10 +482,16 @@ def shift_calculation_thread_target(
         while not stop_event.is_set():
             # DEFINE 'now' DI SINI (SETIAP ITERASI)
             now = datetime.datetime.now(timezone.utc) 
+            cycle_started = time.perf_counter()
             
-            # Mendapatkan nama tabel program report bulanan dan memastikan tabelnya ada
-            current_month_program_report_table = get_program_report_table_name(now)
-            create_program_report_table_monthly(current_month_program_report_table)
+            # Memastikan tabel bulan ini dan bulan depan sudah ada (setelah terverifikasi tanpa DDL)
+            if not precreate_next_month_tables(now):
+                logger.warning("[Shift-Calc-Thread] Some monthly tables could not be verified/created. Will retry next cycle.")
+
+            # Rename program disimpan sebagai alias; sesekali diterapkan permanen ke tabel laporan
+            if PROGRAM_ALIAS_COMPACT_INTERVAL_SECONDS and time.monotonic() - last_alias_compaction >= PROGRAM_ALIAS_COMPACT_INTERVAL_SECONDS:
+                last_alias_compaction = time.monotonic()
+                compact_program_aliases()
 
             logger.info("[Shift-Calc-Thread] Performing shift calculations and DB write check...")
 
@@ -386,98 +504,108 @@ def shift_calculation_thread_target(
             }
             logger.info(f"Calculating shift metrics for shifts: {list(shifts_to_calculate.keys())}")
 
-            with shift_metrics_lock_ref:
-                with data_lock_ref:
-                    logger.debug(f"DEBUG: Machines being processed in shift calculation: {list(latest_machine_data_ref.keys())}")
+            # Daftar mesin disalin di bawah data_lock lalu lock dilepas: pembacaan log dari DB di bawah ini
+            # tidak boleh membuat thread polling (yang juga memakai data_lock) ikut menunggu DB
+            with metrics.timed_lock(data_lock_ref, "data_lock"):
+                machine_names = list(latest_machine_data_ref.keys())
+            logger.debug(f"DEBUG: Machines being processed in shift calculation: {machine_names}")
 
-                    for machine_name in latest_machine_data_ref.keys():
-                        overall_log_start_dt = min(current_shift_start_utc, prev_shift_start_utc)
-                        overall_log_end_dt = max(current_shift_end_utc, now) 
-                        
-                        all_relevant_status_logs = get_status_logs_for_machine(machine_name, overall_log_start_dt, overall_log_end_dt)
-                        all_relevant_status_logs.sort(key=lambda x: x['timestamp'])
-                        logger.debug(f"Processing shift metrics for machine: {machine_name} with {len(all_relevant_status_logs)} log entries from DB.")
-                        
-                        if machine_name not in machine_shift_metrics_ref:
-                            machine_shift_metrics_ref[machine_name] = {}
+            shift_metrics_rows = []
+            computed_shift_metrics = {}
+            for machine_name in machine_names:
+                overall_log_start_dt = min(current_shift_start_utc, prev_shift_start_utc)
+                overall_log_end_dt = max(current_shift_end_utc, now) 
 
-                        for shift_name, (shift_start_dt, shift_end_dt) in shifts_to_calculate.items():
-                            runtime_sec, idletime_sec = shift_calculator.calculate_runtime_idletime(
-                                all_relevant_status_logs, shift_start_dt, shift_end_dt
-                            )
-                            
-                            total_elapsed_time_in_shift_seconds = (min(now, shift_end_dt) - shift_start_dt).total_seconds()
-                            total_elapsed_time_in_shift_seconds = max(0.0, total_elapsed_time_in_shift_seconds)
-                            accounted_time_seconds = runtime_sec + idletime_sec
-                            other_time_sec = max(0.0, total_elapsed_time_in_shift_seconds - accounted_time_seconds)
-
-                            machine_shift_metrics_ref[machine_name][shift_name] = {
-                                "runtime_hhmm": shift_calculator.format_seconds_to_hhmm(runtime_sec),
-                                "idletime_hhmm": shift_calculator.format_seconds_to_hhmm(idletime_sec),
-                                "runtime_seconds": round(runtime_sec, 2),
-                                "idletime_seconds": round(idletime_sec, 2),
-                                "other_time_seconds": round(other_time_sec, 2),
-                                "shift_start": shift_start_dt.isoformat(),
-                                "shift_end": shift_end_dt.isoformat(),
-                            }
-                            logger.debug(
-                                f"  Machine {machine_name}, Shift {shift_name}: Runtime={runtime_sec:.2f}s, Idletime={idletime_sec:.2f}s, Other Time={other_time_sec:.2f}s"
-                            )
-
-                            current_shift_metrics_table = get_shift_metrics_table_name(shift_start_dt)
-                            save_shift_metrics(
-                                machine_name=machine_name,
-                                shift_name=shift_name,
-                                runtime_sec=runtime_sec,
-                                idletime_sec=idletime_sec,
-                                other_time_sec=other_time_sec,
-                                shift_start_time=shift_start_dt,
-                                shift_end_time=shift_end_dt,
-                                table_name=current_shift_metrics_table
-                            )
-                            logger.debug(f"[DB-Writer-Shift-Metrics-Realtime] Saved real-time metrics for {machine_name} - {shift_name}")
-
-                # --- Check and save completed shifts to final DB table ---
-                logger.debug("[Shift-Calc-Thread] Checking for completed shifts to save to final table.")
-                with shifts_saved_to_db_lock_ref:
-                    try:
-                        messages, _ = check_and_save_completed_shifts(
-                            shift_metrics_data=machine_shift_metrics_ref,
-                            current_time=now, # Menggunakan 'now' yang baru didefinisikan
-                            shifts_saved_to_db_lock=shifts_saved_to_db_lock_ref,
-                            shifts_saved_state=shifts_saved_to_db_ref,
-                            shift_metrics_lock=shift_metrics_lock_ref
-                        )
-                        for msg in messages:
-                            logger.info(msg)
-                        logger.debug("[Shift-Calc-Thread] Finished checking for completed shifts.")
-                    except Exception as e:
-                        logger.critical(f"[Shift-Calc-Thread] CRITICAL ERROR checking/saving completed shifts: {e}", exc_info=True)
-
-                # --- Proses dan Simpan Laporan Program ke DB ---
-                report_start_dt_utc = (now - datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0) # Menggunakan 'now'
-                report_end_dt_utc = now.replace(hour=23, minute=59, second=59, microsecond=999999) # Menggunakan 'now'
-
-                for machine_name in latest_machine_data_ref.keys():
-                    logger.debug(f"[Shift-Calc-Thread] Processing program cycles for {machine_name} from {report_start_dt_utc.date()} to {report_end_dt_utc.date()}.")
-                    
-                    logs_for_program_processing = get_status_logs_for_machine(
-                        machine_name,
-                        report_start_dt_utc,
-                        report_end_dt_utc
+                all_relevant_status_logs = get_status_logs_for_machine(machine_name, overall_log_start_dt, overall_log_end_dt)
+                all_relevant_status_logs.sort(key=lambda x: x['timestamp'])
+                logger.debug(f"Processing shift metrics for machine: {machine_name} with {len(all_relevant_status_logs)} log entries from DB.")
+
+                computed_shift_metrics[machine_name] = {}
+
+                for shift_name, (shift_start_dt, shift_end_dt) in shifts_to_calculate.items():
+                    runtime_sec, idletime_sec = shift_calculator.calculate_runtime_idletime(
+                        all_relevant_status_logs, shift_start_dt, shift_end_dt
+                    )
+
+                    total_elapsed_time_in_shift_seconds = (min(now, shift_end_dt) - shift_start_dt).total_seconds()
+                    total_elapsed_time_in_shift_seconds = max(0.0, total_elapsed_time_in_shift_seconds)
+                    accounted_time_seconds = runtime_sec + idletime_sec
+                    other_time_sec = max(0.0, total_elapsed_time_in_shift_seconds - accounted_time_seconds)
+
+                    computed_shift_metrics[machine_name][shift_name] = {
+                        "runtime_hhmm": shift_calculator.format_seconds_to_hhmm(runtime_sec),
+                        "idletime_hhmm": shift_calculator.format_seconds_to_hhmm(idletime_sec),
+                        "runtime_seconds": round(runtime_sec, 2),
+                        "idletime_seconds": round(idletime_sec, 2),
+                        "other_time_seconds": round(other_time_sec, 2),
+                        "shift_start": shift_start_dt.isoformat(),
+                        "shift_end": shift_end_dt.isoformat(),
+                    }
+                    logger.debug(
+                        f"  Machine {machine_name}, Shift {shift_name}: Runtime={runtime_sec:.2f}s, Idletime={idletime_sec:.2f}s, Other Time={other_time_sec:.2f}s"
                     )
 
-                    if logs_for_program_processing:
+                    shift_metrics_rows.append({
+                        "machine_name": machine_name,
+                        "shift_name": shift_name,
+                        "runtime_sec": runtime_sec,
+                        "idletime_sec": idletime_sec,
+                        "other_time_sec": other_time_sec,
+                        "shift_start_time": shift_start_dt,
+                        "shift_end_time": shift_end_dt,
+                    })
+
+            with metrics.timed_lock(shift_metrics_lock_ref, "shift_metrics_lock"):
+                for machine_name, shift_values in computed_shift_metrics.items():
+                    machine_shift_metrics_ref.setdefault(machine_name, {}).update(shift_values)
+
+            # Semua mesin dan kedua shift ditulis dalam satu batch upsert
+            batch_stats = save_shift_metrics_batch(shift_metrics_rows)
+            if batch_stats["written"]:
+                notify_change(TOPIC_SHIFT_METRICS)
+            total_stats = get_shift_metrics_write_stats()
+            logger.info(
+                f"[DB-Writer-Shift-Metrics-Realtime] Batch: {batch_stats['written']} written, {batch_stats['skipped']} skipped. "
+                f"Since start: {total_stats['written']}/{total_stats['submitted']} rows written, {total_stats['skipped']} writes saved."
+            )
+
+            # --- Proses dan Simpan Laporan Program ke DB ---
+            report_start_dt_utc = (now - datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0) # Menggunakan 'now'
+            report_end_dt_utc = now.replace(hour=23, minute=59, second=59, microsecond=999999) # Menggunakan 'now'
+
+            for machine_name in machine_names:
+                logger.debug(f"[Shift-Calc-Thread] Processing program cycles for {machine_name} from {report_start_dt_utc.date()} to {report_end_dt_utc.date()}.")
+
+                logs_for_program_processing = get_status_logs_for_machine(
+                    machine_name,
+                    report_start_dt_utc,
+                    report_end_dt_utc
+                )
+
+                if logs_for_program_processing:
+                    with PROGRAM_CYCLE_DETECTION_SECONDS.time(machine=machine_name):
                         program_cycles = program_processor.process_program_cycles_from_logs(machine_name, logs_for_program_processing)
-                        
-                        if program_cycles:
-                            with db_write_lock: 
-                                save_program_cycles_to_db(program_cycles)
-                        else:
-                            logger.debug(f"[Shift-Calc-Thread] No complete program cycles detected for {machine_name} in the current period.")
+
+                    if program_cycles:
+                        saved_cycles = save_program_cycles_to_db(program_cycles)
+                        cycle_signature = (len(program_cycles), program_cycles[-1]['nama_program'], program_cycles[-1]['waktu_selesai'])
+                        if saved_cycles and last_program_cycle_signature.get(machine_name) != cycle_signature:
+                            last_program_cycle_signature[machine_name] = cycle_signature
+                            notify_change(TOPIC_PROGRAM_REPORT)
                     else:
-                        logger.debug(f"[Shift-Calc-Thread] No status logs available for {machine_name} in the current period for program report processing.")
+                        logger.debug(f"[Shift-Calc-Thread] No complete program cycles detected for {machine_name} in the current period.")
+                else:
+                    logger.debug(f"[Shift-Calc-Thread] No status logs available for {machine_name} in the current period for program report processing.")
 
+            # --- Simpan shift yang sudah selesai ke tabel final (berdasarkan watermark di DB) ---
+            try:
+                for msg in shift_finalizer.run(now, machine_names):
+                    logger.info(msg)
+            except Exception as e:
+                logger.critical(f"[Shift-Calc-Thread] CRITICAL ERROR checking/saving completed shifts: {e}", exc_info=True)
+
+            SHIFT_CALC_CYCLE_SECONDS.observe(time.perf_counter() - cycle_started)
+            metrics.heartbeat("shift_calc")
             stop_event.wait(interval)
             
     except Exception as e: 
@@ -488,13 +616,12 @@ def main():
     """
     Main function to run the application.
     """
-    CONFIG_FILE = "machines_config.json"
     POLLING_INTERVAL_SECONDS = 1
     SHIFT_CALC_INTERVAL_SECONDS = 5
     
     logger.info("--- Starting Multi-Machine OPC UA Client ---")
 
-    all_machine_configs, url, user, password = load_machine_configs(f"app_core/{CONFIG_FILE}")
+    all_machine_configs, url, user, password = load_machine_configs(MACHINES_CONFIG_FILE)
 
     if not all_machine_configs:
         logger.error("No machine configurations loaded or found in 'machines' key. Exiting.")
@@ -513,6 +640,7 @@ def main():
     # --- PERBAIKAN PENTING: Inisialisasi koneksi DB di sini ---
     logger.info("Attempting to initialize database connection pool...")
     try:
+        set_default_db_role(DB_ROLE_INGESTION)
         init_db_pool() # Panggil fungsi ini untuk inisialisasi pool
         logger.info("Successfully initialized database connection pool.")
     except Exception as e:
@@ -576,15 +704,22 @@ def main():
         logger.error("No valid machine configurations found or clients could be initialized. Exiting.")
         exit()
 
-    json_writer_stop_event_latest_data = threading.Event()
-    json_writer_thread_latest_data = threading.Thread(
-        target=json_writer_thread_target,
-        args=(DATA_FILE, data_lock, json_writer_stop_event_latest_data, latest_machine_data),
-        name="JSON-Writer-Latest-Data-Thread",
+    snapshot_writer_stop_event = threading.Event()
+    snapshot_writer_thread = threading.Thread(
+        target=snapshot_writer_thread_target,
+        args=(
+            LIVE_SNAPSHOT_FILE,
+            len(opc_clients),
+            data_lock,
+            snapshot_writer_stop_event,
+            latest_machine_data,
+            DATA_FILE if EXPORT_MACHINE_DATA_JSON else None,
+        ),
+        name="Live-Snapshot-Writer-Thread",
     )
-    json_writer_thread_latest_data.daemon = True
-    json_writer_thread_latest_data.start()
-    stop_events.append(json_writer_stop_event_latest_data)
+    snapshot_writer_thread.daemon = True
+    snapshot_writer_thread.start()
+    stop_events.append(snapshot_writer_stop_event)
 
     db_writer_status_logs_stop_event = threading.Event()
     db_writer_status_logs_thread = threading.Thread(
@@ -612,8 +747,6 @@ def main():
             data_lock,
             machine_shift_metrics,
             shift_metrics_lock,
-            shifts_saved_to_db,
-            shifts_saved_to_db_lock,
         ),
         name="Shift-Calc-Thread"
     )
@@ -622,6 +755,34 @@ def main():
     shift_calc_thread.start()
     stop_events.append(shift_calc_stop_event)
 
+    if METRICS_SUMMARY_INTERVAL_SECONDS:
+        metrics_summary_stop_event = threading.Event()
+        metrics_summary_thread = threading.Thread(
+            target=metrics_summary_thread_target,
+            args=(METRICS_SUMMARY_INTERVAL_SECONDS, metrics_summary_stop_event),
+            name="Metrics-Summary-Thread",
+        )
+        metrics_summary_thread.daemon = True
+        metrics_summary_thread.start()
+        stop_events.append(metrics_summary_stop_event)
+
+    live_api_server = None
+    if LIVE_API_ENABLED:
+        live_data_hub = LiveDataHub(latest_machine_data, data_lock, machine_shift_metrics, shift_metrics_lock)
+        live_hub_stop_event = threading.Event()
+        live_hub_thread = threading.Thread(
+            target=live_data_hub.run_publisher,
+            args=(live_hub_stop_event, LIVE_API_PUBLISH_INTERVAL_SECONDS),
+            name="Live-Data-Hub-Thread",
+        )
+        live_hub_thread.daemon = True
+        live_hub_thread.start()
+        stop_events.append(live_hub_stop_event)
+        try:
+            live_api_server = start_live_api_server(live_data_hub, LIVE_API_HOST, LIVE_API_PORT)
+        except OSError as e:
+            logger.error(f"Could not start live data API on {LIVE_API_HOST}:{LIVE_API_PORT}: {e}")
+
     logger.info(f"\nStarting {len(threads)} machine polling threads...")
     for thread in threads:
         thread.start()
@@ -635,6 +796,8 @@ def main():
         logger.info("\nKeyboardInterrupt detected. Signaling client threads to shut down.")
         for event in stop_events:
             event.set()
+        if live_api_server:
+            live_api_server.shutdown()
         for thread in threads:
             thread.join(timeout=5)
             if thread.is_alive():
@@ -643,6 +806,7 @@ def main():
         logger.critical(f"An unexpected error occurred in the main program: {e}", exc_info=True)
     finally:
         logger.info("Main program finished. All client connections should be closed.")
+        stop_logging()
 
 
 # --- Main Program ---
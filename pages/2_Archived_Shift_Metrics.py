@@ -16,6 +16,8 @@ logger.setLevel(logging.DEBUG)
 # Pastikan path ke db_manager dan config sudah benar
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from app_core.db_manager import get_shift_metrics_from_db
+from app_core.change_notifier import TOPIC_SHIFT_METRICS
+from app_core.query_cache import cached_query
 from app_core.config import SHIFTS, MACHINE_DISPLAY_ORDER
 
 # Konfigurasi halaman
@@ -24,7 +26,7 @@ st.set_page_config(layout="wide")
 st.title("Archived Shift Metrics") # Judul yang diperbarui untuk kejelasan
 
 # Fungsi untuk mengambil metrik shift final dari database
-@st.cache_data(ttl=60)
+@cached_query(ttl=60, topics=[TOPIC_SHIFT_METRICS])
 def fetch_final_shift_metrics(machine_name, start_date, end_date):
     """Mengambil metrik shift final dari database."""
     logger.debug(f"[FinalShiftMetricsPage] Fetching final metrics for machine={machine_name}, start_date={start_date}, end_date={end_date}")
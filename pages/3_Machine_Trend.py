@@ -5,31 +5,49 @@ import pandas as pd
 import datetime
 import plotly.express as px
 import plotly.graph_objects as go
+import logging
 from app_core.db_manager import (
-    get_status_logs_for_machine,
+    get_status_counts_by_bucket,
+    get_status_trend_downsampled,
+    init_db_pool,
     # get_status_log_table_name, # Tidak lagi diperlukan di sini karena ditangani di dalam fungsi
     get_final_shift_metrics_table_name, # Tetap dibutuhkan untuk nama tabel jika ada fungsi lain yang menggunakannya
     get_shift_metrics_from_db # Mengimpor fungsi umum
 )
-from app_core.config import SHIFTS # Import SHIFTS dari config.py
+from app_core.config import SHIFTS, TREND_CHART_WIDTH_PX # Import SHIFTS dari config.py
+from app_core.change_notifier import TOPIC_STATUS_LOGS
+from app_core.query_cache import cached_query
 
 # Konfigurasi halaman
 st.set_page_config(layout="wide")
 
+# --- Inisialisasi DB Pool untuk aplikasi Streamlit ini ---
+try:
+    init_db_pool()
+except Exception as e:
+    logging.critical(f"Critical error during Streamlit DB pool initialization: {e}", exc_info=True)
+    st.error(f"Critical error during database connection: {e}")
+    st.stop()
+
 st.title("Machine Trend")
 
-# Fungsi untuk mengambil data log status dari database
-@st.cache_data(ttl=60) # Cache data selama 60 detik
-def fetch_status_logs(machine_name, start_date, end_date):
-    """Mengambil log status dari database untuk mesin dan rentang tanggal tertentu."""
-    # 16/7/25 --------
-    # Panggil get_status_logs_for_machine hanya dengan 3 argumen yang diharapkan
-    # Ini akan mengambil log dari SEMUA tabel bulanan yang relevan dalam rentang start_date hingga end_date
+# Fungsi untuk mengambil jumlah log per status dari database
+@cached_query(ttl=60, topics=[TOPIC_STATUS_LOGS], time_range=("start_date", "end_date")) # Cache data selama 60 detik
+def fetch_status_counts(machine_name, start_date, end_date, bucket):
+    """Mengambil jumlah log per status per jam/hari (dihitung di database) untuk mesin dan rentang tanggal tertentu."""
+    # Mencakup SEMUA tabel bulanan yang relevan dalam rentang start_date hingga end_date
+    start_dt_obj = datetime.datetime.combine(start_date, datetime.time.min)
+    end_dt_obj = datetime.datetime.combine(end_date, datetime.time.max)
+    counts = get_status_counts_by_bucket(machine_name, start_dt_obj, end_dt_obj, bucket=bucket)
+    return pd.DataFrame(counts)
+
+@cached_query(ttl=60, topics=[TOPIC_STATUS_LOGS], time_range=("start_date", "end_date"))
+def fetch_trend_points(machine_name, start_date, end_date, max_points):
+    """Mengambil tren spindle/feedrate yang sudah di-downsample (min/max per bucket) dari database."""
     start_dt_obj = datetime.datetime.combine(start_date, datetime.time.min)
     end_dt_obj = datetime.datetime.combine(end_date, datetime.time.max)
-    logs = get_status_logs_for_machine(machine_name, start_dt_obj, end_dt_obj)
-    return pd.DataFrame(logs)
-    # ----------------
+    trend = get_status_trend_downsampled(machine_name, start_dt_obj, end_dt_obj, max_points=max_points)
+    return pd.DataFrame(trend["points"]), trend["raw_count"]
 
 # Pilihan mesin
 # Anda perlu mendapatkan daftar mesin yang tersedia dari suatu tempat, misalnya dari konfigurasi atau DB
@@ -49,39 +67,39 @@ date_range = st.sidebar.date_input(
 start_date = date_range[0]
 end_date = date_range[1]
 
-# Ambil data log status
-df_status_logs = fetch_status_logs(selected_machine, start_date, end_date)
+# Pilihan granularitas
+time_granularity = st.sidebar.selectbox(
+    "Granularitas Waktu",
+    ["Per Hour", "Per Day", "Per Shift"]
+)
 
-if not df_status_logs.empty:
-    df_status_logs['timestamp'] = pd.to_datetime(df_status_logs['timestamp'], unit='s')
-    df_status_logs = df_status_logs.set_index('timestamp').sort_index()
+# Lebar grafik tren menentukan jumlah titik yang diambil (sekitar 2 titik min/max per piksel).
+# Streamlit tidak memberi tahu lebar grafik sebenarnya, jadi defaultnya TREND_CHART_WIDTH_PX dari config.
+trend_chart_width_px = st.sidebar.number_input(
+    "Resolusi Grafik Tren (piksel)",
+    min_value=200, max_value=8000, value=TREND_CHART_WIDTH_PX, step=100
+)
 
-    st.subheader(f"Machine Status Trend for {selected_machine}")
+# "Per Shift" belum didukung untuk log status dan ditampilkan per hari
+bucket = "hour" if time_granularity == "Per Hour" else "day"
 
-    # Pilihan granularitas
-    time_granularity = st.sidebar.selectbox(
-        "Granularitas Waktu",
-        ["Per Hour", "Per Day", "Per Shift"]
-    )
+# Ambil jumlah log per status (sudah diagregasi di database, tanpa memuat baris log mentah)
+df_status_counts = fetch_status_counts(selected_machine, start_date, end_date, bucket)
 
-    if time_granularity == "Per Hour":
-        rule = "h" # Menggunakan 'h' untuk jam (sesuai saran FutureWarning)
-    elif time_granularity == "Per Day":
-        rule = "D"
-    else: # Per Shift
-        # Untuk "Per Shift", kita perlu logika yang lebih kompleks atau menggunakan data metrik shift
-        st.warning("Fungsionalitas 'Per Shift' belum sepenuhnya diimplementasikan untuk visualisasi status log. Menampilkan 'Per Hari'.")
-        rule = "D"
+if not df_status_counts.empty:
+    df_status_counts['timestamp'] = pd.to_datetime(df_status_counts['timestamp'], unit='s')
 
-    # NEW 16/7/25: Revised approach for status aggregation
-    df_status_logs['status_count'] = 1 # Helper column for counting
+    st.subheader(f"Machine Status Trend for {selected_machine}")
 
-    df_grouped_status = df_status_logs.groupby([pd.Grouper(freq=rule), 'status_text'])['status_count'].sum().reset_index()
+    if time_granularity == "Per Shift":
+        # Untuk "Per Shift", kita perlu logika yang lebih kompleks atau menggunakan data metrik shift
+        st.warning("Fungsionalitas 'Per Shift' belum sepenuhnya diimplementasikan untuk visualisasi status log. Menampilkan 'Per Hari'.")
 
-    df_pivot_status = df_grouped_status.pivot_table(
+    df_pivot_status = df_status_counts.pivot_table(
         index='timestamp',
         columns='status_text',
-        values='status_count'
+        values='count',
+        aggfunc='sum'
     ).fillna(0).reset_index()
 
     df_plot_status = df_pivot_status.melt(
@@ -134,23 +152,36 @@ if not df_status_logs.empty:
     # Tren Spindle Speed dan Feed Rate
     st.subheader(f"Trends in Spindle Speed and Feedrate for {selected_machine}")
     
-    # Filter data yang memiliki nilai spindle_speed atau feed_rate
-    df_numeric_trends = df_status_logs.dropna(subset=['spindle_speed', 'feed_rate'], how='all')
+    # Data tren diambil terpisah dan sudah di-downsample di database (min/max per bucket),
+    # jumlah titik mengikuti resolusi grafik sehingga puncak tetap terlihat.
+    df_trend_points, raw_trend_count = fetch_trend_points(selected_machine, start_date, end_date, 2 * int(trend_chart_width_px))
+    if not df_trend_points.empty:
+        df_trend_points['timestamp'] = pd.to_datetime(df_trend_points['timestamp'], unit='s')
+        df_trend_points = df_trend_points.set_index('timestamp').sort_index()
+        df_numeric_trends = df_trend_points.dropna(subset=['spindle_speed', 'feed_rate'], how='all')
+    else:
+        df_numeric_trends = df_trend_points
 
     if not df_numeric_trends.empty:
+        st.caption(f"Menampilkan {len(df_numeric_trends)} titik (min/max) dari {raw_trend_count} log status.")
         fig_trends = go.Figure()
 
+        # Setiap titik hanya membawa nilai kolom yang ekstremnya terjadi di timestamp itu; garis per kolom
+        # digambar dari titik miliknya saja agar tidak terputus
+        spindle_points = df_numeric_trends['spindle_speed'].dropna()
+        feed_points = df_numeric_trends['feed_rate'].dropna()
+
         fig_trends.add_trace(go.Scatter(
-            x=df_numeric_trends.index,
-            y=df_numeric_trends['spindle_speed'],
+            x=spindle_points.index,
+            y=spindle_points,
             mode='lines',
             name='Spindle Speed',
             line=dict(color='blue')
         ))
 
         fig_trends.add_trace(go.Scatter(
-            x=df_numeric_trends.index,
-            y=df_numeric_trends['feed_rate'],
+            x=feed_points.index,
+            y=feed_points,
             mode='lines',
             name='Feedrate',
             yaxis='y2', # Menggunakan sumbu Y kedua
@@ -5,7 +5,6 @@ import pandas as pd
 import datetime
 import sys
 import os
-import time
 from psycopg2 import sql 
 import logging
 
@@ -20,14 +19,23 @@ from app_core.db_manager import (
     format_seconds_to_hhmmss, 
     get_program_report_from_db, 
     get_program_report_table_name, 
-    init_db_pool, 
+    init_db_pool,
+    set_db_role,
+    DB_ROLE_ANALYTICS,
     db_pool, 
     close_db_connection
 )
+from app_core.change_notifier import live_fragment, TOPIC_PROGRAM_REPORT
+from app_core.query_cache import cached_query
+
+# Laporan digambar ulang hanya jika ada siklus program baru, paling sering sekali per interval ini.
+LIVE_REFRESH_MIN_SECONDS = 60
 
 # --- Inisialisasi DB Pool untuk aplikasi Streamlit ini ---
+# Query laporan di halaman ini memakai pool 'analytics', terpisah dari pool dashboard live
 try:
-    init_db_pool()
+    set_db_role(DB_ROLE_ANALYTICS)
+    init_db_pool(DB_ROLE_ANALYTICS)
     if db_pool is None:
         st.error("ERROR: Database connection pool failed to initialize. Please check database configuration.")
         st.stop()
@@ -123,7 +131,8 @@ selected_main_program_input = st.sidebar.text_input(
 
 
 # --- Load Program Report Data dari DB (dengan caching) ---
-@st.cache_data(ttl=60) # Cache data selama 60 detik
+# Cache bersama lintas sesi; laporan hanya dihitung ulang jika ada siklus baru atau TTL habis.
+@cached_query(ttl=LIVE_REFRESH_MIN_SECONDS, topics=[TOPIC_PROGRAM_REPORT])
 def load_and_process_program_report_data(machine_name, start_date, end_date, main_program_filter):
     """
     Memuat laporan program dari DB dan memprosesnya untuk tampilan, 
@@ -137,10 +146,7 @@ def load_and_process_program_report_data(machine_name, start_date, end_date, mai
     df_report = pd.DataFrame(logs)
     
     if not df_report.empty:
-        #Ekstraksi nama induk
-        df_report['program_main_name'] = df_report['program_name'].apply(
-            lambda x: str(x).split('-')[0].strip() if x and '-' in str(x) else str(x).strip()
-        )
+        # Nama induk (program_main_name) sudah dinormalisasi di tabel dimensi program
 
         # Tambahkan filter untuk mengabaikan program yang tidak diawali dengan 'N'
         df_report = df_report[df_report['program_main_name'].str.startswith('N', na=False)]
@@ -240,105 +246,107 @@ def load_and_process_program_report_data(machine_name, start_date, end_date, mai
 
 
 # --- Main Content ---
-df_main_program_summary, df_subprogram_summary, df_program_report_display = load_and_process_program_report_data(
-    selected_machine, start_date, end_date, selected_main_program_input
-)
-
-st.subheader(f"{selected_machine}")
+def render_program_report():
+    """Bagian live halaman: ringkasan program induk, sub-program dan detail siklus."""
+    df_main_program_summary, df_subprogram_summary, df_program_report_display = load_and_process_program_report_data(
+        selected_machine, start_date, end_date, selected_main_program_input
+    )
 
-# Use a single markdown line to handle both cases for better readability.
-if selected_main_program_input:
-    st.markdown(f"##### Main Program **'{selected_main_program_input}'**")
-else:
-    st.markdown("#### Main Program")
+    st.subheader(f"{selected_machine}")
 
-# Check if the main program summary DataFrame is not empty
-if not df_main_program_summary.empty:
-    # Start with a copy of the full DataFrame
-    filtered_main_program_df = df_main_program_summary.copy()
-
-    # If there's a filter, apply it to the DataFrame
+    # Use a single markdown line to handle both cases for better readability.
     if selected_main_program_input:
-        filtered_main_program_df = filtered_main_program_df[
-            filtered_main_program_df['program_main_name'].str.contains(
-                selected_main_program_input, case=False, na=False
-            )
-        ]
-
-    # Sort the filtered DataFrame. This happens regardless of whether it was filtered or not.
-    filtered_main_program_df = filtered_main_program_df.sort_values(by='start_time', ascending=False)
-    
-    # Check if the filtered/sorted DataFrame is empty
-    if filtered_main_program_df.empty:
-        st.info("No main program summary data matches the filter.")
+        st.markdown(f"##### Main Program **'{selected_main_program_input}'**")
     else:
-        # Select and rename columns for display
-        df_main_program_display = filtered_main_program_df[[
-            'program_main_name', 'start_time', 'end_time', 'duration_total', 
-            'total_processing_time', 'loss_time'
-        ]].rename(columns={
-            'program_main_name': 'Main Program',
-            'start_time': 'Start Time',
-            'end_time': 'End Time',
-            'duration_total': 'Duration',
-            'total_processing_time': 'Cutting Time',
-            'loss_time': 'Loss Time'
-        })
-        st.dataframe(df_main_program_display, use_container_width=True)
-else:
-    # This message is shown only if the initial DataFrame is empty
-    st.info("No main program summary data is available for this machine within the selected date range.")
+        st.markdown("#### Main Program")
+
+    # Check if the main program summary DataFrame is not empty
+    if not df_main_program_summary.empty:
+        # Start with a copy of the full DataFrame
+        filtered_main_program_df = df_main_program_summary.copy()
+
+        # If there's a filter, apply it to the DataFrame
+        if selected_main_program_input:
+            filtered_main_program_df = filtered_main_program_df[
+                filtered_main_program_df['program_main_name'].str.contains(
+                    selected_main_program_input, case=False, na=False
+                )
+            ]
 
+        # Sort the filtered DataFrame. This happens regardless of whether it was filtered or not.
+        filtered_main_program_df = filtered_main_program_df.sort_values(by='start_time', ascending=False)
+
+        # Check if the filtered/sorted DataFrame is empty
+        if filtered_main_program_df.empty:
+            st.info("No main program summary data matches the filter.")
+        else:
+            # Select and rename columns for display
+            df_main_program_display = filtered_main_program_df[[
+                'program_main_name', 'start_time', 'end_time', 'duration_total', 
+                'total_processing_time', 'loss_time'
+            ]].rename(columns={
+                'program_main_name': 'Main Program',
+                'start_time': 'Start Time',
+                'end_time': 'End Time',
+                'duration_total': 'Duration',
+                'total_processing_time': 'Cutting Time',
+                'loss_time': 'Loss Time'
+            })
+            st.dataframe(df_main_program_display, use_container_width=True)
+    else:
+        # This message is shown only if the initial DataFrame is empty
+        st.info("No main program summary data is available for this machine within the selected date range.")
 
-st.markdown("---")
-st.markdown("#### Sub-Program Cycle")
 
-# Check if the sub-program summary DataFrame is not empty
-if not df_subprogram_summary.empty:
-    # Use a copy of the DataFrame to avoid modifying the original
-    filtered_subprogram_df = df_subprogram_summary.copy()
+    st.markdown("---")
+    st.markdown("#### Sub-Program Cycle")
 
-    # If a main program is selected, filter the DataFrame
-    if selected_main_program_input:
-        filtered_subprogram_df = filtered_subprogram_df[
-            filtered_subprogram_df['program_name'].str.contains(selected_main_program_input, case=False, na=False)
-        ]
+    # Check if the sub-program summary DataFrame is not empty
+    if not df_subprogram_summary.empty:
+        # Use a copy of the DataFrame to avoid modifying the original
+        filtered_subprogram_df = df_subprogram_summary.copy()
+
+        # If a main program is selected, filter the DataFrame
+        if selected_main_program_input:
+            filtered_subprogram_df = filtered_subprogram_df[
+                filtered_subprogram_df['program_name'].str.contains(selected_main_program_input, case=False, na=False)
+            ]
 
-    # Sort the filtered DataFrame by 'start_time' in descending order
-    filtered_subprogram_df = filtered_subprogram_df.sort_values(by='start_time', ascending=False)
+        # Sort the filtered DataFrame by 'start_time' in descending order
+        filtered_subprogram_df = filtered_subprogram_df.sort_values(by='start_time', ascending=False)
+
+        # If the filtered DataFrame is empty, show an info message
+        if filtered_subprogram_df.empty:
+            st.info("No sub-program summary data found that matches the filter.")
+        else:
+            # Display the filtered data in a Streamlit table
+            st.dataframe(filtered_subprogram_df[[
+                'program_name', 'start_time', 'end_time', 'duration_total', 'total_processing_time', 'loss_time'
+            ]].rename(columns={
+                'program_name': 'Program Name',
+                'start_time': 'Start',
+                'end_time': 'End',
+                'duration_total': 'Duration',
+                'total_processing_time': 'Cutting Time',
+                'loss_time': 'Loss Time'
+            }), use_container_width=True)
+    else:
+        # If the initial DataFrame is empty, show a different info message
+        st.info("No sub-program summary data available for this machine within the selected date range.")
+
+    st.markdown("---")
+    st.markdown("#### Sub-Program Cycle Details")
+    if not df_program_report_display.empty:
+        df_display_filtered = df_program_report_display.copy()
+        df_display_filtered = df_display_filtered.sort_values(by='start_time', ascending=False)
+        df_display_filtered = df_display_filtered.rename(columns={
+            "duration": "Cutting Time"
+        })
 
-    # If the filtered DataFrame is empty, show an info message
-    if filtered_subprogram_df.empty:
-        st.info("No sub-program summary data found that matches the filter.")
+        st.dataframe(df_display_filtered, use_container_width=True)
     else:
-        # Display the filtered data in a Streamlit table
-        st.dataframe(filtered_subprogram_df[[
-            'program_name', 'start_time', 'end_time', 'duration_total', 'total_processing_time', 'loss_time'
-        ]].rename(columns={
-            'program_name': 'Program Name',
-            'start_time': 'Start',
-            'end_time': 'End',
-            'duration_total': 'Duration',
-            'total_processing_time': 'Cutting Time',
-            'loss_time': 'Loss Time'
-        }), use_container_width=True)
-else:
-    # If the initial DataFrame is empty, show a different info message
-    st.info("No sub-program summary data available for this machine within the selected date range.")
-
-st.markdown("---")
-st.markdown("#### Sub-Program Cycle Details")
-if not df_program_report_display.empty:
-    df_display_filtered = df_program_report_display.copy()
-    df_display_filtered = df_display_filtered.sort_values(by='start_time', ascending=False)
-    df_display_filtered = df_display_filtered.rename(columns={
-        "duration": "Cutting Time"
-    })
-
-    st.dataframe(df_display_filtered, use_container_width=True)
-else:
-    st.info(f"Tidak ada data siklus program yang tersedia untuk {selected_machine} dalam rentang tanggal yang dipilih.")
-
-# Otomatis refresh halaman setiap 60 detik (sesuaikan sesuai kebutuhan)
-time.sleep(60)
-st.rerun()
\ No newline at end of file
+        st.info(f"Tidak ada data siklus program yang tersedia untuk {selected_machine} dalam rentang tanggal yang dipilih.")
+
+
+# Hanya bagian laporan yang digambar ulang saat ada siklus program baru, dan hanya jika rentang mencakup hari ini
+live_fragment(render_program_report, [TOPIC_PROGRAM_REPORT], LIVE_REFRESH_MIN_SECONDS, enabled=end_date >= datetime.date.today())
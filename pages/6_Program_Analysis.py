@@ -12,24 +12,16 @@ import time
 from datetime import date, time as dt_time, timezone
 from dateutil.relativedelta import relativedelta
 from app_core.data_processor import get_mode 
-from app_core.csv_converter import process_raw_csv_data, convert_time_to_seconds, clean_program_name
+from app_core.csv_converter import iter_cam_csv_chunks
 
 
 # Menggunakan dt_time untuk menghindari konflik nama
-# Import tzlocal untuk deteksi zona waktu lokal, atau fallback ke WIB
-try:
-    import tzlocal
-    local_tz = tzlocal.get_localzone()
-except ImportError:
-    logging.warning("tzlocal not found. Assuming Asia/Jakarta timezone (WIB) for local time conversion.")
-    class AsiaJakartaTZ(datetime.tzinfo):
-        def utcoffset(self, dt): return datetime.timedelta(hours=7)
-        def dst(self, dt): return datetime.timedelta(0)
-        def tzname(self, dt): return "WIB"
-    local_tz = AsiaJakartaTZ()
-
 # Pastikan path ke config dan db_manager sudah benar
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app_core.shift_calendar import get_local_tz
+
+# Zona waktu lokal, ditentukan sekali per proses
+local_tz = get_local_tz()
 from app_core.config import (
     MACHINE_DISPLAY_ORDER,
     IDLE_STATUSES, # Import IDLE_STATUSES dan OTHER_STATUSES
@@ -41,6 +33,8 @@ from app_core.db_manager import (
     get_program_report_from_db,
     get_program_report_from_db2, 
     init_db_pool,
+    set_db_role,
+    DB_ROLE_ANALYTICS,
     db_pool,
     close_db_connection,
     get_status_logs_for_machine,
@@ -48,12 +42,19 @@ from app_core.db_manager import (
     update_program_name_in_db,
     save_main_program_analysis,
     save_loss_breakdown_report,
-    save_loss_breakdown_per_piece_report 
+    save_loss_breakdown_per_piece_report,
+    save_program_targets,
+    get_program_targets,
 )
+from app_core.change_notifier import TOPIC_STATUS_LOGS, TOPIC_PROGRAM_REPORT, TOPIC_PROGRAM_ANALYSIS, TOPIC_PROGRAM_TARGETS
+from app_core.query_cache import cached_query, invalidate_topics
+from app_core.program_sessions import is_standard_program, build_program_segments, detect_program_sessions
 
 # --- Inisialisasi DB Pool untuk aplikasi Streamlit ini ---
+# Query laporan di halaman ini memakai pool 'analytics', terpisah dari pool dashboard live
 try:
-    init_db_pool()
+    set_db_role(DB_ROLE_ANALYTICS)
+    init_db_pool(DB_ROLE_ANALYTICS)
     if db_pool is None:
         st.error("ERROR: Database connection pool failed to initialize. Please check database configuration.")
         st.stop()
@@ -63,21 +64,33 @@ except Exception as e:
     st.stop()
 
 # --- Caching untuk fungsi pengambilan data DB ---
-@st.cache_data(ttl=60) # Cache hasil selama 60 detik
+@cached_query(ttl=60, topics=[TOPIC_PROGRAM_REPORT]) # Cache hasil selama 60 detik
 def cached_get_program_report_from_db(machine_name, start_date, end_date):
     """Memuat laporan program dari DB dengan caching."""
     return get_program_report_from_db(machine_name, start_date, end_date)
 
-@st.cache_data(ttl=120) # Cache untuk status log
+@cached_query(ttl=120, topics=[TOPIC_STATUS_LOGS], time_range=("start_time", "end_time")) # Cache untuk status log
 def cached_get_status_logs_for_machine(machine_name, start_time, end_time):
     """Memuat status log dari DB dengan caching."""
     return get_status_logs_for_machine(machine_name, start_time, end_time)
 
-@st.cache_data(ttl=120)
+@cached_query(ttl=120, topics=[TOPIC_STATUS_LOGS, TOPIC_PROGRAM_REPORT], time_range=("start_date", "end_date"))
 def cached_get_program_report_from_db2(machine_name, start_date, end_date, specific_program_filter):
     """Memuat log status detail untuk program induk dengan caching."""
     return get_program_report_from_db2(machine_name, start_date, end_date, specific_program_filter)
 
+@cached_query(ttl=600, topics=[TOPIC_PROGRAM_TARGETS])
+def cached_get_program_targets(program_names):
+    """Memuat target program yang berlaku dari pustaka target (dibagi untuk semua pengguna)."""
+    return get_program_targets(program_names)
+
+PROGRAM_TARGET_COLUMNS = ['program_name', 'target_duration_seconds', 'target_spindle_speed', 'target_feed_rate', 'target_notes']
+
+def load_program_targets_frame(program_names) -> pd.DataFrame:
+    targets = cached_get_program_targets(tuple(sorted(program_names)))
+    df_targets = pd.DataFrame(targets, columns=['program_name', 'version', 'target_duration_seconds', 'target_spindle_speed', 'target_feed_rate', 'notes', 'remarks'])
+    return df_targets.rename(columns={'notes': 'target_notes'})[PROGRAM_TARGET_COLUMNS]
+
 # --- Streamlit Page Configuration ---
 st.set_page_config(layout="wide", page_title="Analisa Efisiensi Program")
 st.title("Program Analysis")
@@ -115,7 +128,8 @@ if not program_logs:
 
 df_program = pd.DataFrame(program_logs)
 
-df_program['program_name'] = df_program['program_name'].apply(clean_program_name)
+# Nama bersih dan nama induk sudah dinormalisasi saat program didaftarkan ke tabel dimensi program
+df_program['program_name'] = df_program['program_clean_name']
 
 # --- Gabungkan data program dengan data status log untuk spindle/feedrate (menggunakan modus) ---
 if raw_status_logs:
@@ -147,11 +161,7 @@ else:
     df_program['most_common_feed_rate'] = 0.0
 
 
-# --- Ekstraksi namaInduk dan filter dengan input manual ---
-df_program['program_main_name'] = df_program['program_name'].apply(
-    lambda x: str(x).split('-')[0].strip() if x and '-' in str(x) else str(x).strip()
-)
-
+# --- Filter nama induk dengan input manual ---
 selected_main_program_input = st.sidebar.text_input(
     "Main Program",
     value=st.session_state.get('main_program_filter_input', ""),
@@ -173,49 +183,52 @@ df_program_summary_actual = df_program.groupby('program_name').agg(
     most_common_feed_rate=('most_common_feed_rate', lambda x: x.mode().iloc[0] if not x.mode().empty else 0)
 ).reset_index()
 
-uploaded_file = st.file_uploader("Import Data from CSV", type=['csv'], key="target_csv_uploader")
+# Target yang berlaku diambil dari pustaka target di database dan digabung sekali secara vektor
+df_program_summary_actual = df_program_summary_actual.merge(
+    load_program_targets_frame(df_program_summary_actual['program_name'].unique()), on='program_name', how='left'
+).fillna({'target_duration_seconds': 0.0, 'target_spindle_speed': 0, 'target_feed_rate': 0, 'target_notes': ''})
 
-import io
-import csv
+uploaded_files = st.file_uploader("Import Data from CSV", type=['csv'], key="target_csv_uploader", accept_multiple_files=True)
 
-if uploaded_file is not None:
+# File yang sama tetap terpasang di uploader pada setiap rerun; impor hanya sekali per file
+imported_target_files = st.session_state.setdefault('imported_target_files', set())
+new_uploaded_files = [f for f in uploaded_files or [] if (f.name, f.size) not in imported_target_files]
+if new_uploaded_files:
     try:
         st.info("Memproses file CSV yang diunggah...")
-        file_name = uploaded_file.name.split('.')[0]
-        try:
-            df_imported_targets_raw = pd.read_csv(uploaded_file, header=2, encoding='latin-1')
-        except UnicodeDecodeError:
-            uploaded_file.seek(0)
-            df_imported_targets_raw = pd.read_csv(uploaded_file, header=2, encoding='cp1252')
-        
-        df_imported_targets = process_raw_csv_data(df_imported_targets_raw, file_name)
-
-        # Hapus ekstensi yang tidak konsisten dari nama program yang diimpor
-        possible_extensions = ['.NC', '.nc', '.H', '.h']
-
-        # Ubah nama program yang diimpor dari CSV agar konsisten
-        df_imported_targets['program_name'] = df_imported_targets['program_name'].apply(
-            lambda name: next(
-                (name[:-len(ext)] for ext in possible_extensions if name.upper().endswith(ext.upper())),
-                name  # Jika tidak ada ekstensi yang cocok, gunakan nama asli
-            )
-        )
-
-        # Update session_state dengan data yang sudah diproses
-        st.info("Memperbarui target dari CSV...")
-        for _, row_csv in df_imported_targets.iterrows():
-            program_name_from_csv = str(row_csv['program_name']).strip()
-            if program_name_from_csv in df_program_summary_actual['program_name'].values:
-                st.session_state[f"target_minutes_{program_name_from_csv}"] = row_csv['target_duration (min)']
-                st.session_state[f"target_spindle_{program_name_from_csv}"] = row_csv['Spindle RPM']
-                st.session_state[f"target_feedrate_{program_name_from_csv}"] = row_csv['target_feedrate']
-                st.session_state[f"quantity_{program_name_from_csv}"] = row_csv['Quantity']
-                st.session_state[f"notes_{program_name_from_csv}"] = row_csv['Notes']
-                st.session_state[f"remarks_{program_name_from_csv}"] = row_csv['Remarks']
-                
-        st.session_state.rebuild_editor_data_sub = True
-        st.success("Target berhasil diimpor dari CSV! Tabel akan diperbarui.")
-        st.rerun()
+        imported_programs = set()
+        import_ok = True
+        for uploaded_file in new_uploaded_files:
+            # Dicatat sebelum diproses: file yang gagal (simpan atau parsing) tidak diimpor ulang dan gagal lagi
+            # di setiap rerun; hapus lalu unggah ulang file untuk mencoba lagi
+            imported_target_files.add((uploaded_file.name, uploaded_file.size))
+            file_name = uploaded_file.name.split('.')[0]
+            # Dibaca dan disimpan per potongan, sehingga ekspor CAM yang besar tidak dimuat utuh
+            for df_imported_targets in iter_cam_csv_chunks(uploaded_file, file_name):
+                df_imported_targets = pd.DataFrame({
+                    'program_name': df_imported_targets['program_name'].astype(str).str.strip(),
+                    'target_duration_seconds': df_imported_targets['target_duration (min)'] * 60,
+                    'target_spindle_speed': df_imported_targets['Spindle RPM'],
+                    'target_feed_rate': df_imported_targets['target_feedrate'],
+                    'notes': df_imported_targets['Notes'],
+                    'remarks': df_imported_targets['Remarks'],
+                })
+                if not save_program_targets(df_imported_targets, source=uploaded_file.name):
+                    import_ok = False
+                    st.error(f"Gagal menyimpan target dari '{uploaded_file.name}' ke database. Periksa log untuk detail.")
+                    break
+                imported_programs.update(df_imported_targets['program_name'])
+
+        if imported_programs:
+            # Nilai hasil edit sesi ini untuk program yang diimpor digantikan oleh target baru
+            for prefix in ("target_minutes_", "target_spindle_", "target_feedrate_", "notes_"):
+                for program_name_imported in imported_programs:
+                    st.session_state.pop(f"{prefix}{program_name_imported}", None)
+            invalidate_topics(TOPIC_PROGRAM_TARGETS)
+            st.session_state.rebuild_editor_data_sub = True
+        if import_ok:
+            st.success(f"{len(imported_programs)} target berhasil diimpor dari CSV ke pustaka target! Tabel akan diperbarui.")
+            st.rerun()
 
     except Exception as e:
         st.error(f"Terjadi kesalahan saat membaca atau memproses file CSV: {e}")
@@ -238,12 +251,12 @@ if 'editable_program_data' not in st.session_state or \
     for _, row in df_program_summary_actual.iterrows():
         program_name = row['program_name']
         
-        target_minutes = st.session_state.get(f"target_minutes_{program_name}", 0.0)
-        target_spindle = st.session_state.get(f"target_spindle_{program_name}", 0)
-        target_feedrate = st.session_state.get(f"target_feedrate_{program_name}", 0)
+        # Nilai dari pustaka target, kecuali sudah diedit di sesi ini
+        target_minutes = st.session_state.get(f"target_minutes_{program_name}", row['target_duration_seconds'] / 60)
+        target_spindle = st.session_state.get(f"target_spindle_{program_name}", row['target_spindle_speed'])
+        target_feedrate = st.session_state.get(f"target_feedrate_{program_name}", row['target_feed_rate'])
         quantity = st.session_state.get(f"quantity_{program_name}", 1)
-        notes = st.session_state.get(f"notes_{program_name}", "")
-        remarks = st.session_state.get(f"remarks_{program_name}", "")
+        notes = st.session_state.get(f"notes_{program_name}", row['target_notes'])
 
         st.session_state.editable_program_data.append({
             'Program Name': program_name,
@@ -310,9 +323,33 @@ df_editable_input_sub = edited_df_with_inputs_sub.rename(columns={
     'Note': 'Catatan'
 })
 
+# Nilai input yang berlaku per program (target dari pustaka + editan sesi ini), dipetakan ke nama program asli
+# lewat index baris editor, lalu digabung secara vektor
+df_program_inputs = df_editable_input_sub.drop(columns=['program_name']).join(
+    pd.DataFrame(st.session_state.editable_program_data)[['Program Name']].rename(columns={'Program Name': 'program_name'}),
+    how='inner'
+).drop_duplicates('program_name', keep='last')
+
 # Add a button to save all changes
 if st.button("Save Sub-Program Changes to Database"):
     success = True
+    # Target yang diedit disimpan ke pustaka target (versi baru hanya untuk yang berubah)
+    df_targets_to_save = pd.DataFrame({
+        'program_name': df_program_inputs['program_name'],
+        'target_duration_seconds': df_program_inputs['Target Durasi (menit)'].astype(float) * 60,
+        'target_spindle_speed': df_program_inputs['Target RPM'],
+        'target_feed_rate': df_program_inputs['Target Feed Rate (mm/min)'],
+        'notes': df_program_inputs['Catatan'],
+    })
+    df_targets_to_save = df_targets_to_save[
+        (df_targets_to_save[['target_duration_seconds', 'target_spindle_speed', 'target_feed_rate']].fillna(0) > 0).any(axis=1)
+    ]
+    if not df_targets_to_save.empty:
+        if save_program_targets(df_targets_to_save, source=f"editor:{selected_machine}"):
+            invalidate_topics(TOPIC_PROGRAM_TARGETS)
+        else:
+            success = False
+            st.error("Gagal menyimpan target program ke database.")
     for key, new_name in list(st.session_state.items()): # Gunakan list() untuk menghindari error saat iterasi dan menghapus
         if key.startswith("pending_rename_sub_"):
             old_name = key.replace("pending_rename_sub_", "")
@@ -323,28 +360,24 @@ if st.button("Save Sub-Program Changes to Database"):
     
     if success:
         st.success("Semua perubahan berhasil disimpan ke database! Memperbarui data...")
-        st.cache_data.clear()
+        # Hanya cache laporan program yang dibuang, termasuk di proses dashboard lain
+        invalidate_topics(TOPIC_PROGRAM_REPORT)
         st.rerun()
     else:
         st.error("Beberapa perubahan gagal disimpan. Periksa log untuk detail.")
 
 # Perbarui df_program_summary_actual dengan nilai yang mungkin sudah diedit dari st.data_editor
-df_program_summary_actual['target_duration_seconds'] = df_program_summary_actual['program_name'].apply(
-    lambda p_name: float(st.session_state.get(f"target_minutes_{p_name}", 0.0)) * 60
-)
+df_program_summary_actual = df_program_summary_actual.drop(
+    columns=['target_duration_seconds', 'target_spindle_speed', 'target_feed_rate', 'target_notes']
+).merge(df_program_inputs, on='program_name', how='left')
+df_program_summary_actual['target_duration_seconds'] = df_program_summary_actual['Target Durasi (menit)'].fillna(0.0).astype(float) * 60
 df_program_summary_actual['target_duration_hhmmss'] = df_program_summary_actual['target_duration_seconds'].apply(format_seconds_to_hhmmss)
-
-df_program_summary_actual['target_spindle_speed'] = df_program_summary_actual['program_name'].apply(
-    lambda p_name: int(st.session_state.get(f"target_spindle_{p_name}", 0))
-)
-df_program_summary_actual['target_feed_rate'] = df_program_summary_actual['program_name'].apply(
-    lambda p_name: int(st.session_state.get(f"target_feedrate_{p_name}", 0))
-)
-df_program_summary_actual['quantity'] = df_program_summary_actual['program_name'].apply(
-    lambda p_name: int(st.session_state.get(f"quantity_{p_name}", 1))
-)
-df_program_summary_actual['notes'] = df_program_summary_actual['program_name'].apply(
-    lambda p_name: str(st.session_state.get(f"notes_{p_name}", ""))
+df_program_summary_actual['target_spindle_speed'] = df_program_summary_actual['Target RPM'].fillna(0).astype(int)
+df_program_summary_actual['target_feed_rate'] = df_program_summary_actual['Target Feed Rate (mm/min)'].fillna(0).astype(int)
+df_program_summary_actual['quantity'] = df_program_summary_actual['Quantity'].fillna(1).astype(int)
+df_program_summary_actual['notes'] = df_program_summary_actual['Catatan'].fillna('').astype(str)
+df_program_summary_actual = df_program_summary_actual.drop(
+    columns=['Target Durasi (menit)', 'Target RPM', 'Target Feed Rate (mm/min)', 'Quantity', 'Catatan']
 )
 
 df_program_summary_actual['actual_avg_duration_per_piece_seconds'] = df_program_summary_actual.apply(
@@ -473,29 +506,10 @@ temp_df_induk_summary = df_program.groupby('program_main_name').agg(
 # 2. Inisialisasi daftar kosong untuk menyimpan semua sesi program induk yang terdeteksi
 all_program_induk_sessions = []
 
-# --- Konfigurasi Ambang Batas Jeda Sesi (dalam detik) ---
-# Jeda yang lebih pendek dari ini akan dianggap bagian dari sesi yang sama.
-# Sesuaikan nilai ini sesuai dengan definisi "interupsi" Anda.
-SESSION_GAP_THRESHOLD_SECONDS = 900 # Contoh: 5 menit (300 detik).
-
-def get_status_category_for_loss(status):
-    if status in IDLE_STATUSES: return 'IDLE'
-    if status in OTHER_STATUSES: return 'OTHER'
-    return 'RUNNING_OR_OTHER_KNOWN'
-
-def is_standard_program(program_name):
-    if program_name and isinstance(program_name, str) and program_name.strip().upper().startswith('N'):
-        return True
-    return False
-
 for _, row_induk_summary in temp_df_induk_summary.iterrows():
     program_main_name = row_induk_summary['program_main_name']
     overall_start_time_induk = row_induk_summary['program_induk_overall_start_time']
     overall_end_time_induk = row_induk_summary['program_induk_overall_end_time']
-    
-    overall_spindle_mode = row_induk_summary['overall_mode_spindle_speed']
-    overall_feed_mode = row_induk_summary['overall_mode_feed_rate']
-    overall_running_sum = row_induk_summary['overall_running_duration_sum']
 
     relevant_logs_from_db2_raw = cached_get_program_report_from_db2(
         selected_machine,
@@ -505,192 +519,20 @@ for _, row_induk_summary in temp_df_induk_summary.iterrows():
     )
 
     if relevant_logs_from_db2_raw:
-        df_relevant_logs_from_db2 = pd.DataFrame(relevant_logs_from_db2_raw)
-    else:
-        st.info(f"Tidak ada log relevan dari get_program_report_from_db2 untuk {program_main_name}")
-
-    if relevant_logs_from_db2_raw:
-        logs_in_overall_window = pd.DataFrame(relevant_logs_from_db2_raw)
-        
-        logs_in_overall_window['timestamp_log'] = pd.to_datetime(logs_in_overall_window['timestamp'], utc=True)
-        
-        logs_in_overall_window['program_main_name_from_log'] = logs_in_overall_window['current_program'].apply(
-            lambda x: str(x).split('-')[0].strip() if x and '-' in str(x) else None
-        )
-        logs_in_overall_window['status_category'] = logs_in_overall_window['status_text'].apply(get_status_category_for_loss)
-        logs_in_overall_window = logs_in_overall_window.sort_values(by='timestamp_log').copy()
-
-        if not logs_in_overall_window.empty:
-            cols_to_carry = [col for col in logs_in_overall_window.columns if col != 'timestamp_log']
-            synthetic_end_row_data = {col: logs_in_overall_window[col].iloc[-1] for col in cols_to_carry}
-            synthetic_end_row_data['timestamp_log'] = overall_end_time_induk
-            synthetic_end_row = pd.DataFrame([synthetic_end_row_data])
-            synthetic_end_row['timestamp_log'] = pd.to_datetime(synthetic_end_row['timestamp_log'], utc=True)
-
-            combined_logs_for_induk_calc = pd.concat([logs_in_overall_window, synthetic_end_row])
-            combined_logs_for_induk_calc = combined_logs_for_induk_calc.sort_values('timestamp_log').drop_duplicates(subset=['timestamp_log'], keep='first').copy()
-            
-            combined_logs_for_induk_calc['timestamp_log'] = pd.to_datetime(combined_logs_for_induk_calc['timestamp_log'], utc=True)
-            combined_logs_for_induk_calc['next_timestamp_log'] = combined_logs_for_induk_calc['timestamp_log'].shift(-1)
-            combined_logs_for_induk_calc['duration_segment'] = (combined_logs_for_induk_calc['next_timestamp_log'] - combined_logs_for_induk_calc['timestamp_log']).dt.total_seconds()
-            
-            combined_logs_for_induk_calc = combined_logs_for_induk_calc.dropna(subset=['next_timestamp_log']).copy()
-            st.write("Combined_logs_for_induk_calc")
-            st.write(combined_logs_for_induk_calc)
-            
-            # --- PERBAIKAN LOGIKA FINAL DETEKSI SESI & PENCATATAN NOTES ---
-            current_session_start_time = None
-            current_session_actual_running_time = 0.0 # Ganti total_process_time dengan waktu running
-            current_session_notes = []
-            is_main_program_active_in_this_session = False
-            last_running_timestamp = None
-            last_log_timestamp = None
-
-            # Inisialisasi list untuk setiap program induk yang diproses
-            detected_sessions_for_current_program_induk = []
-
-            for idx_seg, segment_row in combined_logs_for_induk_calc.iterrows():
-                segment_start_time = segment_row['timestamp_log']
-                segment_end_time = segment_row['next_timestamp_log']
-                segment_duration = segment_row['duration_segment']
-                segment_status_category = segment_row['status_category']
-                segment_program_main_name_from_log = segment_row['program_main_name_from_log']
-                segment_current_program_value = str(segment_row['current_program']).strip() if segment_row['current_program'] is not None else ""
-
-                is_current_segment_this_main_program_running = \
-                    (program_main_name == segment_program_main_name_from_log) and \
-                    (segment_status_category == 'RUNNING_OR_OTHER_KNOWN') and \
-                    is_standard_program(segment_current_program_value)
-                
-                is_current_segment_other_standard_program_running = \
-                    (program_main_name != segment_program_main_name_from_log) and \
-                    (segment_status_category == 'RUNNING_OR_OTHER_KNOWN') and \
-                    is_standard_program(segment_current_program_value)
-                
-                # Perbarui last_log_timestamp di setiap iterasi
-                last_log_timestamp = segment_end_time
-
-                # --- Skenario 1: Program Induk Aktif Terdeteksi ---
-                if is_current_segment_this_main_program_running:
-                    if not is_main_program_active_in_this_session: # Program Induk baru saja dimulai/dilanjutkan
-                        current_session_start_time = segment_start_time
-                        current_session_actual_running_time = 0.0
-                        current_session_notes = []
-                        
-                        if len(detected_sessions_for_current_program_induk) > 0:
-                            current_session_notes.append(f"Lanjutan (Waktu: {current_session_start_time.tz_convert(local_tz).strftime('%Y-%m-%d %H:%M:%S')})")
-                        else:
-                            current_session_notes.append(f"Mulai Sesi (Waktu: {current_session_start_time.tz_convert(local_tz).strftime('%Y-%m-%d %H:%M:%S')})")
-                        
-                        is_main_program_active_in_this_session = True
-                    
-                    # Akumulasi durasi running ke sesi saat ini
-                    current_session_actual_running_time += segment_duration
-                    last_running_timestamp = segment_end_time
-
-                # --- Skenario 2: Jeda atau Program Non-Standar Terdeteksi ---
-                elif (segment_duration > SESSION_GAP_THRESHOLD_SECONDS and is_main_program_active_in_this_session):
-                    # Ini adalah jeda panjang, sesi berakhir
-                    current_session_end_time = last_running_timestamp
-                    
-                    if current_session_end_time is None:
-                        continue # Lewati jika tidak ada running time sebelumnya
-
-                    total_session_duration = (current_session_end_time - current_session_start_time).total_seconds()
-                    
-                    # Hitung waktu loss dari selisih durasi total sesi dan waktu running
-                    loss_time = total_session_duration - current_session_actual_running_time
-                    
-                    detected_sessions_for_current_program_induk.append({
-                        'program_main_name': program_main_name,
-                        'session_start_time': current_session_start_time,
-                        'session_end_time': current_session_end_time,
-                        'total_process_time_seconds': total_session_duration,
-                        'total_loss_time_seconds': loss_time,
-                        'notes': "; ".join(current_session_notes) + f"; Jeda Panjang Terdeteksi (Durasi: {format_seconds_to_hhmmss(segment_duration)})"
-                    })
-                    # Reset state
-                    is_main_program_active_in_this_session = False
-                    current_session_start_time = None
-                    current_session_actual_running_time = 0.0
-                    current_session_notes = []
-                    last_running_timestamp = None
-                
-                # --- Skenario 3: Interupsi oleh Program Standar Lain ---
-                elif is_current_segment_other_standard_program_running:
-                    if is_main_program_active_in_this_session:
-                        # Akhiri sesi saat ini
-                        current_session_end_time = last_running_timestamp
-                        
-                        if current_session_end_time is None:
-                            continue # Lewati jika tidak ada running time sebelumnya
-                        
-                        total_session_duration = (current_session_end_time - current_session_start_time).total_seconds()
-                        loss_time = total_session_duration - current_session_actual_running_time
-                        
-                        detected_sessions_for_current_program_induk.append({
-                            'program_main_name': program_main_name,
-                            'session_start_time': current_session_start_time,
-                            'session_end_time': current_session_end_time,
-                            'total_process_time_seconds': total_session_duration,
-                            'total_loss_time_seconds': loss_time,
-                            'notes': "; ".join(current_session_notes) + f"; Sesi diakhiri oleh interupsi program lain: '{segment_current_program_value}'"
-                        })
-                        
-                        # Reset state untuk sesi berikutnya
-                        is_main_program_active_in_this_session = False
-                        current_session_start_time = None
-                        current_session_actual_running_time = 0.0
-                        current_session_notes = []
-                        last_running_timestamp = None
-
-            # Setelah loop segmen selesai, tambahkan sesi Program Induk terakhir yang belum ditutup
-            if is_main_program_active_in_this_session and current_session_start_time is not None:
-                current_session_end_time = last_log_timestamp
-                if last_running_timestamp:
-                    total_session_duration = (last_running_timestamp - current_session_start_time).total_seconds()
-                    loss_time = total_session_duration - current_session_actual_running_time
-                    notes = "; ".join(current_session_notes) + f"; Selesai Normal (Waktu: {last_running_timestamp.tz_convert(local_tz).strftime('%Y-%m-%d %H:%M:%S')})"
-                else: # Jika tidak ada running time
-                    total_session_duration = 0.0
-                    loss_time = (current_session_end_time - current_session_start_time).total_seconds()
-                    notes = "; ".join(current_session_notes) + f"; Tidak ada Running Time"
-
-                detected_sessions_for_current_program_induk.append({
-                    'program_main_name': program_main_name,
-                    'session_start_time': current_session_start_time,
-                    'session_end_time': current_session_end_time,
-                    'total_process_time_seconds': total_session_duration,
-                    'total_loss_time_seconds': loss_time,
-                    'notes': notes
-                })
-            
-            # --- Tambahkan sesi ke daftar global all_program_induk_sessions ---
-            # Pastikan ini hanya dijalankan sekali per program_main_name, dan di luar loop segment
-            all_program_induk_sessions.extend(detected_sessions_for_current_program_induk)
-
-            # Jika setelah semua pemrosesan, tidak ada sesi terdeteksi yang aktif (misal seluruh span cuma idle/other/makro)
-            if not detected_sessions_for_current_program_induk and (overall_end_time_induk - overall_start_time_induk).total_seconds() > 0:
-                all_program_induk_sessions.append({
-                    'program_main_name': program_main_name,
-                    'session_start_time': overall_start_time_induk,
-                    'session_end_time': overall_end_time_induk,
-                    'total_process_time_seconds': 0.0,
-                    'total_loss_time_seconds': (overall_end_time_induk - overall_start_time_induk).total_seconds(),
-                    'notes': "Tidak ada aktivitas Running Program Induk (N-standard) yang terdeteksi, hanya status non-Running atau program non-standar."
-                })
-
-        else: # Jika logs_in_overall_window kosong untuk program ini
-            all_program_induk_sessions.append({
-                'program_main_name': program_main_name,
-                'session_start_time': overall_start_time_induk,
-                'session_end_time': overall_end_time_induk,
-                'total_process_time_seconds': 0.0,
-                'total_loss_time_seconds': (overall_end_time_induk - overall_start_time_induk).total_seconds(),
-                'notes': "Tidak ada log detail dalam rentang Program Induk."
-            })
+        # Segmentasi sesi ada di app_core/program_sessions.py (juga dipakai app_core/benchmarks.py)
+        combined_logs_for_induk_calc = build_program_segments(relevant_logs_from_db2_raw, overall_end_time_induk)
+        st.write("Combined_logs_for_induk_calc")
+        st.write(combined_logs_for_induk_calc)
+        all_program_induk_sessions.extend(detect_program_sessions(
+            program_main_name,
+            combined_logs_for_induk_calc,
+            overall_start_time_induk,
+            overall_end_time_induk,
+            local_tz=local_tz,
+        ))
     else: # Jika relevant_logs_from_db2_raw kosong
-          all_program_induk_sessions.append({
+        st.info(f"Tidak ada log relevan dari get_program_report_from_db2 untuk {program_main_name}")
+        all_program_induk_sessions.append({
             'program_main_name': program_main_name,
             'session_start_time': overall_start_time_induk,
             'session_end_time': overall_end_time_induk,
@@ -1245,6 +1087,9 @@ if st.button("Save Report to Database"):
     else:
         st.warning("Tidak ada data rincian waktu loss per piece untuk disimpan.")
 
+    if sub_program_save_success or main_program_save_success or loss_breakdown_save_success or loss_breakdown_per_piece_save_success:
+        # Buang cache arsip analisis (halaman Program Analysis Report) di semua proses dashboard
+        invalidate_topics(TOPIC_PROGRAM_ANALYSIS)
+
     if sub_program_save_success or main_program_save_success:
-        st.cache_data.clear()
         st.rerun()
\ No newline at end of file
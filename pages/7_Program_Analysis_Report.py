@@ -12,31 +12,27 @@ from dateutil.relativedelta import relativedelta
 from collections import defaultdict
 
 # Menggunakan dt_time untuk menghindari konflik nama
-# Import tzlocal untuk deteksi zona waktu lokal, atau fallback ke WIB
-try:
-    import tzlocal
-    local_tz = tzlocal.get_localzone()
-except ImportError:
-    logging.warning("tzlocal not found. Assuming Asia/Jakarta timezone (WIB) for local time conversion.")
-    class AsiaJakartaTZ(datetime.tzinfo):
-        def utcoffset(self, dt): return datetime.timedelta(hours=7)
-        def dst(self, dt): return datetime.timedelta(0)
-        def tzname(self, dt): return "WIB"
-    local_tz = AsiaJakartaTZ()
-
 # Pastikan path ke config dan db_manager sudah benar
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app_core.shift_calendar import get_local_tz
+
+# Zona waktu lokal, ditentukan sekali per proses
+local_tz = get_local_tz()
 from app_core.config import MACHINE_DISPLAY_ORDER, IDLE_STATUSES, OTHER_STATUSES
 from app_core.db_manager import (
     get_sub_program_analysis_report,
     get_main_program_report,
     init_db_pool,
+    set_db_role,
+    DB_ROLE_ANALYTICS,
     db_pool,
     format_seconds_to_hhmm,
     format_seconds_to_hhmmss,
     get_loss_breakdown_report,
     get_loss_breakdown_per_piece_report,
 )
+from app_core.change_notifier import TOPIC_PROGRAM_ANALYSIS
+from app_core.query_cache import cached_query
 
 def classify_efficiency(efficiency):
     if efficiency >= 85: return "Good"
@@ -54,8 +50,10 @@ def is_standard_program(program_name):
     return False
 
 # --- Inisialisasi DB Pool untuk aplikasi Streamlit ini ---
+# Query laporan di halaman ini memakai pool 'analytics', terpisah dari pool dashboard live
 try:
-    init_db_pool()
+    set_db_role(DB_ROLE_ANALYTICS)
+    init_db_pool(DB_ROLE_ANALYTICS)
     if db_pool is None:
         st.error("ERROR: Database connection pool failed to initialize. Please check database configuration.")
         st.stop()
@@ -65,22 +63,22 @@ except Exception as e:
     st.stop()
 
 # Caching untuk fungsi pengambilan data DB
-@st.cache_data(ttl=60) # Cache hasil selama 60 detik
+@cached_query(ttl=60, topics=[TOPIC_PROGRAM_ANALYSIS]) # Cache hasil selama 60 detik
 def cached_get_sub_program_analysis_report(machine_name, start_date, end_date, program_name_filter):
     """Memuat laporan efisiensi yang sudah diarsip dari DB dengan caching."""
     return get_sub_program_analysis_report(machine_name, start_date, end_date, program_name_filter)
 
-@st.cache_data(ttl=60)
+@cached_query(ttl=60, topics=[TOPIC_PROGRAM_ANALYSIS])
 def cached_get_main_program_report(machine_name, start_date, end_date, program_name_filter):
     """Memuat laporan program induk yang sudah diarsip dari DB dengan caching."""
     return get_main_program_report(machine_name, start_date, end_date, program_name_filter)
 
 # Tambahkan fungsi cached untuk laporan loss breakdown
-@st.cache_data(ttl=60)
+@cached_query(ttl=60, topics=[TOPIC_PROGRAM_ANALYSIS])
 def cached_get_loss_breakdown_report(machine_name, start_date, end_date):
     return get_loss_breakdown_report(machine_name, start_date, end_date)
 
-@st.cache_data(ttl=60)
+@cached_query(ttl=60, topics=[TOPIC_PROGRAM_ANALYSIS])
 def cached_get_loss_breakdown_per_piece_report(machine_name, start_date, end_date):
     return get_loss_breakdown_per_piece_report(machine_name, start_date, end_date)
 